@@ -1,23 +1,93 @@
-
 import streamlit as st
-import fitz  # PyMuPDF
-import requests
 import hashlib
-from io import BytesIO
-from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from db import init_db, register_user, login_user, save_upload, get_user_history
-from gtts import gTTS   # 🎤 Voice summary
-
-# Load Hugging Face token
-try:
-    hf_token = st.secrets["HF_TOKEN"]
-except Exception:
-    hf_token = ""
+import json
+import re
+import tempfile
+import time
+from concurrent.futures import as_completed
+from db import (
+    init_db, register_user, login_user, list_uploads, search_uploads, get_upload_summary,
+    get_job, job_queue_position, list_active_jobs, HIGHLIGHT, HISTORY_PAGE_SIZE,
+)
+from extraction import MAX_UPLOAD_MB, extraction_cache, file_digest
+from risk import RiskHit, RiskScanner, load_lexicon, group_hits
+from pipeline import DEMO_MODE, OPENAI_MODE, HUGGING_FACE_MODE, OFFLINE_MODE, MODE_TAGS
+from artifacts import pdf_job, voice_job
+from jobs import JOB_WORKERS, FINISHED, JobWorkers, submit_job, cancel_job, job_gauges
+from scheduler import llm_scheduler
+from summary_cache import summary_cache
+from export import date_range, export_merged_pdf, export_zip
+import metrics
+from metrics import request, span, size_bucket
+
+# --- ONE-TIME SETUP ---
+# Streamlit re-runs this script on every interaction. Everything here runs
+# once per process and is shared by all sessions; heavy libraries (PyMuPDF,
+# ReportLab, gTTS, requests, NumPy) are only imported when first used, so a
+# fresh worker renders the login form quickly.
+def _secret(name, default):
+    try:
+        return st.secrets[name]
+    except Exception:
+        return default
+
+@st.cache_resource
+def load_settings():
+    # Load Hugging Face token
+    hf_token = _secret("HF_TOKEN", "")
+
+    # Optional firm-specific risk lexicon (JSON of term -> weight)
+    try:
+        risk_scanner = RiskScanner(load_lexicon(st.secrets["RISK_LEXICON"]))
+    except Exception:
+        risk_scanner = RiskScanner()
+
+    # Extra topics the AI risk analysis should look for, e.g. ["data retention"]
+    risk_queries = list(_secret("RISK_QUERIES", []))
+
+    # Emails allowed to see the 📈 Metrics page
+    admin_emails = set(_secret("ADMIN_EMAILS", []))
+    return hf_token, risk_scanner, risk_queries, admin_emails
 
 # --- INIT DB ---
-init_db()
+@st.cache_resource
+def setup_database():
+    init_db()
+
+# --- METRICS ---
+# Hit/miss counts only grow, so they are exported as *_total counters.
+def _cache_metrics(prefix, stats):
+    return {f"{prefix}_{k}_total" if k.endswith(("hits", "misses", "coalesced")) else f"{prefix}_{k}": v for k, v in stats.items()}
+
+# Stage latencies are always collected; set METRICS_PORT to serve them at
+# http://127.0.0.1:<port>/metrics, or METRICS_FILE to write them to a file.
+@st.cache_resource
+def setup_metrics():
+    try:
+        metrics.start_http_server(int(st.secrets["METRICS_PORT"]))
+    except Exception:
+        pass
+    try:
+        metrics.start_file_exporter(st.secrets["METRICS_FILE"])
+    except Exception:
+        pass
+    metrics.register_collector(lambda: _cache_metrics("legallite_extraction_cache", extraction_cache.stats()))
+    metrics.register_collector(lambda: _cache_metrics("legallite_summary_cache", summary_cache.stats()))
+    metrics.register_collector(llm_scheduler.gauges)
+    metrics.register_collector(job_gauges)
+
+# --- JOB WORKERS ---
+# Simplify and the risk scans run on these worker threads (jobs.py), not in
+# the script run. LEGALLITE_JOB_WORKERS sets how many; `python jobs.py` adds
+# worker processes on the same database.
+@st.cache_resource
+def setup_jobs():
+    return JobWorkers(JOB_WORKERS, hf_token, risk_scanner, risk_queries).start()
+
+hf_token, risk_scanner, risk_queries, admin_emails = load_settings()
+setup_database()
+setup_metrics()
+setup_jobs()
 
 # --- CONFIG ---
 st.set_page_config(page_title="LegalLite", layout="wide", page_icon="⚖️")
@@ -31,99 +101,17 @@ for key in ["logged_in", "user_email", "mode", "api_key", "mode_chosen"]:
     if key not in st.session_state:
         st.session_state[key] = False if key == "logged_in" else ""
 
+# This session's jobs: (kind, PDF digest, params) -> job id
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+# SHA-256 of each uploaded file by upload id, so reruns do not hash it again
+if "upload_digests" not in st.session_state:
+    st.session_state.upload_digests = {}
+
 # --- UTILITY ---
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def generate_pdf(summary_text, filename):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    c.setFont("Helvetica", 12)
-    margin = 40
-    y = height - margin
-
-    c.drawString(margin, y, f"LegalLite Summary - {filename}")
-    y -= 20
-    c.drawString(margin, y, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    y -= 30
-
-    lines = summary_text.split('\n')
-    for line in lines:
-        for subline in [line[i:i+90] for i in range(0, len(line), 90)]:
-            if y < margin:
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y = height - margin
-            c.drawString(margin, y, subline)
-            y -= 20
-
-    c.save()
-    buffer.seek(0)
-    return buffer
-    
-# 🎤 --- VOICE SUMMARY ---
-def generate_voice(summary_text):
-    try:
-        tts = gTTS(summary_text, lang='en')
-        audio_path = "summary_audio.mp3"
-        tts.save(audio_path)
-        return audio_path
-    except Exception as e:
-        st.error(f"❌ Voice generation failed: {e}")
-        return None
-        
-# --- HUGGING FACE API WRAPPER ---
-@st.cache_data
-def query_huggingface_api(prompt):
-    API_URL = "https://router.huggingface.co/models/sshleifer/distilbart-cnn-12-6"
-    
-   # API_URL = "https://router.huggingface.co/hf-inference/sshleifer/models/sshleifer/distilbart-cnn-12-6"#facebook/bart-large-cnn"
-    
-    headers = {
-        "Authorization": f"Bearer {hf_token}",
-        "Content-Type": "application/json",
-    }
-
-    try:
-        # ⚠️ IMPORTANT: Free API has a strict character limit.
-        # We must truncate the text, or the API will return an error (400 or 500).
-        # 3000 characters is roughly 1-2 pages of text.
-        truncated_prompt = prompt[:3000] 
-
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json={
-                "inputs": truncated_prompt,
-                "parameters": {
-                    "min_length": 30,     # Force it to write at least a bit
-                    "max_length": 150,    # Cap the length
-                    "do_sample": False    # Deterministic (faster/stable)
-                }
-            }
-        )
-
-        # Handle "Model Loading" state (503 error)
-        if response.status_code == 503:
-            return "⏳ Model is loading... please wait 20 seconds and try again."
-
-        if response.status_code != 200:
-            return f"❌ API Error {response.status_code}: {response.text}"
-
-        output = response.json()
-
-        # Handle different return formats
-        if isinstance(output, list) and output:
-            return output[0].get("summary_text", str(output[0]))
-        elif isinstance(output, dict) and "summary_text" in output:
-            return output["summary_text"]
-
-        return f"⚠️ Unexpected output: {output}"
-
-    except Exception as e:
-        return f"❌ Exception: {str(e)}"
-
 # --- LOGIN SECTION ---
 def login_section():
     with st.container():
@@ -144,7 +132,7 @@ def choose_mode():
     st.markdown("### 🎛️ Choose how you'd like to use LegalLite:")
     st.markdown("Pick a mode based on your preference:")
 
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
 
     # initialize a session variable to hold temporary API input
     if "api_input" not in st.session_state:
@@ -152,20 +140,25 @@ def choose_mode():
 
     with col1:
         if st.button("🧪 Demo Mode"):
-            st.session_state.mode = "Demo Mode"
+            st.session_state.mode = DEMO_MODE
             st.session_state.mode_chosen = True
 
     with col2:
         if st.button("🔐 Use Your API Key"):
-            st.session_state.mode = "Use Your Own OpenAI API Key"
+            st.session_state.mode = OPENAI_MODE
             st.session_state.mode_chosen = False  # wait for key entry
 
     with col3:
         if st.button("🌐 Hugging Face"):
-            st.session_state.mode = "Use Open-Source AI via Hugging Face"
+            st.session_state.mode = HUGGING_FACE_MODE
+            st.session_state.mode_chosen = True
+
+    with col4:
+        if st.button("⚡ Offline"):
+            st.session_state.mode = OFFLINE_MODE
             st.session_state.mode_chosen = True
 
-    if st.session_state.mode == "Use Your Own OpenAI API Key" and not st.session_state.mode_chosen:
+    if st.session_state.mode == OPENAI_MODE and not st.session_state.mode_chosen:
         st.session_state.api_input = st.text_input("Paste your OpenAI API Key", type="password")
         if st.button("➡️ Continue"):
             if st.session_state.api_input.strip() == "":
@@ -187,37 +180,314 @@ def signup_section():
             else:
                 st.error("User already exists.")  
 
-# --- RISKY TERMS FINDER ---
-def find_risky_terms(text):
-    risky_keywords = [
-        "penalty", "termination", "breach", "fine",
-        "automatic renewal", "binding arbitration",
-        "liquidated damages", "non-compete", "non-disclosure",
-        "late fee", "without notice", "waiver of rights",
-        "exclusive jurisdiction", "governing law", "intellectual property"
-    ]
-    found_terms = []
-    for keyword in risky_keywords:
-        if keyword.lower() in text.lower():
-            found_terms.append(keyword)
-    return list(set(found_terms))
-
-# --- AI RISK TERMS ---
-def ai_risk_analysis(text, api_key):
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a legal risk analysis assistant. Identify clauses in contracts that could pose legal or financial risks to the signer, explain why, and suggest ways to mitigate them."},
-                {"role": "user", "content": text}
-            ]
+# --- JOBS ---
+# A page submits a job and polls it. The session remembers its jobs by file,
+# so a rerun picks the same job up again instead of starting over; after a
+# reconnect, submitting the file again joins the job still running.
+JOB_POLL_SECONDS = 0.5
+JOB_LABELS = {"simplify": "🧐 Simplify", "risk_scan": "🚨 Risk scan", "risk_analysis": "🤖 AI risk analysis"}
+
+def job_key(kind, uploaded_file, params):
+    digests = st.session_state.upload_digests
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = file_digest(uploaded_file)
+    return kind, digests[uploaded_file.file_id], json.dumps(params, sort_keys=True)
+
+# The upload is copied to the job queue straight from Streamlit's buffer.
+# Only the submit is timed here; the worker times the job itself.
+def start_job(key, uploaded_file, secrets=None):
+    kind, digest, params = key
+    with request(f"submit_{kind}", labels={"mode": MODE_TAGS.get(st.session_state.mode, ""), "size": size_bucket(uploaded_file.size)},
+                 user=st.session_state.user_email, filename=uploaded_file.name, bytes=uploaded_file.size):
+        st.session_state.jobs[key] = submit_job(st.session_state.user_email, kind, uploaded_file, uploaded_file.name,
+                                                json.loads(params), secrets, digest=digest)
+
+# Wait for a job, showing its place in the queue, its progress (with a bar
+# while pages are extracted) and any text streamed so far, with a button to
+# cancel it. on_extracted(job) is called once when all pages are extracted,
+# while the job goes on. Failures and cancellations are shown here; returns
+# the finished job (None if it no longer exists).
+def follow_job(job_id, on_extracted=None):
+    email = st.session_state.user_email
+    cancel_slot = st.empty()
+    status = st.empty()
+    pages = st.empty()
+    partial = st.empty()
+    if cancel_slot.button("✖️ Cancel", key=f"cancel_{job_id}"):
+        cancel_job(job_id, email)
+    job = get_job(job_id, email)
+    extracted = False
+    while job is not None and job["status"] not in FINISHED:
+        if job["status"] == "queued":
+            place = job_queue_position(job_id)
+            status.info(f"⏳ Queued: #{place[0]} of {place[1]} waiting jobs." if place else "⏳ Queued.")
+        else:
+            place = llm_scheduler.position(email)
+            waiting = f" Waiting for a model slot: you are #{place[0]} of {place[1]} in the queue." if place else ""
+            status.info(f"⚙️ {job['stage'] or 'Starting'}...{waiting}")
+        if job["page_count"] and not extracted:
+            done, count = job["pages_done"], job["page_count"]
+            pages.progress(done / count, text=f"📄 Extracted page {done} of {count}")
+            if done == count:
+                pages.empty()
+                extracted = True
+                if on_extracted is not None:
+                    on_extracted(job)
+        if job["partial"]:
+            partial.markdown(job["partial"])
+        time.sleep(JOB_POLL_SECONDS)
+        job = get_job(job_id, email)
+    cancel_slot.empty()
+    status.empty()
+    pages.empty()
+    partial.empty()
+    if job is not None and job["status"] == "done" and not extracted and on_extracted is not None:
+        on_extracted(job)
+
+    if job is None:
+        st.error("❌ This job no longer exists. Please try again.")
+    elif job["status"] == "failed":
+        st.error(f"❌ {job['error']}")
+    elif job["status"] == "cancelled":
+        st.info("✖️ Cancelled.")
+    return job
+
+def active_jobs_panel():
+    jobs = list_active_jobs(st.session_state.user_email)
+    if not jobs:
+        return
+    with st.expander(f"⏳ {len(jobs)} job(s) in progress"):
+        for job in jobs:
+            col1, col2 = st.columns([4, 1])
+            col1.write(f"📄 {job['filename']} | {JOB_LABELS.get(job['kind'], job['kind'])} | {job['stage'] or job['status']}")
+            if col2.button("✖️ Cancel", key=f"cancel_active_{job['id']}"):
+                cancel_job(job["id"], st.session_state.user_email)
+                st.rerun()
+
+# --- UPLOAD & SIMPLIFY ---
+def simplify_upload(uploaded_file):
+    if uploaded_file.size > MAX_UPLOAD_MB * 1024 * 1024:
+        st.error(f"⚠️ File too large. Please upload PDFs under {MAX_UPLOAD_MB}MB.")
+        return
+    if st.session_state.mode == OPENAI_MODE and not st.session_state.api_key:
+        st.error("❌ API key not found. Please go back and enter your key.")
+        return
+
+    key = job_key("simplify", uploaded_file, {"mode": st.session_state.mode})
+    if st.button("🧐 Simplify Document"):
+        secrets = {"api_key": st.session_state.api_key} if st.session_state.mode == OPENAI_MODE else None
+        start_job(key, uploaded_file, secrets)
+    if key not in st.session_state.jobs:
+        return
+    text_slot = st.empty()
+    job = follow_job(st.session_state.jobs[key], on_extracted=lambda job: show_extracted_text(text_slot, job["digest"]))
+    if job is None or job["status"] != "done":
+        return
+
+    # The job saved the summary to the history; show it with its notes.
+    result = job["result"]
+    for level, note in result["notes"]:
+        (st.warning if level == "warning" else st.info)(note)
+    simplified = result["summary"]
+    st.subheader("✅ Simplified Summary")
+    st.success(simplified)
+    if result["changed_risk_terms"]:
+        st.warning(f"🚨 Risky terms in changed clauses: {', '.join(result['changed_risk_terms'])}")
+    summary_downloads(simplified, uploaded_file.name)
+
+# The job extracts into the shared extraction cache, so the text can be shown
+# while the summary is still being written.
+def show_extracted_text(slot, digest):
+    pages = extraction_cache.get(digest)
+    if not pages:
+        return
+    with slot.container():
+        st.success("✅ Text extracted from PDF.")
+        with st.expander("📄 View Extracted Text"):
+            st.text_area("", "".join(pages), height=300)
+
+# PDF and 🎤 voice downloads render in the background;
+# each button appears as soon as its file is ready.
+def summary_downloads(simplified, filename):
+    pdf_slot = st.empty()
+    audio_slot = st.empty()
+    voice_slot = st.empty()
+    pdf_slot.caption("⏳ Preparing PDF...")
+    voice_slot.caption("⏳ Preparing voice summary...")
+    jobs = {
+        pdf_job(simplified, filename): "pdf",
+        voice_job(simplified): "voice",
+    }
+    # Until both downloads are ready; render_pdf/render_voice record
+    # the rendering itself on the worker threads.
+    with span("artifacts"):
+        for job in as_completed(jobs):
+            if jobs[job] == "pdf":
+                try:
+                    pdf_slot.download_button(
+                        label="📥 Download Summary as PDF",
+                        data=job.result(),
+                        file_name=f"simplified_{filename.replace('.pdf','')}.pdf",
+                        mime="application/pdf"
+                    )
+                except Exception as e:
+                    pdf_slot.error(f"❌ PDF generation failed: {e}")
+            else:
+                try:
+                    audio_bytes = job.result()
+                    audio_slot.audio(audio_bytes, format="audio/mp3")
+                    voice_slot.download_button(
+                        label="🎧 Download Voice Summary",
+                        data=audio_bytes,
+                        file_name="summary_audio.mp3",
+                        mime="audio/mp3"
+                    )
+                except Exception as e:
+                    voice_slot.error(f"❌ Voice generation failed: {e}")
+
+# --- RISKY TERMS ---
+# The keyword scan starts as soon as a file is uploaded; the AI analysis
+# (OpenAI mode) on request.
+def risk_scan_upload(uploaded_file):
+    scan_key = job_key("risk_scan", uploaded_file, {})
+    if scan_key not in st.session_state.jobs:
+        start_job(scan_key, uploaded_file)
+    job = follow_job(st.session_state.jobs[scan_key])
+    if job is None or job["status"] != "done":
+        if st.button("🔁 Scan again"):
+            del st.session_state.jobs[scan_key]
+            st.rerun()
+        return
+
+    # --- Step 1: Keyword Scan ---
+    report = job["result"]
+    hits = [RiskHit(**hit) for hit in report["hits"]]
+    if hits:
+        st.error(f"❗Risky Terms Found (risk score: {report['score']:g}):")
+        for term, term_hits in group_hits(hits).items():
+            with st.expander(f"**{term}** — {len(term_hits)} occurrence(s), weight {term_hits[0].weight:g}"):
+                for hit in term_hits:
+                    st.markdown(f"- 📄 Page {hit.page}, chars {hit.start}–{hit.end}")
+                    st.caption(hit.clause)
+    else:
+        st.success("✅ No risky terms detected based on keyword scan.")
+
+    # --- Step 2: Optional AI Analysis ---
+    if st.session_state.mode == OPENAI_MODE and st.session_state.api_key:
+        ai_key = job_key("risk_analysis", uploaded_file, {})
+        if st.button("🤖 Run AI Risk Analysis"):
+            start_job(ai_key, uploaded_file, {"api_key": st.session_state.api_key})
+        if ai_key in st.session_state.jobs:
+            st.subheader("🧠 AI Risk Analysis Result")
+            job = follow_job(st.session_state.jobs[ai_key])
+            if job is not None and job["status"] == "done":
+                st.markdown(job["result"]["analysis"])
+    elif st.session_state.mode != OPENAI_MODE:
+        st.info("ℹ️ For AI-powered risk analysis, use the 'Use Your Own OpenAI API Key' mode.")
+
+# --- HISTORY ---
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]#<>|~$])")
+
+# Search results mark matches with HIGHLIGHT; escape the rest of the text and
+# show the matches in bold.
+def highlighted(text):
+    text = _MARKDOWN_SPECIAL.sub(r"\\\1", " ".join(text.split()))
+    return text.replace(HIGHLIGHT[0], "**").replace(HIGHLIGHT[1], "**")
+
+def open_summary(upload_id):
+    st.session_state.history_open.add(upload_id)
+
+# Bulk download of the history (or a date range of it). The export is written
+# to a temporary file as it is rendered, so long histories never have to be
+# built up in memory first.
+EXPORT_FORMATS = {
+    "📄 One PDF with contents": (export_merged_pdf, "pdf", "application/pdf"),
+    "🗂️ ZIP of PDFs": (export_zip, "zip", "application/zip"),
+}
+
+def export_history(email):
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From", value=None, key="export_from")
+    with col2:
+        end_date = st.date_input("To (inclusive)", value=None, key="export_to")
+    choice = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+    if not st.button("📦 Prepare export"):
+        return
+    export, extension, mime = EXPORT_FORMATS[choice]
+    progress = st.progress(0.0, text="Exporting your history...")
+    report = lambda done, total: progress.progress(done / total if total else 1.0, text=f"Exporting {done}/{total} documents...")
+    with tempfile.TemporaryFile() as out:
+        with span("export", format=extension):
+            count = export(email, out, *date_range(start_date, end_date), progress=report)
+        progress.empty()
+        if not count:
+            st.info("No uploads in this range.")
+            return
+        # Streamlit serves downloads from memory: the finished file is read
+        # back once, after rendering.
+        out.seek(0)
+        st.download_button(
+            label=f"⬇️ Download {count} document(s)",
+            data=out.read(),
+            file_name=f"legallite_history.{extension}",
+            mime=mime,
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"❌ AI Analysis failed: {e}"
 
+def history_page():
+    st.subheader("⏳ Your Uploaded History")
+    email = st.session_state.user_email
+    with st.expander("📦 Export history"):
+        export_history(email)
+    query = st.text_input("🔎 Search your uploads", placeholder="e.g. termination notice").strip()
+
+    # Keyset pagination: the cursor of every page visited so far, so Previous
+    # is just a pop and no page ever needs an OFFSET scan.
+    if "history_open" not in st.session_state:
+        st.session_state.history_open = set()
+    if st.session_state.get("history_query") != query:
+        st.session_state.history_query = query
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    if query:
+        rows = search_uploads(email, query, after=cursors[-1], limit=HISTORY_PAGE_SIZE + 1)
+    else:
+        rows = list_uploads(email, before=cursors[-1], limit=HISTORY_PAGE_SIZE + 1)
+    has_next = len(rows) > HISTORY_PAGE_SIZE
+    rows = rows[:HISTORY_PAGE_SIZE]
+
+    if not rows:
+        st.info("No matching uploads." if query else "No uploads yet.")
+        return
+
+    for row in rows:
+        if query:
+            upload_id, file_name, snippet, timestamp, _ = row
+            label = f"📄 {highlighted(file_name)} | 🕒 {timestamp}"
+        else:
+            upload_id, file_name, timestamp = row
+            label = f"📄 {file_name} | 🕒 {timestamp}"
+        with st.expander(label):
+            if query:
+                st.markdown(highlighted(snippet))
+            # Summaries are only read from the database once asked for.
+            if upload_id in st.session_state.history_open:
+                st.text(get_upload_summary(upload_id, email))
+            else:
+                st.button("📖 Show full summary", key=f"history_open_{upload_id}", on_click=open_summary, args=(upload_id,))
+
+    last = rows[-1]
+    next_cursor = (last[4], last[0]) if query else (last[2], last[0])
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(cursors) > 1 and st.button("◀️ Previous"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if has_next and st.button("Next ▶️"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 # --- MAIN APP ---
 def app_main():
@@ -228,7 +498,10 @@ def app_main():
         return
 
     st.sidebar.title("🔍 Navigation")
-    choice = st.sidebar.radio("Go to", [ "📑 Upload & Simplify","👤 Profile","🚨 Risky Terms Detector",  "⏳ My History", "❓ Help & Feedback"])
+    pages = [ "📑 Upload & Simplify","👤 Profile","🚨 Risky Terms Detector",  "⏳ My History", "❓ Help & Feedback"]
+    if st.session_state.user_email in admin_emails:
+        pages.append("📈 Metrics")
+    choice = st.sidebar.radio("Go to", pages)
 
     if choice == "👤 Profile":
         st.subheader("👤 Your Profile")
@@ -240,133 +513,14 @@ def app_main():
 
     if choice == "📑 Upload & Simplify":
         st.subheader("📑 Upload Your Legal Document (PDF)")
+        active_jobs_panel()
         uploaded_file = st.file_uploader("Select a legal PDF", type=["pdf"])
 
         if uploaded_file:
-            doc_name = uploaded_file.name.lower()
-            if uploaded_file.size > 3 * 1024 * 1024:
-                st.error("⚠️ File too large. Please upload PDFs under 3MB.")
-                return
-            try:
-                with st.spinner("Reading and extracting text..."):
-                    doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                    full_text = "".join([page.get_text() for page in doc])
-                st.success("✅ Text extracted from PDF.")
-                with st.expander("📄 View Extracted Text"):
-                    st.text_area("", full_text, height=300)
-            except Exception as e:
-                st.error(f"❌ Error reading PDF: {str(e)}")
-                return
-        
-        if st.button("🧐 Simplify Document"):
-                simplified = None
-                if st.session_state.mode == "Use Your Own OpenAI API Key":
-                     if not st.session_state.api_key:
-                         st.error("❌ API key not found. Please go back and enter your key.")
-                         return
-                         
-                     try:
-                         st.warning("✅ Entered OpenAI summarization block")
-                         from openai import OpenAI
-                         client=OpenAI(api_key = st.session_state.api_key)
-                         response = client.chat.completions.create(
-                             model = "gpt-3.5-turbo",
-                             messages=[
-                                 {"role":"system","content": "You are a legal assistant. Simplify legal documents in plain English."},
-                                 {"role": "user", "content": full_text}
-                             ]
-                         )
-                         simplified = response.choices[0].message.content
-                         
-                     except Exception as e:
-                         st.error(f"❌ OpenAI Error: {str(e)}")
-                         return
-                        
-                elif st.session_state.mode == "Use Open-Source AI via Hugging Face":
-                    prompt = f"""Summarize the following document in bullet points:\n\n{full_text}"""
-                    with st.spinner("Simplifying using Hugging Face..."):
-                        simplified = query_huggingface_api(prompt)
-
-                else:
-                    doc_name = uploaded_file.name.lower()
-                    if "rental" in doc_name:
-                        simplified = """
-This is a rental agreement made between Mr. Rakesh Kumar (the property owner) and Mr. Anil Reddy (the person renting).
-
-- The house is in Jubilee Hills, Hyderabad.
-- Rent is ₹18,000/month, paid by the 5th.
-- Anil pays a ₹36,000 security deposit.
-- The rental period is 11 months: from August 1, 2025, to June 30, 2026.
-- Either side can cancel the agreement with 1 month’s written notice.
-- Anil can't sub-rent the house to anyone else unless Rakesh agrees.
-
-In short: this document explains the rules of staying in the rented house, money terms, and how both sides can exit the deal.
-                    """
-                    elif "nda" in doc_name:
-                        simplified =  """
-This Non-Disclosure Agreement (NDA) is between TechNova Pvt. Ltd. and Mr. Kiran Rao.
-
-- Kiran will receive sensitive business information from TechNova.
-- He agrees to keep this confidential and not use it for anything other than their business discussions.
-- This includes technical data, strategies, client info, designs, etc.
-- He cannot share it, even after the project ends, for 3 years.
-- Exceptions: if info is public, received legally from others, or required by law.
-- If he breaks the agreement, TechNova can take legal action, including asking the court to stop him immediately.
-
-In short: Kiran must not reveal or misuse any business secrets he gets from TechNova during their potential partnership.
-                    """
-                    elif "employment" in doc_name:
-                        simplified =  """
-This is an official job contract between GlobalTech Ltd. and Ms. Priya Sharma.
-
-- Priya will join as a Senior Software Engineer from August 1, 2025.
-- She will earn Rs. 12,00,000/year, including bonuses and allowances.
-- She must work 40+ hours/week, either from office or remotely.
-- First 6 months = probation, 15-day notice for quitting or firing.
-- After that, it becomes 60-day notice.
-- She must not share company secrets or join rival companies for 1 year after leaving.
-- Any inventions or code she builds belong to the company.
-- She gets 20 paid leaves + public holidays.
-
-In short: This contract outlines Priya’s job, salary, rules during and after employment, and what happens if she quits or is fired.
-                    """
-                    else:
-                        simplified = "📜 Demo Summary: Unable to identify document type. This is a general contract."
-
-                if simplified:
-                        st.subheader("✅ Simplified Summary")
-                        st.success(simplified)
-                        save_upload(st.session_state.user_email, uploaded_file.name, simplified)
-                        # PDF download
-                        pdf_file = generate_pdf(simplified, uploaded_file.name)
-                        st.download_button(
-                            label="📥 Download Summary as PDF",
-                            data=pdf_file,
-                            file_name=f"simplified_{uploaded_file.name.replace('.pdf','')}.pdf",
-                            mime="application/pdf"
-                        )
-                         # 🎤 Voice Summary
-                        audio_file_path = generate_voice(simplified)
-                        if audio_file_path:
-                            with open(audio_file_path, "rb") as audio_file:
-                                audio_bytes = audio_file.read()
-                                st.audio(audio_bytes, format="audio/mp3")
-                                st.download_button(
-                                    label="🎧 Download Voice Summary",
-                                    data=audio_bytes,
-                                file_name="summary_audio.mp3",
-                                    mime="audio/mp3"
-                            )
+            simplify_upload(uploaded_file)
 
     if choice == "⏳ My History":
-        st.subheader("⏳ Your Uploaded History")
-        history = get_user_history(st.session_state.user_email)
-        if not history:
-            st.info("No uploads yet.")
-        else:
-            for file_name, summary, timestamp in history:
-                with st.expander(f"📄 {file_name} | 🕒 {timestamp}"):
-                    st.text(summary)
+        history_page()
                     
     if choice == "❓ Help & Feedback":
       st.subheader("❓ Help & Feedback")
@@ -376,6 +530,7 @@ In short: This contract outlines Priya’s job, salary, rules during and after e
           - *Demo Mode*: Uses sample summaries.
           - *OpenAI API*: Your key, high-quality output.
           - *Hugging Face*: Free, open-source summarization.
+          - *Offline*: Instant summary built from the document's key sentences, no internet needed.
       - **Suggestions or bugs?** Drop a message at `support@legalease.com`.
 
       ### 👀 How It Works?
@@ -421,32 +576,28 @@ In short: This contract outlines Priya’s job, salary, rules during and after e
         uploaded_file = st.file_uploader("Upload a legal PDF", type=["pdf"])
 
         if uploaded_file:
-            try:
-                # --- Extract PDF text ---
-                doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                full_text = "".join([page.get_text() for page in doc])
-
-                # --- Step 1: Keyword Scan ---
-                risky = find_risky_terms(full_text)
-                if risky:
-                    st.error("❗Risky Terms Found:")
-                    for term in risky:
-                        st.markdown(f"- **{term}**")
-                else:
-                    st.success("✅ No risky terms detected based on keyword scan.")
-
-                # --- Step 2: Optional AI Analysis ---
-                if st.session_state.mode == "Use Your Own OpenAI API Key" and st.session_state.api_key:
-                    if st.button("🤖 Run AI Risk Analysis"):
-                        with st.spinner("Running AI risk analysis..."):
-                            ai_result = ai_risk_analysis(full_text, st.session_state.api_key)
-                            st.subheader("🧠 AI Risk Analysis Result")
-                            st.write(ai_result)
-                elif st.session_state.mode != "Use Your Own OpenAI API Key":
-                    st.info("ℹ️ For AI-powered risk analysis, use the 'Use Your Own OpenAI API Key' mode.")
-
-            except Exception as e:
-                st.error(f"❌ Error reading PDF: {e}")
+            risk_scan_upload(uploaded_file)
+    if choice == "📈 Metrics":
+        metrics_page()
+
+# --- ADMIN METRICS ---
+def metrics_page():
+    st.subheader("📈 Stage Latency")
+    st.caption("Since this server started. Percentiles are estimated from histogram buckets.")
+    st.dataframe(metrics.stage_summary())
+
+    st.subheader(f"🐢 Recent Slow Requests (≥ {metrics.SLOW_REQUEST_SECONDS:g}s)")
+    slow = metrics.recent_slow_requests()
+    if not slow:
+        st.info("No slow requests yet.")
+    for item in slow:
+        with st.expander(f"{item['at']} | {item['request']} | {item['seconds']:.2f}s | {item.get('filename', '')} | {item.get('mode', '')}"):
+            st.write(f"**User:** `{item.get('user', '')}` — **Size:** {item.get('bytes', 0) / 1024:.0f} KB — **Pages:** {item.get('pages', '')}")
+            st.table([{"stage": stage, "seconds": seconds, **tags} for stage, seconds, tags in item["stages"]])
+
+    with st.expander("Prometheus export"):
+        st.code(metrics.render_prometheus(), language="text")
+
 # --- ROUTING ---
 if not st.session_state.logged_in:
     login_tab, signup_tab = st.tabs(["Login", "Sign Up"])
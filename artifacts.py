@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from metrics import timed
+from pipeline import generate_pdf
+
+# Voice and PDF downloads are rendered on a shared worker pool into in-memory
+# buffers, so the summary can be shown before they are ready. Jobs are keyed by
+# a hash of the summary: the same summary (from any session) reuses the result
+# or joins the job already running. Finished files are kept up to
+# MAX_CACHED_BYTES, least recently used first out.
+
+MAX_WORKERS = 4
+MAX_CACHED_BYTES = 256 * 1024 * 1024
+VOICE_TIMEOUT = 30   # seconds per gTTS request
+
+_pool = ThreadPoolExecutor(MAX_WORKERS, thread_name_prefix="artifacts")
+_jobs = OrderedDict()   # (kind, summary digest, extra) -> Future of bytes
+_sizes = {}             # key -> size of a finished job's bytes
+_cached_bytes = 0
+_lock = threading.Lock()
+
+
+def summary_digest(summary_text):
+    return hashlib.sha256(summary_text.encode("utf-8")).hexdigest()
+
+
+def _submit(key, fn, *args):
+    with _lock:
+        future = _jobs.get(key)
+        if future is not None:
+            _jobs.move_to_end(key)
+            return future
+        future = _jobs[key] = _pool.submit(fn, *args)
+    future.add_done_callback(lambda f: _finished(key, f))
+    return future
+
+
+# A failed (or timed out) job is dropped so the next request tries again; a
+# finished one counts towards MAX_CACHED_BYTES.
+def _finished(key, future):
+    global _cached_bytes
+    failed = future.cancelled() or future.exception() is not None
+    with _lock:
+        if _jobs.get(key) is not future:
+            return
+        if failed:
+            del _jobs[key]
+            return
+        _sizes[key] = len(future.result())
+        _cached_bytes += _sizes[key]
+        while _cached_bytes > MAX_CACHED_BYTES:
+            evicted, _ = _jobs.popitem(last=False)
+            _cached_bytes -= _sizes.pop(evicted, 0)
+
+
+# --- RENDERERS ---
+@timed("render_voice")
+def render_voice(summary_text):
+    from gtts import gTTS   # 🎤 Voice summary; loaded on first use
+    buffer = BytesIO()
+    gTTS(summary_text, lang='en', timeout=VOICE_TIMEOUT).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+@timed("render_pdf")
+def render_pdf(summary_text, filename):
+    return generate_pdf(summary_text, filename).getvalue()
+
+
+# --- JOBS ---
+def voice_job(summary_text):
+    return _submit(("voice", summary_digest(summary_text), ""), render_voice, summary_text)
+
+
+def pdf_job(summary_text, filename):
+    return _submit(("pdf", summary_digest(summary_text), filename), render_pdf, summary_text, filename)
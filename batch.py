@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from db import init_db, flush_uploads, save_upload
+from extraction import pdf_digest
+from pipeline import (
+    DEMO_MODE, OPENAI_MODE, HUGGING_FACE_MODE, OFFLINE_MODE,
+    generate_pdf, risk_report, scan_document, summarize_document,
+)
+from risk import RiskScanner, load_lexicon
+from scheduler import PRIORITY_BACKGROUND, caller
+
+# Headless LegalLite: run the simplify + risk pipeline over a folder of PDFs.
+#
+#   python batch.py contracts/ out/ --mode huggingface --hf-token $HF_TOKEN
+#
+# Extraction and risk scanning run in a process pool, summarization and output
+# writing in a thread pool. Finished documents are appended to
+# out/checkpoint.jsonl, so re-running the same command resumes where it stopped.
+
+MODES = {"demo": DEMO_MODE, "openai": OPENAI_MODE, "huggingface": HUGGING_FACE_MODE, "offline": OFFLINE_MODE}
+CHECKPOINT_FILE = "checkpoint.jsonl"
+REPORT_FILE = "report.json"
+
+# --- CPU STAGE (worker processes) ---
+_scanner = None
+
+def _init_worker(lexicon_path):
+    global _scanner
+    _scanner = RiskScanner(load_lexicon(lexicon_path)) if lexicon_path else RiskScanner()
+
+def analyze_file(path):
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    pages, hits = scan_document(pdf_bytes, _scanner)
+    return {
+        "path": path,
+        "digest": pdf_digest(pdf_bytes),
+        "pages": len(pages),
+        "text": "".join(pages),
+        "report": risk_report(hits),
+        "cpu_seconds": time.perf_counter() - started,
+    }
+
+# --- I/O STAGE (threads) ---
+def finish_document(doc, rel_path, args):
+    started = time.perf_counter()
+    out_dir = os.path.join(args.output, os.path.dirname(rel_path))
+    os.makedirs(out_dir, exist_ok=True)
+    name = os.path.basename(rel_path)
+    stem = os.path.splitext(name)[0]
+    with caller(args.email or "batch", PRIORITY_BACKGROUND):
+        summary = summarize_document(doc["text"], MODES[args.mode], doc_name=name, api_key=args.api_key, hf_token=args.hf_token,
+                                     fallback=args.fallback)
+
+    with open(os.path.join(out_dir, f"{stem}.summary.txt"), "w", encoding="utf-8") as f:
+        f.write(summary)
+    with open(os.path.join(out_dir, f"{stem}.risks.json"), "w", encoding="utf-8") as f:
+        json.dump(doc["report"], f, indent=2, ensure_ascii=False)
+    if not args.no_pdf:
+        with open(os.path.join(out_dir, f"simplified_{stem}.pdf"), "wb") as f:
+            f.write(generate_pdf(summary, name).getvalue())
+    if args.email:
+        save_upload(args.email, name, summary)
+    return time.perf_counter() - started
+
+# --- CHECKPOINTS ---
+def load_checkpoint(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # a line cut short by a crash
+                if entry.get("status") == "ok":
+                    done.add(entry["path"])
+    return done
+
+class Checkpoint:
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, **entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+# --- RUNNER ---
+def find_pdfs(in_dir):
+    found = []
+    for root, _, files in os.walk(in_dir):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                found.append(os.path.relpath(os.path.join(root, name), in_dir))
+    return sorted(found)
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    init_db()   # uploads table and the shared model result cache
+
+    checkpoint_path = os.path.join(args.output, CHECKPOINT_FILE)
+    done = load_checkpoint(checkpoint_path)
+    todo = [p for p in find_pdfs(args.input) if p not in done]
+    print(f"{len(done)} already done, {len(todo)} to process")
+
+    checkpoint = Checkpoint(checkpoint_path)
+    stats = {"ok": 0, "failed": 0, "pages": 0, "cpu_seconds": 0.0, "io_seconds": 0.0}
+    started = time.perf_counter()
+    window = args.workers * 4   # documents held in memory between the two stages
+
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.lexicon,)) as cpu_pool, \
+            ThreadPoolExecutor(args.io_workers) as io_pool:
+        pending = {}
+        remaining = iter(todo)
+
+        def fill():
+            for rel_path in remaining:
+                future = cpu_pool.submit(analyze_file, os.path.join(args.input, rel_path))
+                pending[future] = ("cpu", rel_path, None)
+                if len(pending) >= window:
+                    break
+
+        fill()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, rel_path, doc = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    checkpoint.record(path=rel_path, status="failed", stage=stage, error=str(e))
+                    print(f"✗ {rel_path}: {e}", file=sys.stderr)
+                    continue
+                if stage == "cpu":
+                    stats["cpu_seconds"] += result["cpu_seconds"]
+                    pending[io_pool.submit(finish_document, result, rel_path, args)] = ("io", rel_path, result)
+                else:
+                    stats["ok"] += 1
+                    stats["pages"] += doc["pages"]
+                    stats["io_seconds"] += result
+                    checkpoint.record(path=rel_path, status="ok", digest=doc["digest"], pages=doc["pages"],
+                                      risk_score=doc["report"]["score"], finished=datetime.now().isoformat())
+            fill()
+
+    flush_uploads()
+    checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    report = dict(
+        stats,
+        mode=args.mode,
+        elapsed_seconds=elapsed,
+        docs_per_second=stats["ok"] / elapsed if elapsed else 0.0,
+        pages_per_second=stats["pages"] / elapsed if elapsed else 0.0,
+    )
+    with open(os.path.join(args.output, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"{stats['ok']} ok, {stats['failed']} failed, {stats['pages']} pages in {elapsed:.1f}s "
+          f"({report['docs_per_second']:.2f} docs/s, {report['pages_per_second']:.1f} pages/s)")
+    return 1 if stats["failed"] else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the LegalLite pipeline over a directory of PDFs.")
+    parser.add_argument("input", help="directory searched recursively for PDFs")
+    parser.add_argument("output", help="directory for summaries, risk reports, PDFs and the checkpoint")
+    parser.add_argument("--mode", choices=sorted(MODES), default="demo")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""))
+    parser.add_argument("--hf-token", default=os.environ.get("HF_TOKEN", ""))
+    parser.add_argument("--lexicon", help="JSON risk lexicon (term -> weight) merged into the defaults")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction/scan processes")
+    parser.add_argument("--io-workers", type=int, default=8, help="summarization/output threads")
+    parser.add_argument("--email", help="also save each summary to this user's upload history")
+    parser.add_argument("--no-pdf", action="store_true", help="skip rendering summary PDFs")
+    parser.add_argument("--fallback", action="store_true", help="use the offline summary when the API times out")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
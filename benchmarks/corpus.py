@@ -0,0 +1,76 @@
+import os
+import random
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# Synthetic legal contracts for benchmarking, drawn with ReportLab the same way
+# generate_pdf() draws summaries. Clauses mix plain boilerplate with the risky
+# terms the scanner looks for, so every stage has realistic work to do.
+
+CORPUS_DIR = os.path.join(".cache", "bench", "corpus")
+
+PARTIES = ["GlobalTech Ltd.", "TechNova Pvt. Ltd.", "Mr. Rakesh Kumar", "Ms. Priya Sharma", "Acme Holdings Inc."]
+
+CLAUSES = [
+    "The {a} shall pay the {b} a monthly fee of Rs. {n},000 on or before the 5th day of each month.",
+    "A late fee of {n} percent shall apply to any amount not paid within fifteen days of the due date.",
+    "Either party may seek termination of this agreement by giving {n} days written notice to the other party.",
+    "Any breach of the obligations set out in this clause shall entitle the {b} to liquidated damages.",
+    "This agreement shall be subject to automatic renewal for successive terms of {n} months unless cancelled.",
+    "All disputes shall be resolved by binding arbitration seated in Hyderabad under the rules then in force.",
+    "The {a} agrees to a non-compete period of {n} months after the end of the engagement.",
+    "All intellectual property created by the {a} in the course of the services vests in the {b}.",
+    "The governing law of this agreement is the law of India and the courts of Hyderabad have exclusive jurisdiction.",
+    "The {b} may suspend the services without notice if the {a} fails to comply with clause {n}.",
+    "Each party shall keep the other party's confidential information secret and use it only for the purpose.",
+    "The {a} shall maintain adequate insurance and provide certificates of cover on request.",
+    "Notices under this agreement shall be in writing and delivered by hand, courier or registered post.",
+    "Nothing in this agreement creates a partnership, agency or employment relationship between the parties.",
+    "If any provision is held invalid, the remaining provisions shall continue in full force and effect.",
+]
+
+LINES_PER_PAGE = 44
+LINE_CHARS = 95
+
+
+def contract_lines(pages, seed=0):
+    rng = random.Random(seed)
+    a, b = rng.sample(PARTIES, 2)
+    lines = [f"MASTER SERVICES AGREEMENT between {a} and {b}", ""]
+    clause_no = 1
+    while len(lines) < pages * LINES_PER_PAGE:
+        text = rng.choice(CLAUSES).format(a=a, b=b, n=rng.randint(1, 90))
+        text = f"{clause_no}. {text} " + " ".join(rng.choice(CLAUSES).format(a=a, b=b, n=rng.randint(1, 90)) for _ in range(rng.randint(0, 2)))
+        while text:
+            cut = text.rfind(" ", 0, LINE_CHARS) if len(text) > LINE_CHARS else len(text)
+            lines.append(text[:cut])
+            text = text[cut:].lstrip()
+        lines.append("")
+        clause_no += 1
+    return lines[:pages * LINES_PER_PAGE]
+
+
+def write_contract(path, pages, seed=0):
+    c = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    margin = 40
+    lines = contract_lines(pages, seed)
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        c.setFont("Helvetica", 10)
+        y = height - margin
+        for line in lines[start:start + LINES_PER_PAGE]:
+            c.drawString(margin, y, line)
+            y -= 16
+        c.showPage()
+    c.save()
+
+
+# Returns the path of a synthetic contract with this many pages, generating it
+# once and reusing it on later runs.
+def contract_path(pages, seed=0, corpus_dir=CORPUS_DIR):
+    os.makedirs(corpus_dir, exist_ok=True)
+    path = os.path.join(corpus_dir, f"contract_{pages}p_{seed}.pdf")
+    if not os.path.exists(path):
+        write_contract(path, pages, seed)
+    return path
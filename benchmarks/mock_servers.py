@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hf_stub import StubConfig, start_stub_server
+
+# Local stand-ins for the model APIs with configurable latency. The Hugging
+# Face one is hf_stub; the OpenAI one speaks just enough of
+# /v1/chat/completions (plain and streamed) for the openai client. With
+# max_concurrent set it answers 429 beyond that many requests in flight, like
+# a provider's rate limit.
+
+
+def start_huggingface(latency=0.0):
+    server = start_stub_server(config=StubConfig(latency=latency))
+    return server, f"http://127.0.0.1:{server.server_port}/models"
+
+
+def _openai_handler(latency, first_token_latency, words, max_concurrent):
+    in_flight = [0]
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with lock:
+                limited = max_concurrent is not None and in_flight[0] >= max_concurrent
+                if not limited:
+                    in_flight[0] += 1
+            if limited:
+                return self._rate_limited()
+            try:
+                self._answer(request)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        def _rate_limited(self):
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _answer(self, request):
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            answer = prompt.split()[:words]
+            if request.get("stream"):
+                return self._stream(answer)
+
+            time.sleep(latency)
+            body = json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(answer)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, answer):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            time.sleep(first_token_latency)
+            per_token = max(latency - first_token_latency, 0) / max(len(answer), 1)
+            for word in answer:
+                chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": "bench", "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(per_token)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def start_openai(latency=0.0, first_token_latency=0.0, words=60, max_concurrent=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _openai_handler(latency, first_token_latency, words, max_concurrent))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
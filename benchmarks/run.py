@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.corpus import contract_path
+from benchmarks.mock_servers import start_huggingface, start_openai
+
+# Times each stage of LegalLite on synthetic contracts and local model stubs.
+#
+#   python -m benchmarks.run                              # default sizes
+#   python -m benchmarks.run --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run --compare benchmarks/baseline.json
+#
+# Every result reports p50/p95/p99 latency and throughput. --compare exits
+# with status 1 if any p50 is more than --threshold slower than the baseline.
+
+STAGES = ["extract", "risk", "pdf", "db", "simplify", "scheduler"]
+
+
+# --- STATS ---
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def measure(fn, repeat, warmup=1, work=1, unit="ops"):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize_samples(samples, work, unit)
+
+
+def summarize_samples(samples, work=1, unit="ops"):
+    mean = sum(samples) / len(samples)
+    return {
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "mean": mean,
+        "throughput": work / mean if mean else 0.0,
+        "unit": f"{unit}/s",
+        "samples": len(samples),
+    }
+
+
+# --- STAGES ---
+def bench_extract(results, pages_list, repeat):
+    import fitz
+    from extraction import ExtractionCache, extract_pages
+    import extraction
+
+    for pages in pages_list:
+        path = contract_path(pages)
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+
+        def cold():
+            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                return [page.get_text() for page in doc]
+
+        results[f"extract/pymupdf/{pages}p"] = measure(cold, repeat, work=pages, unit="pages")
+        extraction.extraction_cache = ExtractionCache(tempfile.mkdtemp(prefix="bench-extract-"))
+        results[f"extract/cached/{pages}p"] = measure(lambda: extract_pages(pdf_bytes), repeat, work=pages, unit="pages")
+
+
+def _contract_text(pages):
+    import fitz
+    with fitz.open(contract_path(pages)) as doc:
+        return [page.get_text() for page in doc]
+
+
+def bench_risk(results, pages_list, repeat):
+    from risk import default_scanner, find_risky_terms
+    for pages in pages_list:
+        page_texts = _contract_text(pages)
+        text = "".join(page_texts)
+        results[f"risk/find_risky_terms/{pages}p"] = measure(lambda: find_risky_terms(text), repeat, work=pages, unit="pages")
+        results[f"risk/scan_with_offsets/{pages}p"] = measure(lambda: default_scanner.scan(page_texts), repeat, work=pages, unit="pages")
+
+
+def bench_pdf(results, pages_list, repeat):
+    from pipeline import generate_pdf
+    for pages in pages_list:
+        text = "".join(_contract_text(pages))
+        results[f"pdf/generate_pdf/{pages}p"] = measure(lambda: generate_pdf(text, "bench.pdf"), repeat, work=pages, unit="pages")
+
+
+def bench_db(results, rows_list, repeat):
+    import db
+    for rows in rows_list:
+        db.use_database(os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "users.db"))
+        db.init_db()
+        heavy_rows = max(100, rows // 100)
+        batch = []
+        for i in range(rows):
+            email = "heavy@bench" if i < heavy_rows else f"user{i % 5000}@bench"
+            batch.append((email, f"contract_{i}.pdf", f"Summary {i} " * 20, f"2025-01-01 00:{(i // 60) % 60:02d}:{i % 60:02d}"))
+            if len(batch) == 10000:
+                db.insert_uploads(batch)
+                batch = []
+        if batch:
+            db.insert_uploads(batch)
+
+        def write():
+            db.save_upload("writer@bench", "contract.pdf", "Summary " * 50)
+            db.flush_uploads()
+
+        results[f"db/save_upload/{rows}rows"] = measure(write, repeat, unit="writes")
+        results[f"db/get_user_history/{rows}rows"] = measure(
+            lambda: db.get_user_history("heavy@bench"), repeat, work=heavy_rows, unit="rows")
+        results[f"db/list_uploads/{rows}rows"] = measure(
+            lambda: db.list_uploads("heavy@bench"), repeat, work=db.HISTORY_PAGE_SIZE, unit="rows")
+        results[f"db/search_uploads/{rows}rows"] = measure(
+            lambda: db.search_uploads("heavy@bench", "summary"), repeat, work=db.HISTORY_PAGE_SIZE, unit="rows")
+
+
+def bench_simplify(results, pages_list, repeat, latency):
+    import db
+    import pipeline
+    from hf_client import InferenceClient
+
+    db.use_database(os.path.join(tempfile.mkdtemp(prefix="bench-simplify-"), "users.db"))
+    db.init_db()
+    _, hf_url = start_huggingface(latency=latency)
+    _, openai_url = start_openai(latency=latency, first_token_latency=latency / 4)
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    # Clients are cached per key and keep the base URL they were built with.
+    pipeline._openai_clients.clear()
+    pipeline.inference_client = InferenceClient(hf_url)
+
+    for pages in pages_list:
+        path = contract_path(pages)
+        for mode, label in [(pipeline.HUGGING_FACE_MODE, "huggingface"), (pipeline.OPENAI_MODE, "openai")]:
+            def simplify():
+                import fitz
+                with fitz.open(path) as doc:
+                    # A fresh nonce per run keeps the result cache cold.
+                    text = f"Ref {uuid.uuid4()}\n\n" + "".join(page.get_text() for page in doc)
+                summary = pipeline.summarize_document(text, mode, api_key="bench", hf_token="bench")
+                pipeline.generate_pdf(summary, "bench.pdf")
+                db.save_upload("bench@bench", "bench.pdf", summary)
+
+            results[f"simplify/{label}/{pages}p"] = measure(simplify, repeat, work=pages, unit="pages")
+    db.flush_uploads()
+
+
+# One user fires `burst` OpenAI calls at once, then `users` others send one
+# each, against a mock that answers 429 above `provider_limit` requests in
+# flight. Reported: the other users' latency and the calls that failed, with
+# and without the shared scheduler in front.
+def bench_scheduler(results, users, burst, latency, provider_limit=8):
+    import threading
+
+    import db
+    import pipeline
+    from scheduler import LLMScheduler, caller
+
+    db.use_database(os.path.join(tempfile.mkdtemp(prefix="bench-scheduler-"), "users.db"))
+    db.init_db()
+    _, openai_url = start_openai(latency=latency, max_concurrent=provider_limit)
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    pipeline._openai_clients.clear()
+    schedulers = {
+        "direct": LLMScheduler(max_concurrent={"openai": 10_000}, backend_rpm={}, key_rpm=0),
+        "scheduled": LLMScheduler(max_concurrent={"openai": provider_limit}, backend_rpm={}, key_rpm=0),
+    }
+    original = pipeline.llm_scheduler
+    try:
+        for label, scheduler in schedulers.items():
+            pipeline.llm_scheduler = scheduler
+            latencies = []
+            errors = []
+
+            def call(user, record):
+                started = time.perf_counter()
+                try:
+                    with caller(user):
+                        pipeline.query_openai("bench", pipeline.SIMPLIFY_PROMPT, f"Ref {uuid.uuid4()} clause text")
+                except Exception as e:
+                    errors.append(type(e).__name__)
+                    return
+                if record:
+                    latencies.append(time.perf_counter() - started)
+
+            threads = [threading.Thread(target=call, args=("heavy@bench", False)) for _ in range(burst)]
+            for thread in threads:
+                thread.start()
+            time.sleep(latency / 10)
+            light = [threading.Thread(target=call, args=(f"user{i}@bench", True)) for i in range(users)]
+            for thread in light:
+                thread.start()
+            for thread in threads + light:
+                thread.join()
+
+            result = summarize_samples(latencies or [0.0], work=len(latencies), unit="calls")
+            result["errors"] = len(errors)
+            results[f"scheduler/{label}/other_users"] = result
+    finally:
+        pipeline.llm_scheduler = original
+
+
+# --- REPORTING ---
+def print_results(results, baseline=None, threshold=0.25):
+    regressions = []
+    print(f"{'benchmark':44} {'p50':>10} {'p95':>10} {'p99':>10} {'throughput':>16}  vs baseline")
+    for name, r in results.items():
+        line = (f"{name:44} {r['p50'] * 1000:9.2f}ms {r['p95'] * 1000:9.2f}ms {r['p99'] * 1000:9.2f}ms "
+                f"{r['throughput']:10.1f} {r['unit']:>5}")
+        base = (baseline or {}).get(name)
+        if base:
+            ratio = r["p50"] / base["p50"] if base["p50"] else 1.0
+            flag = "  ⚠️ REGRESSION" if ratio > 1 + threshold else ""
+            if flag:
+                regressions.append(name)
+            line += f"  {ratio:5.2f}x{flag}"
+        if r.get("errors"):
+            line += f"  ({r['errors']} failed)"
+        print(line)
+    return regressions
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the LegalLite pipeline.")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {STAGES}")
+    parser.add_argument("--pages", type=parse_ints, default=[1, 10, 100, 500])
+    parser.add_argument("--simplify-pages", type=parse_ints, default=[1, 10, 50])
+    parser.add_argument("--db-rows", type=parse_ints, default=[10_000, 100_000], help="e.g. 10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--users", type=int, default=4, help="users competing with one bursty user (scheduler stage)")
+    parser.add_argument("--burst", type=int, default=32, help="calls the bursty user fires at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per mock model response")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    results = {}
+    if "extract" in stages:
+        bench_extract(results, args.pages, args.repeat)
+    if "risk" in stages:
+        bench_risk(results, args.pages, args.repeat)
+    if "pdf" in stages:
+        bench_pdf(results, args.pages, args.repeat)
+    if "db" in stages:
+        bench_db(results, args.db_rows, args.repeat)
+    if "simplify" in stages:
+        bench_simplify(results, args.simplify_pages, args.repeat, args.latency)
+    if "scheduler" in stages:
+        bench_scheduler(results, args.users, args.burst, max(args.latency, 0.2))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = print_results(results, baseline, args.threshold)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
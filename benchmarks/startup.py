@@ -0,0 +1,165 @@
+import argparse
+import ast
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run import percentile
+
+# Cold-start profile of the Streamlit app: how long a fresh worker takes to
+# render the login form, which heavy libraries it loaded to get there, and
+# `python -X importtime` for the modules app.py imports.
+#
+#   python -m benchmarks.startup                  # this checkout
+#   python -m benchmarks.startup --ref HEAD~1     # side by side with an older commit
+#
+# Every run is a new Python process, so nothing is warm but the OS page cache.
+# The app runs in a scratch copy with its own users.db and caches, never in
+# the checkout itself.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["fitz", "reportlab", "gtts", "requests", "numpy", "openai", "tiktoken", "http.server"]
+
+_RENDER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+rendered = time.perf_counter()
+at.run()
+rerun = time.perf_counter()
+print(json.dumps({
+    "import_streamlit": imported - started,
+    "first_render": rendered - imported,
+    "rerun": rerun - rendered,
+    "login_form": any(b.label == "Login" for b in at.button),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+# --- MEASUREMENTS ---
+def render_once(root):
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", _RENDER_SCRIPT % HEAVY_MODULES], cwd=root,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - started
+    return result
+
+
+# The modules app.py imports at the top level, in order.
+def app_imports(root):
+    with open(os.path.join(root, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+# (module, self µs, cumulative µs) for modules imported directly by app.py.
+def import_profile(root):
+    code = "; ".join(f"import {m}" for m in app_imports(root))
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=root,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit() or name.startswith("  "):
+            continue   # header line, or a nested import
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(root, runs):
+    renders = [render_once(root) for _ in range(runs)]
+    summary = {
+        key: percentile([r[key] for r in renders], 0.5)
+        for key in ("process", "import_streamlit", "first_render", "rerun")
+    }
+    summary["login_form"] = all(r["login_form"] for r in renders)
+    summary["loaded"] = renders[-1]["loaded"]
+    summary["imports"] = import_profile(root)
+    return summary
+
+
+# A scratch copy of the working tree (uncommitted changes included, ignored
+# files such as users.db and .cache/ left out).
+def profile_current(runs):
+    path = tempfile.mkdtemp(prefix="legallite-startup-")
+    files = subprocess.run(["git", "-C", ROOT, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                           capture_output=True, text=True, check=True).stdout.split("\0")
+    try:
+        for name in filter(None, files):
+            source = os.path.join(ROOT, name)
+            if not os.path.isfile(source):
+                continue   # deleted but not yet committed
+            target = os.path.join(path, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+        return profile(path, runs)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# A throwaway checkout of `ref`, with its own users.db and caches.
+def profile_ref(ref, runs):
+    path = tempfile.mkdtemp(prefix="legallite-startup-")
+    subprocess.run(["git", "-C", ROOT, "worktree", "add", "--detach", path, ref],
+                   capture_output=True, check=True)
+    try:
+        return profile(path, runs)
+    finally:
+        subprocess.run(["git", "-C", ROOT, "worktree", "remove", "--force", path], capture_output=True)
+
+
+# --- REPORTING ---
+def print_report(results, top):
+    names = list(results)
+    print(f"{'median of runs':28}" + "".join(f"{name:>16}" for name in names))
+    for key, label in [("process", "process start to login form"), ("import_streamlit", "  import streamlit"),
+                       ("first_render", "  first script run"), ("rerun", "  rerun (interaction)")]:
+        print(f"{label:28}" + "".join(f"{results[name][key] * 1000:14.1f}ms" for name in names))
+    print(f"{'login form rendered':28}" + "".join(f"{str(results[name]['login_form']):>16}" for name in names))
+    for name in names:
+        loaded = ", ".join(results[name]["loaded"]) or "none"
+        print(f"\nheavy modules loaded before login ({name}): {loaded}")
+
+    for name in names:
+        print(f"\nslowest imports of app.py ({name}, -X importtime, cumulative):")
+        for module, self_us, cumulative_us in sorted(results[name]["imports"], key=lambda r: -r[2])[:top]:
+            print(f"  {module:36} {cumulative_us / 1000:9.1f}ms  (self {self_us / 1000:.1f}ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile LegalLite's cold start.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per checkout")
+    parser.add_argument("--ref", help="also profile this git ref, e.g. HEAD~1")
+    parser.add_argument("--top", type=int, default=15, help="imports listed per checkout")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    results = {"current": profile_current(args.runs)}
+    if args.ref:
+        results[args.ref] = profile_ref(args.ref, args.runs)
+    print_report(results, args.top)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,842 @@
+import atexit
+import json
+import logging
+import queue
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+from metrics import span, timed
+
 DB_NAME = "users.db"
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+WRITE_BATCH_SIZE = 200
+WRITE_LINGER_SECONDS = 0.02   # how long the writer waits to fill a batch
+
+log = logging.getLogger(__name__)
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",          # readers never block the writer
+    "PRAGMA synchronous=NORMAL",        # safe with WAL, far fewer fsyncs
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",         # 16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA foreign_keys=ON",
+]
+
+# --- CONNECTION POOL ---
+# Streamlit runs every session (and every rerun) on its own thread, so
+# connections are pooled per process and lent out to whichever thread needs one.
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+
+_pool = ConnectionPool(DB_NAME)
+
+
+def connection():
+    return _pool.connection()
+
 
-# Create tables if not exists
+# --- SCHEMA MIGRATIONS ---
+# Each entry upgrades the schema by one version; PRAGMA user_version records
+# how far a database file has been migrated.
+MIGRATIONS = [
+    [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_email TEXT NOT NULL,
+            filename TEXT,
+            summary TEXT,
+            timestamp TEXT
+        )''',
+    ],
+    [
+        "CREATE INDEX IF NOT EXISTS idx_uploads_user_timestamp ON uploads (user_email, timestamp DESC)",
+    ],
+    [
+        '''CREATE TABLE IF NOT EXISTS result_cache (
+            cache_key TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_result_cache_last_used ON result_cache (last_used)",
+    ],
+    [
+        # Full-text index over history. It reads its text from a view, so
+        # summaries are not stored twice, and indexes each row's owner as one
+        # opaque token so a search only walks that user's postings. The
+        # triggers keep it in step with uploads.
+        """CREATE VIEW IF NOT EXISTS uploads_search_source AS
+            SELECT id, filename, summary, 'u' || hex(user_email) AS owner FROM uploads""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS uploads_fts USING fts5(
+            filename, summary, owner,
+            content='uploads_search_source', content_rowid='id', tokenize='porter unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS uploads_fts_insert AFTER INSERT ON uploads BEGIN
+            INSERT INTO uploads_fts (rowid, filename, summary, owner)
+            VALUES (new.id, new.filename, new.summary, 'u' || hex(new.user_email));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS uploads_fts_delete AFTER DELETE ON uploads BEGIN
+            INSERT INTO uploads_fts (uploads_fts, rowid, filename, summary, owner)
+            VALUES ('delete', old.id, old.filename, old.summary, 'u' || hex(old.user_email));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS uploads_fts_update AFTER UPDATE ON uploads BEGIN
+            INSERT INTO uploads_fts (uploads_fts, rowid, filename, summary, owner)
+            VALUES ('delete', old.id, old.filename, old.summary, 'u' || hex(old.user_email));
+            INSERT INTO uploads_fts (rowid, filename, summary, owner)
+            VALUES (new.id, new.filename, new.summary, 'u' || hex(new.user_email));
+        END""",
+        "INSERT INTO uploads_fts (uploads_fts) VALUES ('rebuild')",
+        # Keyset pagination orders by (timestamp, id) within a user.
+        "CREATE INDEX IF NOT EXISTS idx_uploads_user_timestamp_id ON uploads (user_email, timestamp, id)",
+        "DROP INDEX IF EXISTS idx_uploads_user_timestamp",
+    ],
+    [
+        # Clause index for incremental re-analysis of revised contracts. Clause
+        # text is stored once per distinct clause; each upload lists its clauses
+        # in order with the risky terms found in them.
+        "ALTER TABLE uploads ADD COLUMN document_summary TEXT",
+        """CREATE TABLE IF NOT EXISTS clauses (
+            digest TEXT PRIMARY KEY,
+            text TEXT NOT NULL
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS upload_clauses (
+            upload_id INTEGER NOT NULL REFERENCES uploads (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            number TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            risk_terms TEXT NOT NULL,
+            PRIMARY KEY (upload_id, position)
+        ) WITHOUT ROWID""",
+    ],
+    [
+        # Near-duplicate template index: a MinHash signature per document and
+        # its LSH band buckets, so a lookup is one index probe per band.
+        """CREATE TABLE IF NOT EXISTS templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            filename TEXT,
+            signature BLOB NOT NULL,
+            details TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS template_bands (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            template_id INTEGER NOT NULL REFERENCES templates (id) ON DELETE CASCADE,
+            PRIMARY KEY (band, bucket, template_id)
+        ) WITHOUT ROWID""",
+    ],
+    [
+        # Background jobs (jobs.py). params and result are JSON; pinned_to
+        # names the process that holds a job's API key in memory, if any.
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_email TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            filename TEXT,
+            digest TEXT NOT NULL,
+            params TEXT NOT NULL,
+            pinned_to TEXT,
+            worker TEXT,
+            stage TEXT,
+            partial TEXT,
+            result TEXT,
+            error TEXT,
+            upload_id INTEGER,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            heartbeat REAL,
+            finished_at REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_email, created_at)",
+    ],
+    [
+        # The summary mode an upload was simplified in; revisions only build
+        # on an upload summarized in the same mode. Older rows stay NULL.
+        "ALTER TABLE uploads ADD COLUMN mode TEXT",
+    ],
+    [
+        # At most one queued or running job per (user, kind, input, params),
+        # so two submits racing each other cannot both insert. Duplicates
+        # left by older versions are cancelled first.
+        """UPDATE jobs SET status='cancelled', finished_at=CAST(strftime('%s', 'now') AS REAL)
+           WHERE status IN ('queued', 'running') AND rowid NOT IN (
+               SELECT MIN(rowid) FROM jobs WHERE status IN ('queued', 'running')
+               GROUP BY user_email, kind, digest, params)""",
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs (user_email, kind, digest, params)
+           WHERE status IN ('queued', 'running')""",
+    ],
+    [
+        # Extraction progress of a running job, for the page's progress bar.
+        "ALTER TABLE jobs ADD COLUMN pages_done INTEGER",
+        "ALTER TABLE jobs ADD COLUMN page_count INTEGER",
+    ],
+    [
+        # Processes running job workers and when each was last seen. A job
+        # pinned to a process that stopped reporting can never be claimed.
+        """CREATE TABLE IF NOT EXISTS job_processes (
+            id TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        ) WITHOUT ROWID""",
+    ],
+]
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+# Each step runs in its own BEGIN IMMEDIATE transaction, which holds the
+# write lock while user_version is read again, so a step is applied exactly
+# once even when the app and `python jobs.py` start together, and a crash
+# part way through a step rolls all of it back. The sqlite3 module would
+# commit before DDL on its own, hence isolation_level=None.
+def migrate(conn):
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.execute("COMMIT")
+                    return
+                for statement in MIGRATIONS[version]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={version + 1}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = isolation_level
+
+
+# Point this process at another database file (benchmarks, tools); the next
+# init_db() migrates it.
+def use_database(path):
+    global _pool, _initialized
+    flush_uploads()
+    with _init_lock:
+        _pool = ConnectionPool(path)
+        _initialized = False
+
+
+# Create tables and indexes; only the first call in a process touches the schema.
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS uploads (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_email TEXT NOT NULL,
-        filename TEXT,
-        summary TEXT,
-        timestamp TEXT
-    )''')
-
-    conn.commit()
-    conn.close()
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        with connection() as conn:
+            migrate(conn)
+        _initialized = True
+
+
+# --- BATCHED UPLOAD WRITER ---
+# save_upload() only enqueues; a single writer thread commits queued rows in
+# batches, so concurrent sessions never fight over SQLite's write lock.
+class UploadWriter:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, row):
+        self._ensure_started()
+        self._queue.put(row)
+
+    def flush(self):
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="upload-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < WRITE_BATCH_SIZE:
+                    batch.append(self._queue.get(timeout=WRITE_LINGER_SECONDS))
+            except queue.Empty:
+                pass
+            try:
+                insert_uploads(batch)
+            except Exception:
+                log.exception("Failed to save %d upload(s)", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_writer = UploadWriter()
+atexit.register(_writer.flush)
+
+
+def flush_uploads():
+    _writer.flush()
+
 
 # Register user
+@timed("db.register_user")
 def register_user(email, password):
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute("INSERT INTO users (email, password) VALUES (?, ?)", (email, password))
-        conn.commit()
+        with connection() as conn, conn:
+            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)", (email, password))
         return True
-    except:
+    except sqlite3.IntegrityError:
         return False
 
 # Login check
+@timed("db.login_user")
 def login_user(email, password):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE email=? AND password=?", (email, password))
-    return c.fetchone()
+    with connection() as conn:
+        return conn.execute("SELECT * FROM users WHERE email=? AND password=?", (email, password)).fetchone()
 
 # Save upload history
+@timed("db.save_upload")
 def save_upload(email, filename, summary):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO uploads (user_email, filename, summary, timestamp) VALUES (?, ?, ?, ?)",
-              (email, filename, summary, timestamp))
-    conn.commit()
-    conn.close()
+    _writer.submit((email, filename, summary, timestamp))
+
+# Insert many (user_email, filename, summary, timestamp) rows in one transaction
+@timed("db.insert_uploads")
+def insert_uploads(rows):
+    with connection() as conn, conn:
+        conn.executemany("INSERT INTO uploads (user_email, filename, summary, timestamp) VALUES (?, ?, ?, ?)", rows)
+
+# Save one upload with its clauses right away and return its id. clauses are
+# (position, number, digest, text, risk_terms) tuples.
+@timed("db.insert_upload_with_clauses")
+def insert_upload_with_clauses(email, filename, summary, document_summary, clauses, mode=None):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with connection() as conn, conn:
+        upload_id = conn.execute(
+            "INSERT INTO uploads (user_email, filename, summary, timestamp, document_summary, mode) VALUES (?, ?, ?, ?, ?, ?)",
+            (email, filename, summary, timestamp, document_summary, mode),
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO clauses (digest, text) VALUES (?, ?)",
+            ((digest, text) for _, _, digest, text, _ in clauses),
+        )
+        conn.executemany(
+            "INSERT INTO upload_clauses (upload_id, position, number, digest, risk_terms) VALUES (?, ?, ?, ?, ?)",
+            ((upload_id, position, number, digest, json.dumps(terms)) for position, number, digest, _, terms in clauses),
+        )
+    return upload_id
+
+# Among the user's `lookback` most recent uploads summarized in `mode`, the one
+# sharing the most clause digests with `digests`, as a dict with a "shared"
+# count; or None.
+@timed("db.find_previous_upload")
+def find_previous_upload(email, digests, lookback, mode):
+    flush_uploads()
+    with connection() as conn:
+        row = conn.execute(
+            """SELECT u.id, u.filename, u.summary, u.document_summary, u.timestamp, COUNT(DISTINCT uc.digest) AS shared
+               FROM (SELECT id FROM uploads WHERE user_email=? AND mode=? ORDER BY timestamp DESC, id DESC LIMIT ?) AS recent
+               JOIN upload_clauses uc ON uc.upload_id = recent.id
+               JOIN uploads u ON u.id = recent.id
+               WHERE uc.digest IN (SELECT value FROM json_each(?))
+               GROUP BY u.id
+               ORDER BY shared DESC, u.timestamp DESC, u.id DESC
+               LIMIT 1""",
+            (email, mode, lookback, json.dumps(digests)),
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("id", "filename", "summary", "document_summary", "timestamp", "shared"), row))
+
+# An upload's clauses in order as (position, number, digest, text, risk_terms)
+@timed("db.get_upload_clauses")
+def get_upload_clauses(upload_id):
+    with connection() as conn:
+        rows = conn.execute(
+            """SELECT uc.position, uc.number, uc.digest, c.text, uc.risk_terms
+               FROM upload_clauses uc JOIN clauses c ON c.digest = uc.digest
+               WHERE uc.upload_id=? ORDER BY uc.position""",
+            (upload_id,),
+        ).fetchall()
+    return [(position, number, digest, text, json.loads(terms)) for position, number, digest, text, terms in rows]
 
 # Fetch history
+@timed("db.get_user_history")
 def get_user_history(email):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT filename, summary, timestamp FROM uploads WHERE user_email=? ORDER BY timestamp DESC", (email,))
-    return c.fetchall()
+    flush_uploads()
+    with connection() as conn:
+        return conn.execute(
+            "SELECT filename, summary, timestamp FROM uploads WHERE user_email=? ORDER BY timestamp DESC",
+            (email,),
+        ).fetchall()
+
+# --- HISTORY PAGES & SEARCH ---
+HISTORY_PAGE_SIZE = 20
+SNIPPET_TOKENS = 24
+HIGHLIGHT = ("\x02", "\x03")   # wraps matched words; the UI turns these into bold
+FILENAME_WEIGHT = 5.0       # bm25 weight of a filename match relative to the summary
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+# Turn free text into a safe FTS5 query in which every word must match,
+# stemmed so "terminate" also finds "termination".
+def fts_query(text):
+    return " AND ".join(f'"{word}"' for word in _FTS_TOKEN.findall(text))
+
+
+# Same token the uploads_search_source view derives with 'u' || hex(user_email).
+def _owner_token(email):
+    return "u" + email.encode("utf-8").hex().upper()
+
+
+# One page of a user's uploads, newest first, without summary bodies.
+# `before` is the (timestamp, id) of the last row of the previous page.
+@timed("db.list_uploads")
+def list_uploads(email, before=None, limit=HISTORY_PAGE_SIZE):
+    flush_uploads()
+    sql = "SELECT id, filename, timestamp FROM uploads WHERE user_email=?"
+    params = [email]
+    if before is not None:
+        sql += " AND (timestamp, id) < (?, ?)"
+        params += list(before)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    with connection() as conn:
+        return conn.execute(sql, params + [limit]).fetchall()
+
+
+# Ranked matches in a user's uploads as (id, filename, snippet, timestamp, rank),
+# matched words wrapped in HIGHLIGHT. `after` is the (rank, id) of the last
+# result of the previous page. Only the rows on the page get highlighted.
+@timed("db.search_uploads")
+def search_uploads(email, text, after=None, limit=HISTORY_PAGE_SIZE):
+    query = fts_query(text)
+    if not query:
+        return []
+    flush_uploads()
+    match = f'owner : "{_owner_token(email)}" AND ({query})'
+    sql = f"SELECT rowid, bm25(uploads_fts, {FILENAME_WEIGHT}, 1.0, 0.0) AS score FROM uploads_fts WHERE uploads_fts MATCH ?"
+    params = [match]
+    if after is not None:
+        sql = f"SELECT rowid, score FROM ({sql}) WHERE score > ? OR (score = ? AND rowid > ?)"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY score, rowid LIMIT ?"
+    start, end = HIGHLIGHT
+    with connection() as conn:
+        ranked = conn.execute(sql, params + [limit]).fetchall()
+        if not ranked:
+            return []
+        marks = ",".join("?" * len(ranked))
+        details = {
+            row[0]: row[1:]
+            for row in conn.execute(
+                f"""SELECT uploads_fts.rowid,
+                           highlight(uploads_fts, 0, ?, ?),
+                           snippet(uploads_fts, 1, ?, ?, '…', {SNIPPET_TOKENS}),
+                           uploads.timestamp
+                    FROM uploads_fts JOIN uploads ON uploads.id = uploads_fts.rowid
+                    WHERE uploads_fts MATCH ? AND uploads_fts.rowid IN ({marks})""",
+                [start, end, start, end, match] + [upload_id for upload_id, _ in ranked],
+            )
+        }
+    return [(upload_id, *details[upload_id], score) for upload_id, score in ranked if upload_id in details]
+
+
+@timed("db.get_upload_summary")
+def get_upload_summary(upload_id, email):
+    with connection() as conn:
+        row = conn.execute("SELECT summary FROM uploads WHERE id=? AND user_email=?", (upload_id, email)).fetchone()
+    return row[0] if row else None
+
+# --- EXPORT ---
+EXPORT_BATCH_SIZE = 500
+
+
+# start/end bound the upload timestamp ("YYYY-MM-DD HH:MM:SS"; end exclusive).
+def _time_range(start, end):
+    sql = ""
+    params = []
+    if start is not None:
+        sql += " AND timestamp >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND timestamp < ?"
+        params.append(end)
+    return sql, params
+
+
+@timed("db.count_uploads")
+def count_uploads(email, start=None, end=None):
+    flush_uploads()
+    where, params = _time_range(start, end)
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM uploads WHERE user_email=?{where}", [email] + params).fetchone()[0]
+
+
+# A user's uploads oldest first as (id, filename, summary, timestamp). Rows are
+# read in keyset batches rather than through one long-lived cursor, so memory
+# stays flat and no read transaction is held open while the caller renders.
+def iter_uploads(email, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    flush_uploads()
+    where, params = _time_range(start, end)
+    after = None
+    while True:
+        sql = f"SELECT id, filename, summary, timestamp FROM uploads WHERE user_email=?{where}"
+        batch_params = [email] + params
+        if after is not None:
+            sql += " AND (timestamp, id) > (?, ?)"
+            batch_params += list(after)
+        sql += " ORDER BY timestamp, id LIMIT ?"
+        with span("db.iter_uploads"), connection() as conn:
+            rows = conn.execute(sql, batch_params + [batch_size]).fetchall()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1][3], rows[-1][0])
+
+# --- JOBS ---
+# Statuses: queued -> running -> done / failed / cancelled.
+_JOB_COLUMNS = ("id, user_email, kind, status, priority, filename, digest, params, stage, partial, pages_done, "
+                "page_count, result, error, upload_id, cancel_requested, attempts, created_at, started_at, finished_at")
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(zip([c.strip() for c in _JOB_COLUMNS.split(",")], row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+# Queue a job and return (job id, replaced ids): the id is that of the same
+# job (user, kind, input and params) if one is already queued or running.
+# idx_jobs_active makes the insert fail for a duplicate; if that job finishes
+# before it is looked up, the insert is tried again. A job pinned to another
+# process is not joined by a submit that brings its own secrets (pinned_to):
+# that process may be gone with its key, so the old job is cancelled and its
+# id returned among the replaced ones.
+@timed("db.insert_job")
+def insert_job(job_id, email, kind, priority, filename, digest, params, pinned_to=None):
+    params = json.dumps(params, sort_keys=True)
+    replaced = []
+    with connection() as conn, conn:
+        if pinned_to is not None:
+            replaced = [row[0] for row in conn.execute(
+                """UPDATE jobs SET status='cancelled', cancel_requested=1, partial=NULL, finished_at=?
+                   WHERE user_email=? AND kind=? AND digest=? AND params=? AND status IN ('queued', 'running')
+                   AND pinned_to IS NOT NULL AND pinned_to != ?
+                   RETURNING id""",
+                (time.time(), email, kind, digest, params, pinned_to),
+            ).fetchall()]
+        while True:
+            row = conn.execute(
+                """INSERT INTO jobs (id, user_email, kind, status, priority, filename, digest, params, pinned_to, created_at)
+                   VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (user_email, kind, digest, params) WHERE status IN ('queued', 'running') DO NOTHING
+                   RETURNING id""",
+                (job_id, email, kind, priority, filename, digest, params, pinned_to, time.time()),
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    """SELECT id FROM jobs WHERE user_email=? AND kind=? AND digest=? AND params=?
+                       AND status IN ('queued', 'running')""",
+                    (email, kind, digest, params),
+                ).fetchone()
+            if row is not None:
+                return row[0], replaced
+
+
+# Take the next queued job for `worker`: most urgent priority first, then the
+# user with the fewest jobs running, then the oldest. The single UPDATE makes
+# the claim atomic across threads and processes.
+@timed("db.claim_job")
+def claim_job(worker):
+    now = time.time()
+    with connection() as conn, conn:
+        row = conn.execute(
+            f"""UPDATE jobs SET status='running', worker=?, started_at=?, heartbeat=?, attempts=attempts+1
+                WHERE status='queued' AND id=(
+                    SELECT q.id FROM jobs q
+                    WHERE q.status='queued' AND (q.pinned_to IS NULL OR q.pinned_to=?)
+                    ORDER BY q.priority,
+                             (SELECT COUNT(*) FROM jobs r WHERE r.status='running' AND r.user_email=q.user_email),
+                             q.created_at
+                    LIMIT 1)
+                RETURNING {_JOB_COLUMNS}""",
+            (worker, now, now, worker),
+        ).fetchone()
+    return _job(row)
+
+
+# Record a running job's stage (and streamed output so far, and pages
+# extracted as a (done, count) pair); returns True if the user has asked to
+# cancel it.
+def update_job_progress(job_id, stage, partial=None, pages=None):
+    pages_done, page_count = pages or (None, None)
+    with span("db.update_job_progress"), connection() as conn, conn:
+        row = conn.execute(
+            """UPDATE jobs SET stage=?, partial=COALESCE(?, partial), pages_done=COALESCE(?, pages_done),
+                   page_count=COALESCE(?, page_count), heartbeat=?
+               WHERE id=? RETURNING cancel_requested""",
+            (stage, partial, pages_done, page_count, time.time(), job_id),
+        ).fetchone()
+    return bool(row and row[0])
+
+
+@timed("db.finish_job")
+def finish_job(job_id, status, result=None, error=None, upload_id=None):
+    with connection() as conn, conn:
+        conn.execute(
+            """UPDATE jobs SET status=?, result=?, error=?, upload_id=?, partial=NULL, finished_at=?
+               WHERE id=? AND status='running'""",
+            (status, json.dumps(result) if result is not None else None, error, upload_id, time.time(), job_id),
+        )
+
+
+# A queued job is cancelled at once; a running one stops at its next
+# progress update. Returns the job's status afterwards, or None.
+@timed("db.cancel_job")
+def cancel_job(job_id, email):
+    now = time.time()
+    with connection() as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET status='cancelled', finished_at=? WHERE id=? AND user_email=? AND status='queued'",
+            (now, job_id, email),
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested=1 WHERE id=? AND user_email=? AND status='running'",
+            (job_id, email),
+        )
+        row = conn.execute("SELECT status FROM jobs WHERE id=? AND user_email=?", (job_id, email)).fetchone()
+    return row[0] if row else None
+
+
+@timed("db.get_job")
+def get_job(job_id, email):
+    with connection() as conn:
+        return _job(conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id=? AND user_email=?", (job_id, email)).fetchone())
+
+
+# (position, queued) of a queued job, 1-based; None once it has started.
+@timed("db.job_queue_position")
+def job_queue_position(job_id):
+    with connection() as conn:
+        row = conn.execute(
+            """SELECT (SELECT COUNT(*) FROM jobs q WHERE q.status='queued'
+                       AND (q.priority, q.created_at) <= (j.priority, j.created_at)),
+                      (SELECT COUNT(*) FROM jobs WHERE status='queued')
+               FROM jobs j WHERE j.id=? AND j.status='queued'""",
+            (job_id,),
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+@timed("db.list_active_jobs")
+def list_active_jobs(email):
+    with connection() as conn:
+        rows = conn.execute(
+            f"""SELECT {_JOB_COLUMNS} FROM jobs WHERE user_email=? AND status IN ('queued', 'running')
+                ORDER BY created_at""",
+            (email,),
+        ).fetchall()
+    return [_job(row) for row in rows]
+
+
+def touch_jobs(job_ids):
+    if not job_ids:
+        return
+    with span("db.touch_jobs"), connection() as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET heartbeat=? WHERE id IN (SELECT value FROM json_each(?)) AND status='running'",
+            (time.time(), json.dumps(list(job_ids))),
+        )
+
+
+# Running jobs whose worker stopped sending heartbeats before `before` go back
+# to the queue, unless they were pinned to that worker's process or have
+# been tried `max_attempts` times; those fail. Returns the failed job ids.
+@timed("db.recover_stale_jobs")
+def recover_stale_jobs(before, max_attempts, error):
+    now = time.time()
+    with connection() as conn, conn:
+        failed = [row[0] for row in conn.execute(
+            """UPDATE jobs SET status='failed', error=?, partial=NULL, finished_at=?
+               WHERE status='running' AND heartbeat < ? AND (pinned_to IS NOT NULL OR attempts >= ?)
+               RETURNING id""",
+            (error, now, before, max_attempts),
+        ).fetchall()]
+        conn.execute(
+            """UPDATE jobs SET status='queued', worker=NULL, stage=NULL, partial=NULL, pages_done=NULL, page_count=NULL
+               WHERE status='running' AND heartbeat < ?""",
+            (before,),
+        )
+    return failed
+
+
+# Queued jobs pinned to a process that has not reported since `before` (or
+# never did) fail with `error`; their secrets died with it. Returns their ids.
+@timed("db.fail_orphaned_jobs")
+def fail_orphaned_jobs(before, error):
+    with connection() as conn, conn:
+        return [row[0] for row in conn.execute(
+            """UPDATE jobs SET status='failed', error=?, finished_at=?
+               WHERE status='queued' AND pinned_to IS NOT NULL
+               AND pinned_to NOT IN (SELECT id FROM job_processes WHERE heartbeat >= ?)
+               RETURNING id""",
+            (error, time.time(), before),
+        ).fetchall()]
+
+
+# Record that `process_id` is alive and can run the jobs pinned to it.
+def touch_process(process_id):
+    with span("db.touch_process"), connection() as conn, conn:
+        conn.execute(
+            "INSERT INTO job_processes (id, heartbeat) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET heartbeat=excluded.heartbeat",
+            (process_id, time.time()),
+        )
+
+
+@timed("db.prune_jobs")
+def prune_jobs(before):
+    with connection() as conn, conn:
+        conn.execute("DELETE FROM job_processes WHERE heartbeat < ?", (before,))
+        return conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?", (before,)
+        ).rowcount
+
+
+@timed("db.job_counts")
+def job_counts():
+    with connection() as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+# --- TEMPLATE INDEX ---
+@timed("db.insert_template")
+def insert_template(owner, mode, filename, signature, details, summary, buckets):
+    with connection() as conn, conn:
+        template_id = conn.execute(
+            "INSERT INTO templates (owner, mode, filename, signature, details, summary, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (owner, mode, filename, signature, details, summary, time.time()),
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO template_bands (band, bucket, template_id) VALUES (?, ?, ?)",
+            ((band, bucket, template_id) for band, bucket in buckets),
+        )
+    return template_id
+
+# Templates sharing at least one (band, bucket) with a signature, as
+# (id, owner, filename, signature, details, summary); owners=None means anyone's.
+@timed("db.template_candidates")
+def template_candidates(buckets, mode, owners, limit):
+    probes = " OR ".join("(band=? AND bucket=?)" for _ in buckets)
+    params = [value for pair in buckets for value in pair]
+    sql = f"""SELECT id, owner, filename, signature, details, summary FROM templates
+              WHERE id IN (SELECT template_id FROM template_bands WHERE {probes}) AND mode=?"""
+    params.append(mode)
+    if owners is not None:
+        sql += f" AND owner IN ({','.join('?' * len(owners))})"
+        params += owners
+    with connection() as conn:
+        return conn.execute(sql + " LIMIT ?", params + [limit]).fetchall()
+
+# --- RESULT CACHE ---
+# Fetch a cached model result newer than min_created; refreshes its LRU stamp
+# at most once per touch_interval seconds to keep hits mostly read-only.
+def get_cached_result(cache_key, min_created, touch_interval=3600):
+    with span("db.get_cached_result") as timing, connection() as conn:
+        row = conn.execute(
+            "SELECT result, last_used FROM result_cache WHERE cache_key=? AND created_at>=?",
+            (cache_key, min_created),
+        ).fetchone()
+        timing.tag(cache="miss" if row is None else "hit")
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > touch_interval:
+            with conn:
+                conn.execute("UPDATE result_cache SET last_used=? WHERE cache_key=?", (now, cache_key))
+        return row[0]
+
+@timed("db.put_cached_result")
+def put_cached_result(cache_key, result):
+    now = time.time()
+    with connection() as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO result_cache (cache_key, result, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (cache_key, result, len(result.encode("utf-8")), now, now),
+        )
+
+# Drop expired entries, then the least recently used ones beyond max_bytes
+@timed("db.evict_cached_results")
+def evict_cached_results(max_bytes, min_created):
+    with connection() as conn, conn:
+        conn.execute("DELETE FROM result_cache WHERE created_at<?", (min_created,))
+        conn.execute(
+            """DELETE FROM result_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC, cache_key) AS running
+                    FROM result_cache
+                ) WHERE running > ?
+            )""",
+            (max_bytes,),
+        )
@@ -0,0 +1,377 @@
+import argparse
+import itertools
+import re
+import sys
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from db import count_uploads, init_db, iter_uploads
+
+# Bulk export of a user's history (or a date range of it) as one merged PDF
+# with a table of contents and bookmarks, or as a ZIP of one PDF per upload.
+#
+#   python export.py user@example.com history.pdf --from 2025-01-01 --to 2025-03-31
+#   python export.py user@example.com history.zip
+#
+# Rows are streamed from SQLite in batches and every page is written to the
+# output as soon as it is laid out, by a small PDF writer that only keeps
+# object offsets and page ids in memory (ReportLab's canvas holds the whole
+# document until save()). The table of contents comes first: its pages are
+# reserved from the row count up front and filled in at the end, which PDF
+# allows because objects may appear in any order in the file.
+
+# --- CONFIG ---
+PAGE_WIDTH = 612           # US Letter, in points
+PAGE_HEIGHT = 792
+MARGIN = 54
+FONT_SIZE = 11
+LEADING = 15
+TITLE_SIZE = 15
+TITLE_LEADING = 22
+FOOTER_SIZE = 8
+TOC_SIZE = 10
+TOC_LEADING = 14
+TOC_HEADER_LINES = 6       # first TOC page: export title and details
+PROGRESS_EVERY = 100       # documents between progress callbacks
+
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+# Base-14 fonts only cover Windows-1252; a few common characters get a
+# readable stand-in, anything else (emoji) is dropped.
+_REPLACEMENTS = str.maketrans({"₹": "Rs.", "\u2011": "-", "\u2212": "-", "\u00a0": " ", "\t": "    "})
+_UNSAFE_NAME = re.compile(r"[^\w.-]+")
+
+
+# --- PDF WRITER ---
+def _pdf_text(text):
+    return text.translate(_REPLACEMENTS).encode("cp1252", errors="ignore").decode("cp1252")
+
+
+def _literal(text):
+    data = _pdf_text(text).encode("cp1252")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"") + b")"
+
+
+# Outline titles may hold any character: UTF-16 with a byte order mark.
+def _unicode_string(text):
+    return "<FEFF" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+class PdfStream:
+    def __init__(self, out):
+        self.out = out
+        self.position = 0
+        self.offsets = [0]   # object id -> byte offset in the file
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.catalog = self.reserve()
+        self.pages = self.reserve()
+        fonts = []
+        for name, base_font in FONTS.items():
+            font_id = self.reserve()
+            self.object(font_id, f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>")
+            fonts.append(f"/{name} {font_id} 0 R")
+        self.resources = f"<< /Font << {' '.join(fonts)} >> >>"
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def reserve(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def object(self, obj_id, body):
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        self.offsets[obj_id] = self.position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, body))
+
+    def page(self, page_id, content, annotations=()):
+        content_id = self.reserve()
+        data = zlib.compress(content)
+        self.object(content_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(data), data))
+        annots = f" /Annots [{' '.join(annotations)}]" if annotations else ""
+        self.object(page_id, f"<< /Type /Page /Parent {self.pages} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                             f"/Resources {self.resources} /Contents {content_id} 0 R{annots} >>")
+
+    # page_ids in reading order; outline is a list of (title, page id).
+    def close(self, page_ids, outline=()):
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        self.object(self.pages, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+        extra = ""
+        if outline:
+            root = self.reserve()
+            ids = [self.reserve() for _ in outline]
+            for i, (title, page_id) in enumerate(outline):
+                links = f" /Prev {ids[i - 1]} 0 R" if i else ""
+                links += f" /Next {ids[i + 1]} 0 R" if i + 1 < len(ids) else ""
+                self.object(ids[i], f"<< /Title {_unicode_string(title)} /Parent {root} 0 R{links} "
+                                    f"/Dest [{page_id} 0 R /XYZ null null null] >>")
+            self.object(root, f"<< /Type /Outlines /First {ids[0]} 0 R /Last {ids[-1]} 0 R /Count {len(ids)} >>")
+            extra = f" /Outlines {root} 0 R /PageMode /UseOutlines"
+        self.object(self.catalog, f"<< /Type /Catalog /Pages {self.pages} 0 R{extra} >>")
+
+        xref = self.position
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+        for start in range(1, len(self.offsets), 4096):
+            self._write(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets[start:start + 4096]))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets), self.catalog, xref))
+
+
+# --- LAYOUT ---
+# Glyph widths (1/1000 em) of the base-14 font by character, from
+# ReportLab's font metrics; words repeat, so their widths are cached.
+@lru_cache(maxsize=None)
+def _glyph_widths(font):
+    from reportlab.pdfbase.pdfmetrics import getFont
+    widths = getFont(FONTS[font]).widths
+    return {bytes([code]).decode("cp1252", errors="ignore"): width for code, width in enumerate(widths)}
+
+
+@lru_cache(maxsize=65536)
+def _text_units(text, font):
+    widths = _glyph_widths(font)
+    return sum(widths.get(ch, 0) for ch in text)
+
+
+def _width(text, font, size):
+    return _text_units(text, font) * size / 1000
+
+
+# Word-aware wrapping by measured width; a word wider than the line is split.
+def wrap_text(text, font="F1", size=FONT_SIZE, width=PAGE_WIDTH - 2 * MARGIN):
+    lines = []
+    space = _width(" ", font, size)
+    for paragraph in _pdf_text(text).split("\n"):
+        line, line_width = [], 0.0
+        for word in paragraph.split():
+            word_width = _width(word, font, size)
+            while word_width > width:
+                cut = len(word)
+                while cut > 1 and _width(word[:cut], font, size) > width:
+                    cut = cut * 3 // 4
+                if line:
+                    lines.append(" ".join(line))
+                    line, line_width = [], 0.0
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_width = _width(word, font, size)
+            if not word:
+                continue
+            if line and line_width + space + word_width > width:
+                lines.append(" ".join(line))
+                line, line_width = [], 0.0
+            line_width += word_width + (space if line else 0.0)
+            line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def _text_op(x, y, text, font="F1", size=FONT_SIZE):
+    return b"BT /%s %d Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, y, _literal(text))
+
+
+# Flows lines onto consecutive pages; each page is written out when full.
+class PageFlow:
+    def __init__(self, pdf, footer, first_page_number=1):
+        self.pdf = pdf
+        self.footer = footer
+        self.page_number = first_page_number - 1
+        self.page_ids = []
+        self.page_id = None
+        self._ops = []
+        self._y = 0.0
+
+    def new_page(self):
+        self.flush()
+        self.page_id = self.pdf.reserve()
+        self.page_number += 1
+        self._y = PAGE_HEIGHT - MARGIN
+
+    def line(self, text, font="F1", size=FONT_SIZE, leading=LEADING):
+        if self.page_id is None or self._y - leading < MARGIN:
+            self.new_page()
+        self._y -= leading
+        if text:
+            self._ops.append(_text_op(MARGIN, self._y, text, font, size))
+
+    def paragraph(self, text, font="F1", size=FONT_SIZE, leading=LEADING):
+        for line in wrap_text(text, font, size):
+            self.line(line, font, size, leading)
+
+    def flush(self):
+        if self.page_id is None:
+            return
+        footer = f"{self.footer} · page {self.page_number}"
+        self._ops.append(_text_op(MARGIN, MARGIN / 2, footer, "F1", FOOTER_SIZE))
+        self.pdf.page(self.page_id, b"\n".join(self._ops))
+        self.page_ids.append(self.page_id)
+        self.page_id = None
+        self._ops = []
+
+
+def _render_upload(flow, filename, summary, timestamp):
+    flow.new_page()
+    first_page = (flow.page_id, flow.page_number)
+    flow.paragraph(filename, "F2", TITLE_SIZE, TITLE_LEADING)
+    flow.line(f"Uploaded {timestamp}", "F1", TOC_SIZE)
+    flow.line("")
+    flow.paragraph(summary or "")
+    return first_page
+
+
+# --- TABLE OF CONTENTS ---
+def _toc_rows_per_page():
+    return int((PAGE_HEIGHT - 2 * MARGIN) // TOC_LEADING) - 1
+
+
+def toc_page_count(documents):
+    first = _toc_rows_per_page() - TOC_HEADER_LINES
+    if documents <= first:
+        return 1
+    return 1 + -(-(documents - first) // _toc_rows_per_page())
+
+
+def _write_toc(pdf, page_ids, header, entries, footer):
+    entries = iter(entries)
+    width = PAGE_WIDTH - 2 * MARGIN
+    for page_index, page_id in enumerate(page_ids):
+        ops = []
+        annotations = []
+        y = PAGE_HEIGHT - MARGIN
+        rows = _toc_rows_per_page()
+        if page_index == 0:
+            for i, (text, font, size) in enumerate(header):
+                y -= TITLE_LEADING if i == 0 else TOC_LEADING
+                ops.append(_text_op(MARGIN, y, text, font, size))
+            rows -= TOC_HEADER_LINES
+            y -= TOC_LEADING * (TOC_HEADER_LINES - len(header))
+        for filename, timestamp, page_number, target in itertools.islice(entries, rows):
+            y -= TOC_LEADING
+            number = str(page_number)
+            right = f"{timestamp}    {number}"
+            room = width - _width(right, "F1", TOC_SIZE) - 12
+            title = _pdf_text(filename)
+            while title and _width(title, "F1", TOC_SIZE) > room:
+                title = title[:-4] + "…" if len(title) > 4 else ""
+            ops.append(_text_op(MARGIN, y, title, "F1", TOC_SIZE))
+            ops.append(_text_op(PAGE_WIDTH - MARGIN - _width(right, "F1", TOC_SIZE), y, right, "F1", TOC_SIZE))
+            annotations.append(f"<< /Type /Annot /Subtype /Link /Rect [{MARGIN} {y - 3:.2f} {PAGE_WIDTH - MARGIN} "
+                               f"{y + TOC_SIZE:.2f}] /Border [0 0 0] /Dest [{target} 0 R /XYZ null null null] >>")
+        ops.append(_text_op(MARGIN, MARGIN / 2, f"{footer} · page {page_index + 1}", "F1", FOOTER_SIZE))
+        pdf.page(page_id, b"\n".join(ops), annotations)
+
+
+# --- EXPORTS ---
+# Timestamp bounds for uploads from start_date to end_date inclusive (either
+# may be None).
+def date_range(start_date=None, end_date=None):
+    start = f"{start_date:%Y-%m-%d} 00:00:00" if start_date else None
+    end = f"{end_date + timedelta(days=1):%Y-%m-%d} 00:00:00" if end_date else None
+    return start, end
+
+
+def _describe_range(start, end):
+    first = start[:10] if start else None
+    last = f"{datetime.strptime(end[:10], '%Y-%m-%d') - timedelta(days=1):%Y-%m-%d}" if end else None
+    if first and last:
+        return f"uploads from {first} to {last}"
+    if first:
+        return f"uploads since {first}"
+    if last:
+        return f"uploads until {last}"
+    return "all uploads"
+
+
+# Write every upload of `email` in [start, end) to `out` (a binary file) as
+# one PDF. progress(done, total) is called every PROGRESS_EVERY documents.
+# Returns the number of documents exported.
+def export_merged_pdf(email, out, start=None, end=None, progress=None):
+    # Rows added while exporting are left out, so the reserved contents fit.
+    total = count_uploads(email, start, end)
+    footer = "LegalLite history export"
+    pdf = PdfStream(out)
+    toc_ids = [pdf.reserve() for _ in range(toc_page_count(total))]
+    flow = PageFlow(pdf, footer, first_page_number=len(toc_ids) + 1)
+    entries = []    # (filename, timestamp, page number, page id): a few values per document
+    outline = []
+    done = 0
+    for _, filename, summary, timestamp in itertools.islice(iter_uploads(email, start, end), total):
+        page_id, page_number = _render_upload(flow, filename, summary, timestamp)
+        entries.append((filename, timestamp, page_number, page_id))
+        outline.append((f"{filename} ({timestamp})", page_id))
+        done += 1
+        if progress and done % PROGRESS_EVERY == 0:
+            progress(done, total)
+    flow.flush()
+
+    header = [
+        ("LegalLite history export", "F2", TITLE_SIZE),
+        (f"Account: {email}", "F1", TOC_SIZE),
+        (f"{done} document(s), {_describe_range(start, end)}", "F1", TOC_SIZE),
+        (f"Generated {datetime.now():%Y-%m-%d %H:%M:%S}", "F1", TOC_SIZE),
+        ("Contents" if done else "No uploads in this range.", "F2", FONT_SIZE),
+    ]
+    _write_toc(pdf, toc_ids, header, entries, footer)
+    pdf.close(toc_ids + flow.page_ids, outline)
+    if progress:
+        progress(done, total)
+    return done
+
+
+# One summary as a standalone PDF, returned as bytes.
+def upload_pdf(filename, summary, timestamp):
+    from io import BytesIO
+    buffer = BytesIO()
+    pdf = PdfStream(buffer)
+    flow = PageFlow(pdf, f"LegalLite summary - {filename}")
+    _render_upload(flow, filename, summary, timestamp)
+    flow.flush()
+    pdf.close(flow.page_ids)
+    return buffer.getvalue()
+
+
+def _archive_name(upload_id, filename, timestamp):
+    stem = _UNSAFE_NAME.sub("_", filename.rsplit(".", 1)[0]).strip("_") or "upload"
+    return f"{timestamp[:10]}_{upload_id}_{stem[:80]}.pdf"
+
+
+# The same uploads as a ZIP of one PDF each, written entry by entry. PDF
+# streams are already compressed, so entries are stored as they are.
+def export_zip(email, out, start=None, end=None, progress=None):
+    total = count_uploads(email, start, end)
+    done = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as archive:
+        for upload_id, filename, summary, timestamp in itertools.islice(iter_uploads(email, start, end), total):
+            archive.writestr(_archive_name(upload_id, filename, timestamp), upload_pdf(filename, summary, timestamp))
+            done += 1
+            if progress and done % PROGRESS_EVERY == 0:
+                progress(done, total)
+    if progress:
+        progress(done, total)
+    return done
+
+
+# --- CLI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a user's LegalLite history as a merged PDF or a ZIP of PDFs.")
+    parser.add_argument("email")
+    parser.add_argument("output", help="a .pdf (merged, with contents) or .zip (one PDF per upload) path")
+    parser.add_argument("--from", dest="start", type=lambda v: datetime.strptime(v, "%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=lambda v: datetime.strptime(v, "%Y-%m-%d"), help="YYYY-MM-DD, inclusive")
+    args = parser.parse_args(argv)
+
+    init_db()
+    start, end = date_range(args.start, args.end)
+    export = export_zip if args.output.lower().endswith(".zip") else export_merged_pdf
+    report = lambda done, total: print(f"\r{done}/{total} documents", end="", file=sys.stderr, flush=True)
+    with open(args.output, "wb") as out:
+        count = export(args.email, out, start, end, progress=report)
+    print(f"\nExported {count} document(s) to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONFIG ---
+CACHE_DIR = os.path.join(".cache", "extracted")
+MEMORY_LIMIT_BYTES = 64 * 1024 * 1024    # extracted text kept in RAM
+DISK_LIMIT_BYTES = 512 * 1024 * 1024     # extracted text kept on disk
+MAX_UPLOAD_MB = 100
+PARALLEL_MIN_PAGES = 32    # smaller documents are not worth a process hop
+PAGES_PER_TASK = 8
+EXTRACT_WORKERS = os.cpu_count() or 1
+READ_BLOCK = 1024 * 1024
+
+
+def pdf_digest(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+# --- TWO-TIER CACHE ---
+# Keyed by the SHA-256 of the PDF bytes, so the same contract uploaded again
+# (by anyone, under any filename) never goes back through PyMuPDF.
+class ExtractionCache:
+    def __init__(self, cache_dir=CACHE_DIR, memory_limit=MEMORY_LIMIT_BYTES, disk_limit=DISK_LIMIT_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # digest -> (pages, size in bytes)
+        self._memory_bytes = 0
+        self._disk_bytes = None        # computed lazily from the cache dir
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                self._memory.move_to_end(digest)
+                self.memory_hits += 1
+                return entry[0]
+
+        pages = self._read_disk(digest)
+        with self._lock:
+            if pages is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(digest, pages, _size_of(pages))
+        return pages
+
+    def put(self, digest, pages):
+        payload = json.dumps(pages).encode("utf-8")
+        with self._lock:
+            self._remember(digest, pages, _size_of(pages))
+        self._write_disk(digest, payload)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes or 0,
+            }
+
+    # Caller holds the lock.
+    def _remember(self, digest, pages, size):
+        if size > self.memory_limit:
+            return
+        old = self._memory.pop(digest, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        self._memory[digest] = (pages, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_limit:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _read_disk(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                pages = json.loads(f.read().decode("utf-8"))
+            os.utime(path)   # mtime doubles as the disk tier's LRU clock
+            return pages
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, digest, payload):
+        if len(payload) > self.disk_limit:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(digest)
+            # Unique per process and thread, as several processes share the dir.
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            try:
+                old_size = os.path.getsize(path)   # an entry written again
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(payload) - old_size
+            if self._disk_bytes > self.disk_limit:
+                self._evict_disk()
+
+    def _scan_disk_bytes(self):
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                total += entry.stat().st_size
+        return total
+
+    # Caller holds the lock.
+    def _evict_disk(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.disk_limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+
+def _size_of(pages):
+    return sum(len(page.encode("utf-8")) for page in pages)
+
+
+# Shared by every Streamlit session in this process.
+extraction_cache = ExtractionCache()
+
+
+# --- EXTRACTION ---
+def extract_pages(pdf_bytes):
+    digest = pdf_digest(pdf_bytes)
+    pages = extraction_cache.get(digest)
+    if pages is None:
+        import fitz  # PyMuPDF, loaded on first extraction
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            pages = [page.get_text() for page in doc]
+        extraction_cache.put(digest, pages)
+    return pages
+
+
+def extract_text(pdf_bytes):
+    return "".join(extract_pages(pdf_bytes))
+
+
+# --- STREAMING EXTRACTION FOR LARGE FILES ---
+# Large uploads are hashed and spooled to a temp file in blocks rather than
+# copied into another bytes object (a file already on disk is read in place);
+# worker processes then open that file themselves (PyMuPDF reads it lazily)
+# and extract page ranges in parallel. Pages are yielded in order as soon as
+# they are ready, so the risk scan (RiskScanner.scan_stream) and job progress
+# keep up with the reading; the text is cached once every page is read.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _extract_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process full of Streamlit threads is not safe.
+            _pool = ProcessPoolExecutor(EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_range(path, start, stop):
+    import fitz
+    with fitz.open(path) as doc:
+        return [doc.load_page(i).get_text() for i in range(start, stop)]
+
+
+def file_digest(file_obj):
+    file_obj.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: file_obj.read(READ_BLOCK), b""):
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def _spool(file_obj):
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as out:
+        file_obj.seek(0)
+        shutil.copyfileobj(file_obj, out, READ_BLOCK)
+    file_obj.seek(0)
+    return path
+
+
+# Reads an open file, or the file at `path` in place (it is never deleted);
+# a digest the caller already has saves hashing the whole file again.
+class PageStream:
+    def __init__(self, file_obj=None, path=None, digest=None):
+        if digest is None and file_obj is None:
+            with open(path, "rb") as f:
+                digest = file_digest(f)
+        self.digest = digest or file_digest(file_obj)
+        self._cached = extraction_cache.get(self.digest)
+        self._path = None
+        self._spooled = False
+        if self._cached is not None:
+            self.page_count = len(self._cached)
+        else:
+            import fitz
+            self._path = path or _spool(file_obj)
+            self._spooled = path is None
+            with fitz.open(self._path) as doc:
+                self.page_count = doc.page_count
+
+    @property
+    def from_cache(self):
+        return self._cached is not None
+
+    def __iter__(self):
+        if self._cached is not None:
+            yield from self._cached
+            return
+        pages = []
+        try:
+            for page in self._extract():
+                pages.append(page)
+                yield page
+            extraction_cache.put(self.digest, pages)
+            self._cached = pages
+        finally:
+            self.close()
+
+    def _extract(self):
+        if self.page_count < PARALLEL_MIN_PAGES:
+            import fitz
+            with fitz.open(self._path) as doc:
+                for page in doc:
+                    yield page.get_text()
+            return
+
+        pool = _extract_pool()
+        ranges = [(start, min(start + PAGES_PER_TASK, self.page_count))
+                  for start in range(0, self.page_count, PAGES_PER_TASK)]
+        window = EXTRACT_WORKERS * 2   # ranges in flight; bounds buffered text
+        futures = [pool.submit(_extract_range, self._path, *r) for r in ranges[:window]]
+        next_range = len(futures)
+        try:
+            for i in range(len(ranges)):
+                for page in futures[i].result():
+                    yield page
+                futures[i] = None
+                if next_range < len(ranges):
+                    futures.append(pool.submit(_extract_range, self._path, *ranges[next_range]))
+                    next_range += 1
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self._spooled:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._spooled = False
+        self._path = None
@@ -0,0 +1,155 @@
+import re
+
+# Offline extractive summarizer: picks the most central sentences of the
+# document with TF-IDF + TextRank. No network, no GPU; a 100-page contract
+# takes well under a second on one core. NumPy is loaded on first use.
+
+# --- CONFIG ---
+SUMMARY_SENTENCES = 8
+CANDIDATES = 400      # sentences kept for TextRank after the TF-IDF pre-ranking
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-6
+MIN_WORDS = 6
+MAX_SENTENCE_CHARS = 600
+REDUNDANCY = 0.8      # skip a sentence this similar (cosine) to one already chosen
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+(?=[\"'(\[]?[A-Z0-9])|\n\s*\n")
+_WORD = re.compile(r"[a-z][a-z'\-]+")
+_ABBREVIATION = re.compile(r"\b(?:mr|mrs|ms|dr|st|no|nos|rs|pvt|ltd|inc|co|corp|vs|art|sec|cl|e\.g|i\.e|[a-z])\.$", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be because been before being below
+between both but by can could did do does doing down during each either few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just may me
+might more most must my myself no nor not now of off on once only or other our ours ourselves out
+over own same shall she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up upon very was we were what when where which
+while who whom why will with within without would you your yours yourself hereby herein hereof
+hereto thereof therein whereas party parties agreement
+""".split())
+
+
+def _raw_sentences(text):
+    pending = ""
+    for raw in _SENTENCE_BREAK.split(text):
+        raw = " ".join(raw.split())
+        pending = f"{pending} {raw}" if pending else raw
+        # "Mr. Anil Reddy", "Rs. 18,000": not a sentence end.
+        if not _ABBREVIATION.search(pending):
+            yield pending
+            pending = ""
+    if pending:
+        yield pending
+
+
+def split_sentences(text):
+    sentences = []
+    for sentence in _raw_sentences(text):
+        if len(sentence) > MAX_SENTENCE_CHARS:
+            sentence = sentence[:MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + " …"
+        if len(sentence.split()) >= MIN_WORDS:
+            sentences.append(sentence)
+    return sentences
+
+
+# --- SCORING ---
+def _term_pairs(sentences):
+    import numpy as np
+    vocab = {}
+    rows = []
+    cols = []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word in STOPWORDS:
+                continue
+            rows.append(i)
+            cols.append(vocab.setdefault(word, len(vocab)))
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), len(vocab)
+
+
+def _tfidf(sentences):
+    import numpy as np
+    n = len(sentences)
+    rows, cols, n_terms = _term_pairs(sentences)
+    if n == 0 or n_terms == 0:
+        return rows, cols, np.zeros(0), n_terms
+
+    # Sparse (sentence, term) -> count as parallel arrays.
+    pair_ids, counts = np.unique(rows * n_terms + cols, return_counts=True)
+    rows, cols = np.divmod(pair_ids, n_terms)
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log((n + 1) / (df + 1)) + 1.0
+    weights = (1.0 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+    return rows, cols, weights / np.maximum(norms[rows], 1e-12), n_terms
+
+
+# Dense unit-length rows for the picked sentences, in the order given.
+def _dense(tfidf, n, picks):
+    import numpy as np
+    rows, cols, weights, _ = tfidf
+    local_row = np.full(n, -1)
+    local_row[picks] = np.arange(len(picks))
+    mask = local_row[rows] >= 0
+    used_terms, local_col = np.unique(cols[mask], return_inverse=True)
+    matrix = np.zeros((len(picks), len(used_terms)))
+    matrix[local_row[rows[mask]], local_col] = weights[mask]
+    return matrix
+
+
+def rank_sentences(sentences, tfidf=None):
+    import numpy as np
+    n = len(sentences)
+    tfidf = tfidf or _tfidf(sentences)
+    rows, cols, weights, n_terms = tfidf
+    if n == 0 or n_terms == 0:
+        return np.zeros(n)
+
+    # Pre-rank by similarity to the document centroid so TextRank's dense
+    # similarity matrix stays small on long documents.
+    centroid = np.bincount(cols, weights=weights, minlength=n_terms)
+    centrality = np.bincount(rows, weights=weights * centroid[cols], minlength=n)
+    candidates = np.sort(np.argsort(-centrality)[:CANDIDATES])
+    matrix = _dense(tfidf, n, candidates)
+
+    # TextRank over cosine similarity (rows are already unit length).
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, out_weight, out=np.zeros_like(similarity), where=out_weight > 0)
+    k = len(candidates)
+    rank = np.full(k, 1.0 / k)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / k + DAMPING * (transition.T @ rank)
+        if np.abs(updated - rank).sum() < TOLERANCE:
+            rank = updated
+            break
+        rank = updated
+
+    scores = np.zeros(n)
+    scores[candidates] = rank
+    return scores
+
+
+# --- SUMMARY ---
+def extractive_summary(text, max_sentences=SUMMARY_SENTENCES):
+    import numpy as np
+    sentences = split_sentences(text)
+    if not sentences:
+        return "📜 Offline Summary: no readable sentences were found in this document."
+    tfidf = _tfidf(sentences)
+    scores = rank_sentences(sentences, tfidf)
+    ranked = np.argsort(-scores, kind="stable")[:CANDIDATES]
+    # Walk down the ranking and drop near-duplicates of what is already in
+    # the summary; boilerplate clauses repeat across contract sections.
+    matrix = _dense(tfidf, len(sentences), ranked)
+    picked = []
+    for position in range(len(ranked)):
+        if len(picked) == max_sentences:
+            break
+        if picked and (matrix[picked] @ matrix[position]).max() > REDUNDANCY:
+            continue
+        picked.append(position)
+    chosen = np.sort(ranked[picked])
+    return "\n".join(f"- {sentences[i]}" for i in chosen)
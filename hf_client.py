@@ -0,0 +1,197 @@
+import os
+import random
+import threading
+import time
+
+
+# --- CONFIG ---
+HF_API_URL = os.environ.get("HF_API_URL", "https://router.huggingface.co/models")
+CONNECT_TIMEOUT = 5        # seconds to establish a connection
+READ_TIMEOUT = 60          # seconds to wait for the model's answer
+TOTAL_TIMEOUT = 120        # give up on one request after this long, retries included
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+MAX_CONCURRENT_REQUESTS = 8   # across every session in this process
+BREAKER_FAILURES = 5          # consecutive failures that open the circuit
+BREAKER_COOLDOWN = 30.0       # seconds before a trial request is let through
+
+
+# --- ERRORS ---
+# The message of every InferenceError is safe to show to the user.
+class InferenceError(RuntimeError):
+    pass
+
+class ModelLoadingError(InferenceError):
+    pass
+
+class InferenceTimeout(InferenceError):
+    pass
+
+class CircuitOpenError(InferenceError):
+    pass
+
+# The service could not be reached at all (DNS, refused connection, TLS).
+class InferenceUnavailable(InferenceError):
+    pass
+
+
+# --- CIRCUIT BREAKER ---
+# After BREAKER_FAILURES consecutive failures, calls fail fast for
+# BREAKER_COOLDOWN seconds; then one trial call decides whether to close again.
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self.clock() - self._opened_at < self.cooldown:
+                return "open"
+            return "half-open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.clock() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._trial_running = False
+            if self._consecutive >= self.failures or self._opened_at is not None:
+                self._opened_at = self.clock()
+
+
+# --- CLIENT ---
+class InferenceClient:
+    def __init__(self, base_url=HF_API_URL, max_concurrent=MAX_CONCURRENT_REQUESTS,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 total_timeout=TOTAL_TIMEOUT, max_retries=MAX_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._max_concurrent = max_concurrent
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    # requests (and the session) are only loaded once Hugging Face is used.
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self._max_concurrent)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def summarize(self, model, text, token, parameters):
+        import requests
+        url = f"{self.base_url}/{model}"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        payload = {"inputs": text, "parameters": parameters}
+        deadline = time.monotonic() + self.total_timeout
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("🚧 Hugging Face is not responding right now. Please try again in a minute.")
+            try:
+                with self._slots:
+                    response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            except requests.Timeout:
+                self.breaker.record_failure()
+                error = InferenceTimeout("⌛ Hugging Face did not answer in time.")
+                delay = _backoff(attempt)
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                error = InferenceUnavailable(f"❌ Could not reach Hugging Face: {e}")
+                delay = _backoff(attempt)
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return _summary_text(response)
+                if response.status_code == 503:
+                    # Cold model: the service is healthy, it just needs time.
+                    self.breaker.record_success()
+                    error = ModelLoadingError("⏳ The model is still loading. Please try again shortly.")
+                    delay = _estimated_time(response) or _backoff(attempt)
+                elif response.status_code == 429 or response.status_code >= 500:
+                    self.breaker.record_failure()
+                    error = InferenceError(f"❌ API Error {response.status_code}: {response.text[:200]}")
+                    delay = _retry_after(response) or _backoff(attempt)
+                else:
+                    self.breaker.record_success()
+                    raise InferenceError(f"❌ API Error {response.status_code}: {response.text[:200]}")
+
+            delay = min(delay, BACKOFF_MAX)
+            if attempt == self.max_retries or time.monotonic() + delay > deadline:
+                break
+            time.sleep(delay)
+        raise error
+
+
+def _backoff(attempt):
+    # Exponential with full jitter, so retrying sessions do not stampede.
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _estimated_time(response):
+    try:
+        return float(response.json().get("estimated_time"))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _summary_text(response):
+    try:
+        output = response.json()
+    except ValueError:
+        raise InferenceError(f"⚠️ Unexpected output: {response.text[:200]}")
+
+    # Handle different return formats
+    if isinstance(output, list) and output:
+        return output[0].get("summary_text", str(output[0]))
+    elif isinstance(output, dict) and "summary_text" in output:
+        return output["summary_text"]
+
+    raise InferenceError(f"⚠️ Unexpected output: {output}")
+
+
+# Shared by every Streamlit session in this process.
+inference_client = InferenceClient()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the Hugging Face inference API, for working offline:
+#
+#   python hf_stub.py --port 8765 --latency 0.5 --cold-starts 2
+#   HF_API_URL=http://127.0.0.1:8765/models streamlit run app.py
+#
+# POST /models/<model> answers like a summarization model with the first words
+# of the input. The first --cold-starts requests get a 503 "model is loading"
+# with an estimated_time, --fail-every N makes every Nth request a 500 and
+# --hang-every N makes every Nth request sleep past the client's read timeout.
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, cold_starts=0, estimated_time=1.0, fail_every=0, hang_every=0, hang_seconds=120.0, summary_words=40):
+        self.latency = latency
+        self.cold_starts = cold_starts
+        self.estimated_time = estimated_time
+        self.fail_every = fail_every
+        self.hang_every = hang_every
+        self.hang_seconds = hang_seconds
+        self.summary_words = summary_words
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.requests += 1
+                n = config.requests
+
+            if n <= config.cold_starts:
+                return self._reply(503, {"error": "Model is currently loading", "estimated_time": config.estimated_time})
+            if config.hang_every and n % config.hang_every == 0:
+                time.sleep(config.hang_seconds)
+            if config.fail_every and n % config.fail_every == 0:
+                return self._reply(500, {"error": "stub failure"})
+
+            time.sleep(config.latency)
+            words = str(payload.get("inputs", "")).split()
+            return self._reply(200, [{"summary_text": " ".join(words[:config.summary_words])}])
+
+    return Handler
+
+
+# Start the stub on a background thread; port 0 picks a free port.
+# Returns the server; its base URL is f"http://127.0.0.1:{server.server_port}/models".
+def start_stub_server(port=0, config=None):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Hugging Face inference API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per successful response")
+    parser.add_argument("--cold-starts", type=int, default=0, help="initial requests answered with 503")
+    parser.add_argument("--estimated-time", type=float, default=1.0, help="estimated_time sent with 503s")
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--hang-every", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _make_handler(StubConfig(
+        latency=args.latency, cold_starts=args.cold_starts, estimated_time=args.estimated_time,
+        fail_every=args.fail_every, hang_every=args.hang_every,
+    )))
+    print(f"Hugging Face stub listening on http://127.0.0.1:{args.port}/models")
+    server.serve_forever()
@@ -0,0 +1,412 @@
+import argparse
+import logging
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from db import (
+    init_db, insert_job, claim_job, update_job_progress, finish_job, cancel_job as request_cancel,
+    touch_jobs, touch_process, recover_stale_jobs, fail_orphaned_jobs, prune_jobs, job_counts,
+)
+from extraction import READ_BLOCK, PageStream, extract_text, file_digest
+from extractive import extractive_summary
+from metrics import request, span, tag_request, pages_bucket, size_bucket
+from pipeline import (
+    DEMO_MODE, OPENAI_MODE, HUGGING_FACE_MODE, OFFLINE_MODE, MODE_TAGS, DEMO_SUMMARIES,
+    summarize_document, summarize_changes, stream_summary_with_openai, stream_change_summary_with_openai,
+    stream_ai_risk_analysis, is_remote_timeout, risk_report,
+)
+from revisions import analyze_clauses, record_upload
+from risk import RiskScanner, load_lexicon
+from scheduler import PRIORITY_INTERACTIVE, caller
+from templates import template_index, seed_bundled_templates
+
+# Background jobs for the slow parts of the app: simplifying a contract and
+# the risk scans. A Streamlit page submits a job and polls it, so a rerun or a
+# dropped connection no longer throws the work away, and a session is never
+# blocked on extraction or a model call.
+#
+# The queue is the `jobs` table in SQLite; the uploaded PDF waits in JOB_DIR.
+# Worker threads claim jobs with one atomic UPDATE, so the app's own workers
+# and any number of extra worker processes can share a database:
+#
+#   python jobs.py --workers 8 --hf-token "$HF_TOKEN"
+#
+# Everything a job does blocks in library code (PyMuPDF, HTTP clients, SQLite),
+# so workers are threads; large PDFs are still extracted in extraction.py's
+# process pool, and model calls still queue in scheduler.py. OpenAI keys are
+# never written to the database: a job that needs one is pinned to the process
+# that received it and keeps the key in memory.
+
+log = logging.getLogger(__name__)
+
+# --- CONFIG ---
+JOB_DIR = os.path.join(".cache", "jobs")    # input PDFs of unfinished jobs
+JOB_WORKERS = int(os.environ.get("LEGALLITE_JOB_WORKERS", 4))
+POLL_SECONDS = 1.0           # idle workers look for queued jobs this often (and on every submit)
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 60           # a running job without a heartbeat this long lost its worker
+MAX_ATTEMPTS = 3
+PROGRESS_SECONDS = 0.5       # streamed output is saved at most this often
+RETENTION_SECONDS = 7 * 24 * 3600
+FINISHED = ("done", "failed", "cancelled")
+
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+OFFLINE_FALLBACK_NOTE = "⚠️ The AI service timed out, so here is an offline summary of the key sentences instead."
+LOST_WORKER_ERROR = "The server restarted before this job finished. Please submit it again."
+MISSING_KEY_ERROR = "🔑 This job needs your OpenAI API key, which this server no longer has. Please submit it again."
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# A job that cannot run; the message is shown to the user as it is.
+class JobError(Exception):
+    pass
+
+
+# --- INPUTS ---
+def _input_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.pdf")
+
+
+def _write_input(job_id, pdf_file):
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = _input_path(job_id)
+    pdf_file.seek(0)
+    with open(f"{path}.tmp", "wb") as f:
+        shutil.copyfileobj(pdf_file, f, READ_BLOCK)
+    pdf_file.seek(0)
+    os.replace(f"{path}.tmp", path)
+
+
+def _remove_input(job_id):
+    try:
+        os.remove(_input_path(job_id))
+    except OSError:
+        pass
+
+
+# The AI risk analysis always runs on OpenAI; the keyword scan on no model.
+def _request_labels(job):
+    mode = job["params"].get("mode", OPENAI_MODE if job["kind"] == "risk_analysis" else None)
+    try:
+        size = size_bucket(os.path.getsize(_input_path(job["id"])))
+    except OSError:
+        size = ""
+    return {"mode": MODE_TAGS.get(mode, ""), "size": size}
+
+
+# --- SUBMITTING ---
+_secrets = {}                    # job id -> {"api_key": ...}, for jobs pinned to this process
+_secrets_lock = threading.Lock()
+_wake = threading.Condition()
+
+
+# Queue `kind` for the PDF (an open binary file, copied to JOB_DIR in blocks)
+# and return the job id; the same job already queued or running is returned
+# instead of a duplicate. Pass the file's SHA-256 as digest if it is known;
+# it is also the extraction cache key. secrets stay in this process's memory
+# and pin the job to its workers; such a submit replaces the same job pinned
+# to another process, which may have lost its key.
+def submit_job(email, kind, pdf_file, filename, params, secrets=None, priority=PRIORITY_INTERACTIVE, digest=None):
+    job_id = uuid.uuid4().hex
+    digest = digest or file_digest(pdf_file)
+    _write_input(job_id, pdf_file)
+    if secrets:
+        touch_process(PROCESS_ID)
+        with _secrets_lock:
+            _secrets[job_id] = dict(secrets)
+    queued_id, replaced = insert_job(job_id, email, kind, priority, filename, digest, params,
+                                     PROCESS_ID if secrets else None)
+    for replaced_id in replaced:
+        _remove_input(replaced_id)
+    if queued_id != job_id:
+        _forget(job_id)
+    with _wake:
+        _wake.notify_all()
+    return queued_id
+
+
+def cancel_job(job_id, email):
+    status = request_cancel(job_id, email)
+    if status == "cancelled":
+        _forget(job_id)
+    return status
+
+
+def _forget(job_id):
+    _remove_input(job_id)
+    with _secrets_lock:
+        _secrets.pop(job_id, None)
+
+
+def job_gauges():
+    counts = job_counts()
+    return {f"legallite_jobs_{status}": counts.get(status, 0) for status in ("queued", "running") + FINISHED}
+
+
+# --- RUNNING ---
+class JobContext:
+    def __init__(self, job, workers):
+        self.job = job
+        self.id = job["id"]
+        self.params = job["params"]
+        self.workers = workers
+        self.notes = []              # [level, text] shown with the result
+        self.upload_id = None
+        self._saved = 0.0
+
+    def secret(self, name):
+        with _secrets_lock:
+            value = _secrets.get(self.id, {}).get(name)
+        if not value:
+            raise JobError(MISSING_KEY_ERROR)
+        return value
+
+    def note(self, level, text):
+        self.notes.append([level, text])
+
+    # Record what the job is doing; raises JobCancelled once the user has
+    # cancelled it. Frequent updates (pages, tokens) pass throttle=True and
+    # are saved at most every PROGRESS_SECONDS.
+    def progress(self, stage, partial=None, throttle=False, pages=None):
+        now = time.monotonic()
+        if throttle and now - self._saved < PROGRESS_SECONDS:
+            return
+        self._saved = now
+        if update_job_progress(self.id, stage, partial, pages):
+            raise JobCancelled()
+
+    # Collect a token stream, saving the text so far for the page to show.
+    def stream(self, stage, tokens):
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                if time.monotonic() - self._saved >= PROGRESS_SECONDS:
+                    self.progress(stage, "".join(parts))
+        finally:
+            tokens.close()   # releases the model slot if the job was cancelled
+        return "".join(parts)
+
+    # Yield the input's pages as they are extracted, so callers can work on
+    # page 1 while later pages are still being read. The file in JOB_DIR is
+    # read in place and the job's digest is the extraction cache key. Page
+    # progress is saved for the page's progress bar. pages_done reaches
+    # page_count only once the stream is exhausted, i.e. after PageStream has
+    # cached the text, so the page can fetch it from the extraction cache.
+    def pages(self, stage="Extracting text"):
+        with span("extract") as timing:
+            page_stream = PageStream(path=_input_path(self.id), digest=self.job["digest"])
+            count = page_stream.page_count
+            tag_request(pages=pages_bucket(count))
+            timing.tag(cache="hit" if page_stream.from_cache else "miss")
+            for number, page in enumerate(page_stream):
+                self.progress(stage, throttle=True, pages=(number, count))
+                yield page
+            self.progress(stage, pages=(count, count))
+
+
+# The bundled samples are indexed the first time a worker needs them.
+def _read_sample(path):
+    with open(path, "rb") as f:
+        return extract_text(f.read())
+
+
+def seed_templates():
+    seed_bundled_templates(DEMO_MODE, DEMO_SUMMARIES, _read_sample)
+
+
+def _summarize(ctx, text, mode, filename):
+    try:
+        if mode == OPENAI_MODE:
+            return ctx.stream("Summarizing", stream_summary_with_openai(text, ctx.secret("api_key"))), mode
+        if mode == HUGGING_FACE_MODE:
+            return summarize_document(text, mode, hf_token=ctx.workers.hf_token), mode
+    except Exception as e:
+        if not is_remote_timeout(e):
+            raise
+        ctx.note("warning", OFFLINE_FALLBACK_NOTE)
+        return extractive_summary(text), OFFLINE_MODE
+    return summarize_document(text, mode, doc_name=filename), mode
+
+
+def _summarize_changes(ctx, analysis, mode):
+    try:
+        if mode == OPENAI_MODE:
+            return ctx.stream("Summarizing the changes", stream_change_summary_with_openai(analysis, ctx.secret("api_key")))
+        return summarize_changes(analysis, mode, hf_token=ctx.workers.hf_token)
+    except Exception as e:
+        if not is_remote_timeout(e):
+            raise
+        ctx.note("warning", OFFLINE_FALLBACK_NOTE)
+        return extractive_summary(analysis.changed_text())
+
+
+# Same steps as the Simplify button used to run in the page: a revision of an
+# earlier upload only has its changed clauses summarized, a known template
+# reuses that summary, anything else goes to the chosen mode. The summary is
+# saved to the user's history.
+def run_simplify(ctx):
+    email, filename = ctx.job["user_email"], ctx.job["filename"]
+    mode = ctx.params["mode"]
+    full_text = "".join(ctx.pages())
+
+    ctx.progress("Comparing with your earlier uploads")
+    with span("clauses") as timing:
+        analysis = analyze_clauses(email, full_text, mode, ctx.workers.scanner)
+        timing.tag(clauses=len(analysis.clauses), scanned=analysis.scanned, revision=analysis.is_revision)
+    template = None
+    if not analysis.is_revision and mode != OFFLINE_MODE:
+        ctx.progress("Looking for a matching template")
+        with span("template_lookup") as timing:
+            seed_templates()
+            template = template_index.lookup(full_text, mode, email)
+            timing.tag(cache="miss" if template is None else "hit")
+
+    ctx.progress("Summarizing")
+    summary_mode = mode
+    with span("summarize", chars=len(full_text)):
+        if analysis.is_revision:
+            previous = analysis.previous
+            ctx.note("info", f"🔁 This looks like a revision of **{previous['filename']}** ({previous['timestamp']}); "
+                             f"only the changed clauses are analyzed.")
+            simplified = analysis.compose_summary("" if analysis.unchanged else _summarize_changes(ctx, analysis, mode))
+        elif template is not None:
+            ctx.note("info", f"📋 This matches a known template ({template.similarity:.0%} similar), so its summary is reused.")
+            simplified = template.summary
+        else:
+            simplified, summary_mode = _summarize(ctx, full_text, mode, filename)
+
+    ctx.progress("Saving to your history")
+    ctx.upload_id = record_upload(email, filename, simplified, analysis, summary_mode)
+    if template is None and not analysis.is_revision and summary_mode in (OPENAI_MODE, HUGGING_FACE_MODE):
+        template_index.add(full_text, summary_mode, simplified, owner=email, filename=filename)
+    return {
+        "summary": simplified,
+        "notes": ctx.notes,
+        "changed_risk_terms": analysis.changed_risk_terms() if analysis.is_revision else [],
+    }
+
+
+# Each page is scanned as soon as it is extracted.
+def run_risk_scan(ctx):
+    return risk_report(list(ctx.workers.scanner.scan_stream(ctx.pages("Scanning for risky terms"))))
+
+
+def run_risk_analysis(ctx):
+    text = "".join(ctx.pages())
+    tokens = stream_ai_risk_analysis(text, ctx.secret("api_key"), ctx.workers.risk_queries, ctx.workers.scanner)
+    return {"analysis": ctx.stream("Analyzing risks", tokens)}
+
+
+RUNNERS = {"simplify": run_simplify, "risk_scan": run_risk_scan, "risk_analysis": run_risk_analysis}
+
+
+# --- WORKERS ---
+class JobWorkers:
+    def __init__(self, workers=JOB_WORKERS, hf_token="", scanner=None, risk_queries=()):
+        self.workers = max(1, workers)
+        self.hf_token = hf_token
+        self.scanner = scanner or RiskScanner()
+        self.risk_queries = list(risk_queries)
+        self._running = set()        # ids of jobs this process is running
+        self._lock = threading.Lock()
+
+    def start(self):
+        touch_process(PROCESS_ID)
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._housekeeping, name="job-housekeeping", daemon=True).start()
+        return self
+
+    def _work(self):
+        while True:
+            try:
+                job = claim_job(PROCESS_ID)
+            except Exception:
+                log.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                with _wake:
+                    _wake.wait(POLL_SECONDS)
+                continue
+            with self._lock:
+                self._running.add(job["id"])
+            try:
+                self.run(job)
+            finally:
+                with self._lock:
+                    self._running.discard(job["id"])
+
+    def run(self, job):
+        ctx = JobContext(job, self)
+        with request(f"job_{job['kind']}", labels=_request_labels(job), user=job["user_email"], filename=job["filename"]), \
+                caller(job["user_email"], job["priority"]):
+            try:
+                result = RUNNERS[job["kind"]](ctx)
+            except JobCancelled:
+                finish_job(job["id"], "cancelled")
+            except JobError as e:
+                finish_job(job["id"], "failed", error=str(e))
+            except Exception as e:
+                log.exception("Job %s (%s) failed", job["id"], job["kind"])
+                finish_job(job["id"], "failed", error=str(e))
+            else:
+                finish_job(job["id"], "done", result=result, upload_id=ctx.upload_id)
+            finally:
+                _forget(job["id"])
+
+    # Heartbeats for this process and its jobs; jobs of workers that died are
+    # requeued (or failed), queued jobs pinned to a dead process fail, and
+    # old finished jobs are deleted.
+    def _housekeeping(self):
+        pruned = 0.0
+        while True:
+            try:
+                touch_process(PROCESS_ID)
+                with self._lock:
+                    running = list(self._running)
+                touch_jobs(running)
+                stale = time.time() - STALE_SECONDS
+                for job_id in recover_stale_jobs(stale, MAX_ATTEMPTS, LOST_WORKER_ERROR):
+                    _remove_input(job_id)
+                for job_id in fail_orphaned_jobs(stale, MISSING_KEY_ERROR):
+                    _remove_input(job_id)
+                if time.time() - pruned > 3600:
+                    prune_jobs(time.time() - RETENTION_SECONDS)
+                    pruned = time.time()
+            except Exception:
+                log.exception("Job housekeeping failed")
+            time.sleep(HEARTBEAT_SECONDS)
+
+
+# --- CLI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run LegalLite job workers against the app's database.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="worker threads")
+    parser.add_argument("--hf-token", default=os.environ.get("HF_TOKEN", ""))
+    parser.add_argument("--lexicon", help="JSON risk lexicon (term -> weight) merged into the defaults")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    scanner = RiskScanner(load_lexicon(args.lexicon)) if args.lexicon else RiskScanner()
+    JobWorkers(args.workers, args.hf_token, scanner).start()
+    print(f"{args.workers} job worker(s) running as {PROCESS_ID}; Ctrl+C to stop", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
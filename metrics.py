@@ -0,0 +1,293 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Lightweight in-process latency metrics. span() times one stage into a
+# histogram (a perf_counter pair, a lock and a bisect, a few microseconds);
+# request() groups the spans of one user action and keeps it in a ring buffer
+# of recent slow requests. render_prometheus() exports everything in the
+# Prometheus text format, served by start_http_server() or written to a file.
+
+# --- CONFIG ---
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SLOW_REQUEST_SECONDS = float(os.environ.get("LEGALLITE_SLOW_REQUEST_SECONDS", 5))
+RECENT_SLOW_REQUESTS = 200
+STAGE_METRIC = "legallite_stage_seconds"
+REQUEST_METRIC = "legallite_request_seconds"
+
+# Labels are kept low-cardinality; exact sizes go to the slow-request log only.
+LABELS = ("stage", "mode", "cache", "size", "pages")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    # Estimated from the buckets, like Prometheus' histogram_quantile().
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+_lock = threading.Lock()
+_histograms = {}                 # (metric, labels tuple) -> Histogram
+_slow_requests = deque(maxlen=RECENT_SLOW_REQUESTS)
+_collectors = []                 # callables returning {name: value}; *_total are counters
+_current = contextvars.ContextVar("legallite_request", default=None)
+
+
+def size_bucket(num_bytes):
+    mb = num_bytes / (1024 * 1024)
+    if mb < 1:
+        return "<1MB"
+    if mb < 10:
+        return "1-10MB"
+    return ">=10MB"
+
+
+def pages_bucket(pages):
+    if pages <= 10:
+        return "1-10"
+    if pages <= 100:
+        return "11-100"
+    return ">100"
+
+
+def _label_values(tags):
+    return tuple(str(tags.get(name, "")) for name in LABELS)
+
+
+def observe(metric, seconds, **tags):
+    key = (metric, _label_values(tags))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+# --- SPANS ---
+class Span:
+    def __init__(self, stage, tags):
+        self.stage = stage
+        self.tags = tags
+        self.seconds = 0.0
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+
+@contextmanager
+def span(stage, **tags):
+    current = Span(stage, tags)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - started
+        request_info = _current.get()
+        if request_info is not None:
+            request_info["stages"].append((stage, round(current.seconds, 4), dict(current.tags)))
+            labels = dict(request_info["labels"], **current.tags)
+        else:
+            labels = current.tags
+        observe(STAGE_METRIC, current.seconds, stage=stage, **labels)
+
+
+def timed(stage):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Group the spans of one user action (e.g. a Simplify click). Labels given here
+# are applied to every span inside it; details only go to the slow log.
+@contextmanager
+def request(name, labels=None, **details):
+    info = {"name": name, "labels": dict(labels or {}), "details": details, "stages": []}
+    token = _current.set(info)
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - started
+        _current.reset(token)
+        observe(REQUEST_METRIC, seconds, stage=name, **info["labels"])
+        if seconds >= SLOW_REQUEST_SECONDS:
+            with _lock:
+                _slow_requests.append({
+                    "request": name,
+                    "seconds": round(seconds, 3),
+                    "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    **info["labels"],
+                    **info["details"],
+                    "stages": info["stages"],
+                })
+
+
+# Add labels to the current request once they are known (e.g. page count).
+def tag_request(**labels):
+    request_info = _current.get()
+    if request_info is not None:
+        request_info["labels"].update(labels)
+
+
+def recent_slow_requests():
+    with _lock:
+        return list(reversed(_slow_requests))
+
+
+def stage_summary():
+    with _lock:
+        items = list(_histograms.items())
+    merged = {}
+    for (metric, labels), histogram in items:
+        key = (metric, labels[0])
+        total = merged.setdefault(key, Histogram())
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.total += histogram.total
+        total.count += histogram.count
+    return [
+        {
+            "metric": metric,
+            "stage": stage,
+            "count": h.count,
+            "mean_s": round(h.total / h.count, 4) if h.count else 0.0,
+            "p50_s": round(h.quantile(0.5), 4),
+            "p95_s": round(h.quantile(0.95), 4),
+        }
+        for (metric, stage), h in sorted(merged.items())
+    ]
+
+
+def register_collector(fn):
+    with _lock:
+        if fn not in _collectors:
+            _collectors.append(fn)
+
+
+# --- EXPORT ---
+def _format_labels(labels):
+    pairs = [f'{name}="{value}"' for name, value in zip(LABELS, labels) if value]
+    return ",".join(pairs)
+
+
+def render_prometheus():
+    with _lock:
+        items = sorted((k, (list(h.counts), h.total, h.count)) for k, h in _histograms.items())
+        collectors = list(_collectors)
+
+    lines = []
+    described = set()
+    for (metric, labels), (counts, total, count) in items:
+        if metric not in described:
+            lines.append(f"# TYPE {metric} histogram")
+            described.add(metric)
+        base = _format_labels(labels)
+        sep = "," if base else ""
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{base}{sep}le="+Inf"}} {count}')
+        lines.append(f"{metric}_sum{{{base}}} {total}")
+        lines.append(f"{metric}_count{{{base}}} {count}")
+
+    for collect in collectors:
+        try:
+            values = collect()
+        except Exception:
+            continue
+        for name, value in sorted(values.items()):
+            # Prometheus convention: *_total only ever goes up.
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+_server = None
+
+
+# Serve /metrics on a background thread; later calls return the same server.
+# http.server is only imported when the endpoint is enabled.
+def start_http_server(port, host="127.0.0.1"):
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
+
+
+_file_exporter = None
+
+
+# Rewrite a Prometheus text file every interval seconds, for node_exporter's
+# textfile collector or anything else that scrapes files.
+def start_file_exporter(path, interval=15):
+    global _file_exporter
+
+    def run():
+        while True:
+            try:
+                write_prometheus(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    with _lock:
+        if _file_exporter is None:
+            _file_exporter = threading.Thread(target=run, name="metrics-file", daemon=True)
+            _file_exporter.start()
+        return _file_exporter
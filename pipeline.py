@@ -0,0 +1,325 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO
+from datetime import datetime
+
+from extraction import extract_pages
+from extractive import extractive_summary
+from hf_client import CircuitOpenError, InferenceTimeout, InferenceUnavailable, inference_client
+from retrieval import excerpt_note, select_for_risk
+from scheduler import QueueTimeout, llm_scheduler
+from risk import group_hits, risk_score
+from summarize import map_reduce_summarize, prepare_final_call
+from summary_cache import cache_key, cached_completion, summary_cache
+
+# The LegalLite document pipeline with no Streamlit dependency: extraction,
+# risk scanning, summarization and PDF rendering. Used by app.py and batch.py.
+
+# --- MODES ---
+DEMO_MODE = "Demo Mode"
+OPENAI_MODE = "Use Your Own OpenAI API Key"
+HUGGING_FACE_MODE = "Use Open-Source AI via Hugging Face"
+OFFLINE_MODE = "Offline Extractive Summary"
+# Short names for the metric labels
+MODE_TAGS = {DEMO_MODE: "demo", OPENAI_MODE: "openai", HUGGING_FACE_MODE: "huggingface", OFFLINE_MODE: "offline"}
+
+# --- HUGGING FACE API WRAPPER ---
+# ⚠️ The free inference API rejects long inputs (400 or 500), so documents are
+# summarized in chunks of at most this many characters and then reduced.
+HF_MAX_CHARS = 3000
+OPENAI_MAX_CHARS = 12000
+
+HF_MODEL = "sshleifer/distilbart-cnn-12-6"
+HF_PARAMETERS = {
+    "min_length": 30,     # Force it to write at least a bit
+    "max_length": 150,    # Cap the length
+    "do_sample": False    # Deterministic (faster/stable)
+}
+
+def query_huggingface_api(prompt, hf_token):
+    prompt = prompt[:HF_MAX_CHARS]
+    return cached_completion(prompt, "huggingface", HF_MODEL, "", HF_PARAMETERS, lambda: _post_huggingface(prompt, hf_token))
+
+# Every model call waits for a slot in the shared scheduler (scheduler.py).
+def _post_huggingface(prompt, hf_token):
+    with llm_scheduler.slot("huggingface", hf_token):
+        return inference_client.summarize(HF_MODEL, prompt, hf_token, HF_PARAMETERS)
+
+# Raises hf_client.InferenceError (with a user-facing message) on failure.
+def summarize_with_huggingface(text, hf_token):
+    query = lambda prompt: query_huggingface_api(prompt, hf_token)
+    return map_reduce_summarize(text, query, query, HF_MAX_CHARS)
+
+# --- OPENAI WRAPPER ---
+OPENAI_MODEL = "gpt-3.5-turbo"
+SIMPLIFY_PROMPT = "You are a legal assistant. Simplify legal documents in plain English."
+COMBINE_PROMPT = "You are a legal assistant. Combine these partial plain-English summaries of one legal document into a single plain-English summary."
+CHANGES_PROMPT = "You are a legal assistant. These clauses of a contract were revised, added or removed since the previous version. Explain in plain English what changed and how it affects the signer."
+RISK_PROMPT = "You are a legal risk analysis assistant. Identify clauses in contracts that could pose legal or financial risks to the signer, explain why, and suggest ways to mitigate them."
+
+OPENAI_TIMEOUT = 60   # seconds; a timeout falls back to the offline summary
+
+# One client per API key, so its HTTP connections stay alive between clicks.
+MAX_OPENAI_CLIENTS = 64
+_openai_clients = OrderedDict()
+_openai_clients_lock = threading.Lock()
+
+def openai_client(api_key):
+    with _openai_clients_lock:
+        client = _openai_clients.get(api_key)
+        if client is not None:
+            _openai_clients.move_to_end(api_key)
+            return client
+    from openai import OpenAI
+    client = OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT)
+    with _openai_clients_lock:
+        client = _openai_clients.setdefault(api_key, client)
+        _openai_clients.move_to_end(api_key)
+        while len(_openai_clients) > MAX_OPENAI_CLIENTS:
+            _openai_clients.popitem(last=False)
+    return client
+
+def _openai_messages(system_prompt, text):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text}
+    ]
+
+def query_openai(api_key, system_prompt, text):
+    return cached_completion(text, "openai", OPENAI_MODEL, system_prompt, {}, lambda: _post_openai(api_key, system_prompt, text))
+
+def _post_openai(api_key, system_prompt, text):
+    with llm_scheduler.slot("openai", api_key), _throttle_on_429(api_key):
+        response = openai_client(api_key).chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_openai_messages(system_prompt, text)
+        )
+    return response.choices[0].message.content
+
+# A 429 that gets past the scheduler's limits (e.g. the key is shared with
+# other apps) holds back further calls with that key for a while.
+OPENAI_THROTTLE_SECONDS = 10
+
+@contextmanager
+def _throttle_on_429(api_key):
+    try:
+        yield
+    except Exception as e:
+        if type(e).__name__ == "RateLimitError":
+            llm_scheduler.pause("openai", api_key, OPENAI_THROTTLE_SECONDS)
+        raise
+
+# Yield the answer as tokens arrive; a cached answer, or one an identical
+# call in flight is already streaming, is yielded in one piece. The full text
+# is cached once the stream completes.
+def stream_openai(api_key, system_prompt, text):
+    key = cache_key(text, "openai", OPENAI_MODEL, system_prompt, {})
+    yield from summary_cache.stream_or_compute(key, lambda: _stream_tokens(api_key, system_prompt, text))
+
+def _stream_tokens(api_key, system_prompt, text):
+    with llm_scheduler.slot("openai", api_key), _throttle_on_429(api_key):
+        stream = openai_client(api_key).chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_openai_messages(system_prompt, text),
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+# Long documents are summarized chunk by chunk and the partial summaries
+# combined (summarize.py), so no part of the contract is left out.
+def summarize_with_openai(text, api_key):
+    return map_reduce_summarize(
+        text,
+        lambda chunk: query_openai(api_key, SIMPLIFY_PROMPT, chunk),
+        lambda partials: query_openai(api_key, COMBINE_PROMPT, partials),
+        OPENAI_MAX_CHARS,
+    )
+
+# Chunk summaries are fetched concurrently as usual; only the final call
+# (the single chunk, or the combine step) is streamed.
+def stream_summary_with_openai(text, api_key):
+    kind, final_input = prepare_final_call(
+        text,
+        lambda chunk: query_openai(api_key, SIMPLIFY_PROMPT, chunk),
+        lambda partials: query_openai(api_key, COMBINE_PROMPT, partials),
+        OPENAI_MAX_CHARS,
+    )
+    if kind is None:
+        return
+    yield from stream_openai(api_key, SIMPLIFY_PROMPT if kind == "map" else COMBINE_PROMPT, final_input)
+
+# --- REVISIONS ---
+# Summaries of only the clauses that changed since an earlier version
+# (a revisions.ClauseAnalysis). OpenAI gets before/after pairs; the other
+# backends condense the new text of the changed clauses.
+def summarize_changes(analysis, mode, api_key="", hf_token="", fallback=False):
+    if analysis.unchanged:
+        return ""
+    changed_text = analysis.changed_text()
+    try:
+        if mode == OPENAI_MODE:
+            return map_reduce_summarize(
+                analysis.change_text(),
+                lambda chunk: query_openai(api_key, CHANGES_PROMPT, chunk),
+                lambda partials: query_openai(api_key, COMBINE_PROMPT, partials),
+                OPENAI_MAX_CHARS,
+            )
+        if mode == HUGGING_FACE_MODE:
+            return summarize_with_huggingface(changed_text, hf_token)
+    except Exception as e:
+        if fallback and is_remote_timeout(e):
+            return extractive_summary(changed_text)
+        raise
+    if mode == OFFLINE_MODE:
+        return extractive_summary(changed_text)
+    return ""   # Demo mode: the list of changed clauses says it all
+
+def stream_change_summary_with_openai(analysis, api_key):
+    if analysis.unchanged:
+        return
+    kind, final_input = prepare_final_call(
+        analysis.change_text(),
+        lambda chunk: query_openai(api_key, CHANGES_PROMPT, chunk),
+        lambda partials: query_openai(api_key, COMBINE_PROMPT, partials),
+        OPENAI_MAX_CHARS,
+    )
+    if kind is None:
+        return
+    yield from stream_openai(api_key, CHANGES_PROMPT if kind == "map" else COMBINE_PROMPT, final_input)
+
+# --- AI RISK TERMS ---
+# Only the clauses matching the risk topics (plus `queries`) and the lexicon
+# hits are sent, within retrieval.RISK_TOKEN_BUDGET.
+def _risk_input(text, queries=None, scanner=None):
+    selection = select_for_risk(text, queries, scanner)
+    return excerpt_note(selection) + selection.text
+
+def stream_ai_risk_analysis(text, api_key, queries=None, scanner=None):
+    try:
+        yield from stream_openai(api_key, RISK_PROMPT, _risk_input(text, queries, scanner))
+    except Exception as e:
+        yield f"❌ AI Analysis failed: {e}"
+
+# --- DEMO SUMMARIES ---
+DEMO_SUMMARIES = {
+    "rental": """
+This is a rental agreement made between Mr. Rakesh Kumar (the property owner) and Mr. Anil Reddy (the person renting).
+
+- The house is in Jubilee Hills, Hyderabad.
+- Rent is ₹18,000/month, paid by the 5th.
+- Anil pays a ₹36,000 security deposit.
+- The rental period is 11 months: from August 1, 2025, to June 30, 2026.
+- Either side can cancel the agreement with 1 month’s written notice.
+- Anil can't sub-rent the house to anyone else unless Rakesh agrees.
+
+In short: this document explains the rules of staying in the rented house, money terms, and how both sides can exit the deal.
+                    """,
+    "nda": """
+This Non-Disclosure Agreement (NDA) is between TechNova Pvt. Ltd. and Mr. Kiran Rao.
+
+- Kiran will receive sensitive business information from TechNova.
+- He agrees to keep this confidential and not use it for anything other than their business discussions.
+- This includes technical data, strategies, client info, designs, etc.
+- He cannot share it, even after the project ends, for 3 years.
+- Exceptions: if info is public, received legally from others, or required by law.
+- If he breaks the agreement, TechNova can take legal action, including asking the court to stop him immediately.
+
+In short: Kiran must not reveal or misuse any business secrets he gets from TechNova during their potential partnership.
+                    """,
+    "employment": """
+This is an official job contract between GlobalTech Ltd. and Ms. Priya Sharma.
+
+- Priya will join as a Senior Software Engineer from August 1, 2025.
+- She will earn Rs. 12,00,000/year, including bonuses and allowances.
+- She must work 40+ hours/week, either from office or remotely.
+- First 6 months = probation, 15-day notice for quitting or firing.
+- After that, it becomes 60-day notice.
+- She must not share company secrets or join rival companies for 1 year after leaving.
+- Any inventions or code she builds belong to the company.
+- She gets 20 paid leaves + public holidays.
+
+In short: This contract outlines Priya’s job, salary, rules during and after employment, and what happens if she quits or is fired.
+                    """,
+}
+
+def demo_summary(doc_name):
+    doc_name = doc_name.lower()
+    for keyword, summary in DEMO_SUMMARIES.items():
+        if keyword in doc_name:
+            return summary
+    return "📜 Demo Summary: Unable to identify document type. This is a general contract."
+
+# --- SUMMARIZE ---
+# Errors from either backend propagate to the caller, except that with
+# fallback=True a timed-out or unreachable backend yields the offline summary.
+def summarize_document(full_text, mode, doc_name="", api_key="", hf_token="", fallback=False):
+    try:
+        if mode == OPENAI_MODE:
+            return summarize_with_openai(full_text, api_key)
+        if mode == HUGGING_FACE_MODE:
+            return summarize_with_huggingface(full_text, hf_token)
+    except Exception as e:
+        if fallback and is_remote_timeout(e):
+            return extractive_summary(full_text)
+        raise
+    if mode == OFFLINE_MODE:
+        return extractive_summary(full_text)
+    return demo_summary(doc_name)
+
+def is_remote_timeout(error):
+    if isinstance(error, (InferenceTimeout, InferenceUnavailable, CircuitOpenError, QueueTimeout)):
+        return True
+    try:
+        from openai import APIConnectionError   # APITimeoutError is a subclass
+    except ImportError:
+        return False
+    return isinstance(error, APIConnectionError)
+
+# --- RISK REPORT ---
+def scan_document(pdf_bytes, scanner):
+    pages = extract_pages(pdf_bytes)
+    return pages, scanner.scan(pages)
+
+def risk_report(hits):
+    return {
+        "score": risk_score(hits),
+        "terms": {term: len(term_hits) for term, term_hits in group_hits(hits).items()},
+        "hits": [hit._asdict() for hit in hits],
+    }
+
+# --- PDF EXPORT ---
+def generate_pdf(summary_text, filename):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    c.setFont("Helvetica", 12)
+    margin = 40
+    y = height - margin
+
+    c.drawString(margin, y, f"LegalLite Summary - {filename}")
+    y -= 20
+    c.drawString(margin, y, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    y -= 30
+
+    lines = summary_text.split('\n')
+    for line in lines:
+        for subline in [line[i:i+90] for i in range(0, len(line), 90)]:
+            if y < margin:
+                c.showPage()
+                c.setFont("Helvetica", 12)
+                y = height - margin
+            c.drawString(margin, y, subline)
+            y -= 20
+
+    c.save()
+    buffer.seek(0)
+    return buffer
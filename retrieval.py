@@ -0,0 +1,178 @@
+import math
+import re
+from collections import Counter, namedtuple
+
+from extractive import STOPWORDS
+from risk import default_scanner
+from summarize import split_clauses
+
+# Picks the clauses of one document worth sending to the AI risk analysis.
+# A small BM25 index is built over the document's clauses and queried with a
+# fixed set of risk topics plus the risk-lexicon terms actually found
+# in the document; the best clauses are packed, in document order, into a
+# token budget. Boilerplate stays home and long contracts fit the context.
+
+# --- CONFIG ---
+RISK_TOKEN_BUDGET = 6000      # input tokens for the AI risk analysis
+MAX_CLAUSE_TOKENS = 800       # longer clauses are cut to this many tokens
+LEAD_CLAUSES = 2              # title and parties: always kept for context
+CHARS_PER_TOKEN = 4           # estimate used when tiktoken is not installed
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+K1 = 1.5
+B = 0.75
+HIT_BOOST = 1.0               # added per lexicon weight of a risk hit in the clause
+STEM_CHARS = 6                # "terminate", "termination" -> "termin"
+
+# Topics searched for in every document; extend with the RISK_QUERIES secret.
+RISK_QUERIES = [
+    "terminate termination cancel notice period",
+    "penalty penalties fine late fee interest charges",
+    "indemnify indemnification hold harmless",
+    "liability liable damages limitation of liability consequential",
+    "liquidated damages forfeit forfeiture deposit",
+    "automatic renewal renew auto-renew extension",
+    "binding arbitration dispute jurisdiction governing law venue",
+    "non-compete non-solicit restrictive covenant",
+    "confidential confidentiality non-disclosure",
+    "intellectual property assign assignment ownership inventions",
+    "waiver waive rights remedies",
+    "breach default remedy cure",
+    "exclusive exclusivity",
+    "unilateral sole discretion amend modify without notice",
+]
+
+Selection = namedtuple("Selection", "text clauses selected tokens")
+
+_WORD = re.compile(r"[a-z][a-z\-]+")
+_GAP = "[…]"
+
+
+# --- TOKENS ---
+_encoding = None
+
+
+# Exact with tiktoken, otherwise a character-count estimate.
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _truncate(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * CHARS_PER_TOKEN]
+    while count_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+# --- INDEX ---
+def _terms(text):
+    return [word[:STEM_CHARS] for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class ClauseIndex:
+    def __init__(self, clauses):
+        import numpy as np
+        self.clauses = clauses
+        self.lengths = np.zeros(len(clauses))
+        self.postings = {}   # term -> (clause positions, term frequencies)
+        for position, clause in enumerate(clauses):
+            counts = Counter(_terms(clause))
+            self.lengths[position] = sum(counts.values())
+            for term, tf in counts.items():
+                self.postings.setdefault(term, ([], []))
+                self.postings[term][0].append(position)
+                self.postings[term][1].append(tf)
+        self.average_length = self.lengths.mean() if clauses else 0.0
+
+    # BM25 score of every clause for a bag of query terms -> weight.
+    def score(self, weights):
+        import numpy as np
+        scores = np.zeros(len(self.clauses))
+        if not self.clauses:
+            return scores
+        norm = K1 * (1 - B + B * self.lengths / max(self.average_length, 1.0))
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            positions = np.asarray(posting[0])
+            tf = np.asarray(posting[1], dtype=float)
+            df = len(positions)
+            idf = math.log(1 + (len(self.clauses) - df + 0.5) / (df + 0.5))
+            scores[positions] += weight * idf * tf * (K1 + 1) / (tf + norm[positions])
+        return scores
+
+
+def _query_weights(queries):
+    weights = Counter()
+    for query in queries:
+        for term in set(_terms(query)):
+            weights[term] += 1
+    return weights
+
+
+# --- SELECTION ---
+# The clauses of `text` most relevant to `queries` and to the risk terms found
+# in it, within `budget` tokens and in document order. A document that
+# already fits is returned unchanged.
+def select_clauses(text, queries, budget, scanner=None):
+    import numpy as np
+    total = count_tokens(text)
+    clauses = split_clauses(text)
+    if total <= budget:
+        return Selection(text, len(clauses), len(clauses), total)
+
+    scanner = scanner or default_scanner
+    hits = [scanner.scan(clause) for clause in clauses]
+    found = {hit.term for clause_hits in hits for hit in clause_hits}
+    weights = _query_weights(list(queries) + sorted(found))
+
+    scores = ClauseIndex(clauses).score(weights)
+    scores += HIT_BOOST * np.array([sum(hit.weight for hit in clause_hits) for clause_hits in hits])
+    scores[:LEAD_CLAUSES] = np.inf
+
+    separator = count_tokens(f"\n\n{_GAP}\n\n")
+    chosen = {}
+    used = 0
+    for position in np.argsort(-scores, kind="stable"):
+        if scores[position] <= 0:
+            break
+        clause = _truncate(clauses[position], MAX_CLAUSE_TOKENS)
+        cost = count_tokens(clause) + separator
+        if used + cost <= budget:
+            chosen[int(position)] = clause
+            used += cost
+
+    parts = []
+    previous = -1
+    for position in sorted(chosen):
+        if position != previous + 1:
+            parts.append(_GAP)
+        parts.append(chosen[position])
+        previous = position
+    if previous != len(clauses) - 1:
+        parts.append(_GAP)
+    compacted = "\n\n".join(parts)
+    return Selection(compacted, len(clauses), len(chosen), count_tokens(compacted))
+
+
+def select_for_risk(text, queries=None, scanner=None, budget=RISK_TOKEN_BUDGET):
+    return select_clauses(text, RISK_QUERIES + list(queries or []), budget, scanner)
+
+
+# A line for the model so it knows it is reading excerpts.
+def excerpt_note(selection):
+    if selection.selected == selection.clauses:
+        return ""
+    return (f"(Excerpt: {selection.selected} of {selection.clauses} clauses of a longer contract, "
+            f"chosen for relevance; omitted text is marked {_GAP}.)\n\n")
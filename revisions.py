@@ -0,0 +1,186 @@
+import difflib
+import hashlib
+import re
+from collections import namedtuple
+
+from db import find_previous_upload, get_upload_clauses, insert_upload_with_clauses
+from risk import find_risky_terms
+from summarize import split_clauses
+
+# Contracts come back revision after revision. Every upload is split into
+# numbered clauses whose hashes are stored with it; when a new upload shares
+# most of its clauses with one of the user's earlier uploads, only the changed
+# and new clauses are risk-scanned and summarized, and everything else is
+# reused from that earlier version.
+
+# --- CONFIG ---
+LOOKBACK_UPLOADS = 200      # how many of the user's recent uploads to compare against
+MIN_SHARED_FRACTION = 0.5   # share of clauses that must match to count as a revision
+MAX_LISTED_CHANGES = 12     # clause numbers listed per kind in the summary header
+
+Clause = namedtuple("Clause", "position number text digest")
+Change = namedtuple("Change", "kind old new")   # kind: "revised", "added" or "removed"
+
+# "12.", "4.2", "4.2)", "(b)", "Section 3", "Article IV"
+_CLAUSE_NUMBER = re.compile(
+    r"^\s*(\d+(?:\.\d+)+\.?|\d+[.)]|\([a-z0-9]{1,4}\)|(?:section|article|clause|schedule)\s+[\w.]+)\s*",
+    re.IGNORECASE,
+)
+
+
+# --- CLAUSES ---
+# The hash ignores the clause number, case and spacing, so renumbering or
+# reflowing a clause does not count as a change.
+def clause_digest(body):
+    normalized = " ".join(body.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def split_into_clauses(text):
+    clauses = []
+    for position, block in enumerate(split_clauses(text)):
+        match = _CLAUSE_NUMBER.match(block)
+        if match:
+            number = match.group(1).rstrip(".)") if match.group(1)[0].isdigit() else match.group(1)
+            body = block[match.end():]
+        else:
+            number = f"¶{position + 1}"
+            body = block
+        clauses.append(Clause(position, number, block, clause_digest(body)))
+    return clauses
+
+
+def diff_clauses(old, new):
+    matcher = difflib.SequenceMatcher(None, [c.digest for c in old], [c.digest for c in new], autojunk=False)
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old_part, new_part = old[i1:i2], new[j1:j2]
+        paired = min(len(old_part), len(new_part)) if tag == "replace" else 0
+        changes.extend(Change("revised", o, n) for o, n in zip(old_part[:paired], new_part[:paired]))
+        changes.extend(Change("removed", o, None) for o in old_part[paired:])
+        changes.extend(Change("added", None, n) for n in new_part[paired:])
+    return changes
+
+
+# --- ANALYSIS ---
+class ClauseAnalysis:
+    def __init__(self, clauses, risk_terms, previous=None, changes=(), scanned=0):
+        self.clauses = clauses
+        self.risk_terms = risk_terms      # list of terms per clause
+        self.previous = previous          # the earlier upload this one revises, or None
+        self.changes = list(changes)
+        self.scanned = scanned            # clauses that went through the risk scan
+
+    @property
+    def is_revision(self):
+        return self.previous is not None
+
+    @property
+    def unchanged(self):
+        return not self.changes
+
+    def counts(self):
+        counts = {"revised": 0, "added": 0, "removed": 0}
+        for change in self.changes:
+            counts[change.kind] += 1
+        counts["unchanged"] = len(self.clauses) - counts["revised"] - counts["added"]
+        return counts
+
+    # The new text of revised and added clauses, for summarizers that just
+    # condense text.
+    def changed_text(self):
+        return "\n\n".join(change.new.text for change in self.changes if change.new is not None)
+
+    # Before/after pairs for an instruction-following model.
+    def change_text(self):
+        parts = []
+        for change in self.changes:
+            clause = change.new or change.old
+            if change.kind == "revised":
+                parts.append(f"Clause {clause.number} (revised)\nBefore: {change.old.text}\nAfter: {change.new.text}")
+            else:
+                parts.append(f"Clause {clause.number} ({change.kind})\n{clause.text}")
+        return "\n\n".join(parts)
+
+    def changed_risk_terms(self):
+        terms = []
+        for change in self.changes:
+            if change.new is not None:
+                for term in self.risk_terms[change.new.position]:
+                    if term not in terms:
+                        terms.append(term)
+        return terms
+
+    def change_list(self):
+        lines = []
+        for kind in ("revised", "added", "removed"):
+            numbers = [(c.new or c.old).number for c in self.changes if c.kind == kind]
+            if numbers:
+                more = f" and {len(numbers) - MAX_LISTED_CHANGES} more" if len(numbers) > MAX_LISTED_CHANGES else ""
+                lines.append(f"- {kind.capitalize()}: clause {', '.join(numbers[:MAX_LISTED_CHANGES])}{more}")
+        return "\n".join(lines)
+
+    # The summary shown and saved for a revision: what changed, then the
+    # earlier whole-document summary it builds on.
+    def compose_summary(self, change_summary):
+        previous = self.previous
+        counts = self.counts()
+        header = (f"🔁 Revision of {previous['filename']} ({previous['timestamp']}): "
+                  f"{counts['revised']} revised, {counts['added']} added, {counts['removed']} removed, "
+                  f"{counts['unchanged']} unchanged clause(s).")
+        parts = [header]
+        if self.changes:
+            parts.append(self.change_list())
+        if change_summary:
+            parts.append(f"📝 What changed:\n{change_summary}")
+        parts.append(f"📜 Summary of the earlier version:\n{self.document_summary()}")
+        return "\n\n".join(parts)
+
+    # The summary of the whole document this version is based on.
+    def document_summary(self):
+        if self.previous is None:
+            return None
+        return self.previous["document_summary"] or self.previous["summary"]
+
+
+def analyze_clauses(email, text, mode, scanner=None):
+    clauses = split_into_clauses(text)
+    if not clauses:
+        return ClauseAnalysis([], [])
+
+    previous = find_previous_upload(email, [c.digest for c in clauses], LOOKBACK_UPLOADS, mode)
+    old_rows = []
+    if previous is not None and previous["shared"] >= MIN_SHARED_FRACTION * len(clauses):
+        old_rows = get_upload_clauses(previous["id"])
+    else:
+        previous = None
+
+    known_terms = {digest: terms for _, _, digest, _, terms in old_rows}
+    risk_terms = []
+    scanned = 0
+    for clause in clauses:
+        if clause.digest in known_terms:
+            risk_terms.append(known_terms[clause.digest])
+        else:
+            risk_terms.append(find_risky_terms(clause.text, scanner))
+            scanned += 1
+
+    if previous is None:
+        return ClauseAnalysis(clauses, risk_terms, scanned=scanned)
+    old = [Clause(position, number, text, digest) for position, number, digest, text, _ in old_rows]
+    return ClauseAnalysis(clauses, risk_terms, previous, diff_clauses(old, clauses), scanned)
+
+
+# Save an upload together with its clause index; returns the upload id.
+# document_summary is the whole-document summary later revisions build on,
+# and mode the summary mode it was written in.
+def record_upload(email, filename, summary, analysis, mode, document_summary=None):
+    rows = [
+        (clause.position, clause.number, clause.digest, clause.text, terms)
+        for clause, terms in zip(analysis.clauses, analysis.risk_terms)
+    ]
+    if document_summary is None:
+        document_summary = analysis.document_summary() if analysis.is_revision else summary
+    return insert_upload_with_clauses(email, filename, summary, document_summary, rows, mode)
@@ -0,0 +1,199 @@
+import json
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+# --- RISK LEXICON ---
+# term -> weight. Firm-specific lexicons are loaded from JSON with load_lexicon()
+# and merged on top of these defaults.
+DEFAULT_LEXICON = {
+    "penalty": 2,
+    "termination": 2,
+    "breach": 2,
+    "fine": 1,
+    "automatic renewal": 3,
+    "binding arbitration": 3,
+    "liquidated damages": 3,
+    "non-compete": 3,
+    "non-disclosure": 2,
+    "late fee": 1,
+    "without notice": 3,
+    "waiver of rights": 3,
+    "exclusive jurisdiction": 2,
+    "governing law": 1,
+    "intellectual property": 2,
+}
+
+MAX_CLAUSE_CHARS = 400
+
+RiskHit = namedtuple("RiskHit", ["term", "weight", "page", "start", "end", "clause"])
+
+# Sentence ends and blank lines delimit the clause shown around a hit.
+_CLAUSE_BOUNDARY = re.compile(r"[.;!?](?=\s)|\n\s*\n")
+
+
+def _normalize_term(term):
+    return " ".join(term.lower().split())
+
+
+def load_lexicon(path, base=DEFAULT_LEXICON):
+    with open(path, encoding="utf-8") as f:
+        extra = json.load(f)
+    lexicon = dict(base)
+    for term, weight in extra.items():
+        lexicon[term] = float(weight)
+    return lexicon
+
+
+# --- MATCHER ---
+# All terms are compiled into a single regex shaped like a trie, e.g.
+# "non(?:\-(?:compete|disclosure))", so each text position is tried against
+# shared prefixes once instead of against every term: adding terms to the
+# lexicon barely changes scan time, and the whole document is one pass.
+def _trie_pattern(terms):
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    branches = []
+    for ch in sorted(k for k in node if k):
+        # A space in a term matches any run of whitespace, so phrases broken
+        # across PDF lines are still found.
+        atom = r"\s+" if ch == " " else re.escape(ch)
+        branches.append(atom + _node_pattern(node[ch]))
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+class RiskScanner:
+    def __init__(self, lexicon=DEFAULT_LEXICON):
+        self.lexicon = {}
+        for term, weight in lexicon.items():
+            term = _normalize_term(term)
+            if term:
+                self.lexicon[term] = weight
+        trie = _trie_pattern(self.lexicon) if self.lexicon else "(?!)"
+        self._pattern = re.compile(r"(?<!\w)(?:" + trie + r")(?!\w)")
+        self._pattern_ci = re.compile(self._pattern.pattern, re.IGNORECASE)
+        # Non-space characters a match (and its lookahead) can span; see scan_stream().
+        self._carry = max((len(term.replace(" ", "")) for term in self.lexicon), default=0) + 1
+
+    def scan(self, pages):
+        if isinstance(pages, str):
+            pages = [pages]
+        text = "".join(pages)
+        page_starts = []
+        offset = 0
+        for page in pages:
+            page_starts.append(offset)
+            offset += len(page)
+
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self._pattern.finditer(lowered)
+        else:
+            # A few characters change length when lowercased; match the original
+            # text case-insensitively so offsets stay exact.
+            matches = self._pattern_ci.finditer(text)
+
+        boundaries = None
+        hits = []
+        for match in matches:
+            if boundaries is None:
+                boundaries = [m.end() for m in _CLAUSE_BOUNDARY.finditer(text)]
+            start, end = match.span()
+            term = _normalize_term(match.group())
+            hits.append(RiskHit(
+                term=term,
+                weight=self.lexicon.get(term, 0),
+                page=bisect_right(page_starts, start),
+                start=start,
+                end=end,
+                clause=_clause_around(text, boundaries, start, end),
+            ))
+        return hits
+
+    # Scan pages one at a time as they arrive (e.g. from a PageStream), with
+    # the same hits as scan() on the whole document. The end of each page is
+    # scanned again together with the next one, so a phrase split across a
+    # page break is found; hits there are only yielded once the following text
+    # decides them. Clause context reaches back into that carried text only.
+    def scan_stream(self, pages):
+        page_starts = []
+        carried = ""
+        carried_start = 0        # document offset of `carried`
+        done = 0                 # hits starting before this offset were yielded
+        pending = []
+        for page in pages:
+            page_starts.append(carried_start + len(carried))
+            text = carried + page
+            cut = _carry_from(text, self._carry)
+            pending = []
+            for hit in self.scan([text]):
+                start = carried_start + hit.start
+                if start < done:
+                    continue
+                hit = hit._replace(page=bisect_right(page_starts, start), start=start, end=carried_start + hit.end)
+                if start < carried_start + cut:
+                    yield hit
+                else:
+                    pending.append(hit)
+            done = carried_start + cut
+            # One more character so the word-boundary check before a match still sees it.
+            keep = max(cut - 1, 0)
+            carried = text[keep:]
+            carried_start += keep
+        yield from pending
+
+
+# Start of the shortest end of `text` holding `chars` non-space characters;
+# a match starting before it ends (or fails) within `text`, whatever follows.
+def _carry_from(text, chars):
+    for i in range(len(text) - 1, -1, -1):
+        if not text[i].isspace():
+            chars -= 1
+            if not chars:
+                return i
+    return 0
+
+
+def _clause_around(text, boundaries, start, end):
+    i = bisect_right(boundaries, start)
+    clause_start = boundaries[i - 1] if i else 0
+    j = bisect_right(boundaries, end - 1)
+    clause_end = boundaries[j] if j < len(boundaries) else len(text)
+    # Keep very long clauses readable by trimming around the hit.
+    half = MAX_CLAUSE_CHARS // 2
+    clause_start = max(clause_start, start - half)
+    clause_end = min(clause_end, end + half)
+    return " ".join(text[clause_start:clause_end].split())
+
+
+# --- REPORTING ---
+def group_hits(hits):
+    grouped = {}
+    for hit in hits:
+        grouped.setdefault(hit.term, []).append(hit)
+    return grouped
+
+
+def risk_score(hits):
+    return sum(hit.weight for hit in hits)
+
+
+default_scanner = RiskScanner()
+
+
+def find_risky_terms(text, scanner=None):
+    scanner = scanner or default_scanner
+    return list(group_hits(scanner.scan(text)))
@@ -0,0 +1,238 @@
+import contextvars
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from metrics import span
+
+# One queue for every outbound model call in the process (OpenAI and Hugging
+# Face, from every Streamlit session and worker thread). A call waits for a
+# slot: at most MAX_CONCURRENT calls per backend run at once, each backend and
+# each API key has a token bucket of requests per minute, and among the
+# waiting calls the most urgent priority goes first, then the user with the
+# fewest calls in flight, then whoever was served longest ago. One user
+# clicking Simplify ten times queues behind everyone else's first request
+# instead of starving them, and bursts stay under the providers' rate limits.
+
+# --- CONFIG ---
+PRIORITY_INTERACTIVE = 0     # a user is watching (Simplify, AI risk analysis)
+PRIORITY_BACKGROUND = 10     # batch and queued jobs
+
+MAX_CONCURRENT = {"openai": 8, "huggingface": 4}
+# Requests per minute; 0 means unlimited.
+BACKEND_RPM = {
+    "openai": int(os.environ.get("LEGALLITE_OPENAI_RPM", 3000)),
+    "huggingface": int(os.environ.get("LEGALLITE_HF_RPM", 600)),
+}
+KEY_RPM = int(os.environ.get("LEGALLITE_KEY_RPM", 600))   # per API key or HF token
+BURST_SECONDS = 5            # a bucket holds this many seconds' worth of requests
+QUEUE_TIMEOUT = float(os.environ.get("LEGALLITE_QUEUE_TIMEOUT", 120))
+MAX_TRACKED_KEYS = 1024
+POLL_SECONDS = 0.5
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+# --- RATE LIMITS ---
+class TokenBucket:
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until a request may go; 0 if it may go now.
+    def wait_time(self, now):
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate:
+            self.tokens -= 1
+
+    # After a 429: nothing goes out for `seconds`.
+    def pause(self, seconds, now):
+        if self.rate:
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+# --- CALLERS ---
+# Who is asking, for fair sharing. Set around a user action; worker threads
+# inherit it when started with contextvars.copy_context().
+_caller = contextvars.ContextVar("legallite_llm_caller", default=("", PRIORITY_INTERACTIVE))
+
+
+@contextmanager
+def caller(user, priority=PRIORITY_INTERACTIVE):
+    token = _caller.set((user or "", priority))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+def _key_id(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] if key else ""
+
+
+class _Ticket:
+    def __init__(self, backend, key_id, user, priority, seq):
+        self.backend = backend
+        self.key_id = key_id
+        self.user = user
+        self.priority = priority
+        self.seq = seq
+        self.granted = False
+        self.retry_in = POLL_SECONDS
+        self.event = threading.Event()
+
+
+# --- SCHEDULER ---
+class LLMScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, backend_rpm=BACKEND_RPM, key_rpm=KEY_RPM,
+                 timeout=QUEUE_TIMEOUT, clock=time.monotonic):
+        self.max_concurrent = dict(max_concurrent)
+        self.key_rpm = key_rpm
+        self.timeout = timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._running = Counter()         # backend -> calls in flight
+        self._user_running = Counter()    # user -> calls in flight
+        self._last_served = {}            # user -> clock time of the last grant
+        self._backend_buckets = {backend: TokenBucket(rpm, clock=clock) for backend, rpm in backend_rpm.items()}
+        self._key_buckets = OrderedDict() # (backend, key id) -> TokenBucket
+        self._seq = itertools.count()
+        self.counts = Counter()           # granted, timed_out, throttled
+
+    # Hold a slot for one call to `backend` with `key` (API key or token).
+    @contextmanager
+    def slot(self, backend, key=""):
+        user, priority = _caller.get()
+        ticket = _Ticket(backend, _key_id(key), user, priority, next(self._seq))
+        with span(f"queue.{backend}", user=user, priority=priority):
+            self._wait(ticket)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    # The provider said 429: hold back everything for this key (or the whole
+    # backend without one) for `seconds`.
+    def pause(self, backend, key="", seconds=1.0):
+        now = self.clock()
+        with self._lock:
+            bucket = self._key_bucket(backend, _key_id(key)) if key else self._backend_buckets.get(backend)
+            if bucket is not None:
+                bucket.pause(seconds, now)
+            self.counts["throttled"] += 1
+
+    # (position, waiting) of the user's next queued call, 1-based; None if
+    # none of the user's calls are waiting.
+    def position(self, user):
+        with self._lock:
+            ordered = sorted(self._waiting, key=self._order)
+        for i, ticket in enumerate(ordered):
+            if ticket.user == user:
+                return i + 1, len(ordered)
+        return None
+
+    def gauges(self):
+        with self._lock:
+            waiting = Counter(ticket.backend for ticket in self._waiting)
+            gauges = {}
+            for backend in self.max_concurrent:
+                gauges[f"legallite_llm_queue_depth_{backend}"] = waiting[backend]
+                gauges[f"legallite_llm_in_flight_{backend}"] = self._running[backend]
+            for name in ("granted", "timed_out", "throttled"):
+                gauges[f"legallite_llm_{name}_total"] = self.counts[name]
+            return gauges
+
+    def _order(self, ticket):
+        return (ticket.priority, self._user_running[ticket.user], self._last_served.get(ticket.user, 0.0), ticket.seq)
+
+    def _key_bucket(self, backend, key_id):
+        bucket = self._key_buckets.get((backend, key_id))
+        if bucket is None:
+            bucket = self._key_buckets[(backend, key_id)] = TokenBucket(self.key_rpm, clock=self.clock)
+            while len(self._key_buckets) > MAX_TRACKED_KEYS:
+                self._key_buckets.popitem(last=False)
+        self._key_buckets.move_to_end((backend, key_id))
+        return bucket
+
+    def _wait(self, ticket):
+        deadline = self.clock() + self.timeout
+        with self._lock:
+            self._waiting.append(ticket)
+            self._dispatch()
+        while not ticket.event.wait(min(ticket.retry_in, POLL_SECONDS)):
+            # Rate-limited calls are re-checked when their bucket refills.
+            with self._lock:
+                if ticket.granted:
+                    break
+                if self.clock() >= deadline:
+                    self._waiting.remove(ticket)
+                    self.counts["timed_out"] += 1
+                    raise QueueTimeout(f"⌛ Too many requests to {ticket.backend} right now; please try again shortly.")
+                self._dispatch()
+
+    def _release(self, ticket):
+        with self._lock:
+            self._running[ticket.backend] -= 1
+            self._user_running[ticket.user] -= 1
+            if not self._user_running[ticket.user]:
+                del self._user_running[ticket.user]
+            self._dispatch()
+
+    # Start waiting calls while any may go, best first; the order is
+    # recomputed after each start since it depends on calls in flight.
+    # Called with the lock held.
+    def _dispatch(self):
+        now = self.clock()
+        while True:
+            ticket = next((t for t in sorted(self._waiting, key=self._order) if self._may_start(t, now)), None)
+            if ticket is None:
+                return
+            for bucket in self._buckets(ticket):
+                bucket.take()
+            self._waiting.remove(ticket)
+            self._running[ticket.backend] += 1
+            self._user_running[ticket.user] += 1
+            self._last_served[ticket.user] = now
+            self.counts["granted"] += 1
+            ticket.granted = True
+            ticket.event.set()
+
+    def _may_start(self, ticket, now):
+        if self._running[ticket.backend] >= self.max_concurrent.get(ticket.backend, 1):
+            return False
+        wait = max((bucket.wait_time(now) for bucket in self._buckets(ticket)), default=0.0)
+        if wait > 0:
+            ticket.retry_in = wait
+            return False
+        return True
+
+    def _buckets(self, ticket):
+        buckets = []
+        if ticket.backend in self._backend_buckets:
+            buckets.append(self._backend_buckets[ticket.backend])
+        if ticket.key_id:
+            buckets.append(self._key_bucket(ticket.backend, ticket.key_id))
+        return buckets
+
+
+# Shared by every Streamlit session in this process.
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,91 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIG ---
+MAX_WORKERS = 4       # concurrent chunk requests per document
+MAX_REDUCE_DEPTH = 3  # how many times partial summaries may be re-reduced
+
+# Blank lines, or a line break followed by something that looks like the start
+# of a clause: "12.", "4.2)", "(a)", "Section 3", "ARTICLE IV", an all-caps heading.
+_CLAUSE_BREAK = re.compile(
+    r"\n\s*\n"
+    r"|\n(?=[ \t]*(?:\d+(?:\.\d+)*[.)]\s|\([a-z0-9]{1,4}\)\s|(?:section|article|clause|schedule)\b|[A-Z][A-Z \t]{3,}\n))",
+    re.IGNORECASE,
+)
+_SENTENCE_BREAK = re.compile(r"(?<=[.;:!?])\s+")
+
+
+# --- CHUNKING ---
+# The document's clauses (and headings) in order, stripped.
+def split_clauses(text):
+    return [block.strip() for block in _CLAUSE_BREAK.split(text) if block.strip()]
+
+
+def _segments(text, max_chars):
+    for block in split_clauses(text):
+        if len(block) <= max_chars:
+            yield block
+            continue
+        # An oversized clause falls back to sentences, then to a hard cut.
+        for sentence in _SENTENCE_BREAK.split(block):
+            while len(sentence) > max_chars:
+                yield sentence[:max_chars]
+                sentence = sentence[max_chars:]
+            if sentence.strip():
+                yield sentence
+
+
+def split_into_chunks(text, max_chars):
+    chunks = []
+    current = ""
+    for segment in _segments(text, max_chars):
+        if current and len(current) + 2 + len(segment) > max_chars:
+            chunks.append(current)
+            current = segment
+        else:
+            current = f"{current}\n\n{segment}" if current else segment
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- MAP-REDUCE ---
+# map_fn summarizes one chunk of the original text; reduce_fn merges a block of
+# partial summaries into one. Both take a string and return a string.
+def map_reduce_summarize(text, map_fn, reduce_fn, max_chars, max_workers=MAX_WORKERS):
+    kind, final_input = prepare_final_call(text, map_fn, reduce_fn, max_chars, max_workers)
+    if kind is None:
+        return ""
+    return (map_fn if kind == "map" else reduce_fn)(final_input)
+
+
+# Run everything except the last model call and return ("map", chunk) or
+# ("reduce", partial_summaries) for it, so callers can stream that final answer.
+def prepare_final_call(text, map_fn, reduce_fn, max_chars, max_workers=MAX_WORKERS):
+    chunks = split_into_chunks(text, max_chars)
+    if not chunks:
+        return None, ""
+    if len(chunks) == 1:
+        return "map", chunks[0]
+
+    combined = "\n\n".join(_run_all(map_fn, chunks, max_workers))
+    for _ in range(MAX_REDUCE_DEPTH):
+        if len(combined) <= max_chars:
+            break
+        groups = split_into_chunks(combined, max_chars)
+        combined = "\n\n".join(_run_all(reduce_fn, groups, max_workers))
+    return "reduce", combined[:max_chars]
+
+
+def _run_all(fn, items, max_workers):
+    if len(items) == 1:
+        return [fn(items[0])]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return [f.result() for f in [_submit(pool, fn, item) for item in items]]
+
+
+# Chunk calls run with the caller's context, so the model scheduler and the
+# metrics request still know who they are for.
+def _submit(pool, fn, arg):
+    return pool.submit(contextvars.copy_context().run, fn, arg)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from db import evict_cached_results, get_cached_result, put_cached_result
+
+# --- CONFIG ---
+TTL_SECONDS = 30 * 24 * 3600
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+EVICT_EVERY_PUTS = 50
+
+log = logging.getLogger(__name__)
+
+
+# The streaming caller stopped reading before the answer was complete.
+class _Abandoned(Exception):
+    pass
+
+
+# The key covers everything that changes the model's answer: the exact input
+# text, which backend and model produced it, the prompt around it and the
+# generation parameters. API keys are deliberately left out so every user
+# shares the same entries.
+def cache_key(text, backend, model, prompt="", params=None):
+    material = json.dumps(
+        {
+            "text": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "backend": backend,
+            "model": model,
+            "prompt": prompt,
+            "params": params or {},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# --- DURABLE RESULT CACHE ---
+class SummaryCache:
+    def __init__(self, ttl=TTL_SECONDS, max_bytes=MAX_CACHE_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight = {}   # cache_key -> Future shared by identical callers
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # (result, future, owner): the cached result on a hit; otherwise the
+    # Future of an identical call in flight, or a new one registered in
+    # _inflight with owner=True, and the caller computes the result.
+    def _claim(self, key):
+        result = get_cached_result(key, time.time() - self.ttl)
+        with self._lock:
+            if result is not None:
+                self.hits += 1
+                return result, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            future = self._inflight[key] = Future()
+            self.misses += 1
+            return None, future, True
+
+    def get_or_compute(self, key, compute):
+        while True:
+            result, future, owner = self._claim(key)
+            if owner:
+                break
+            if future is None:
+                return result
+            try:
+                return future.result()
+            except _Abandoned:
+                continue   # a streaming owner stopped early
+
+        try:
+            result = compute()
+        except BaseException as e:
+            # Failures are not cached; waiting callers see the same error.
+            future.set_exception(e)
+            raise
+        else:
+            # Waiters get the result first: a failed write (locked or full
+            # database) only means the next caller computes it again.
+            future.set_result(result)
+            try:
+                self.store(key, result)
+            except Exception:
+                log.exception("Failed to cache a model result")
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # get_or_compute for a streamed answer: stream() returns an iterator of
+    # text pieces, yielded to the first caller as they arrive. Identical
+    # callers meanwhile wait for the complete answer and get it in one piece,
+    # like everyone once it is cached. If the first caller stops reading
+    # early, a waiting caller starts the stream over.
+    def stream_or_compute(self, key, stream):
+        while True:
+            result, future, owner = self._claim(key)
+            if owner:
+                break
+            if future is not None:
+                try:
+                    result = future.result()
+                except _Abandoned:
+                    continue
+            yield result
+            return
+
+        parts = []
+        pieces = None
+        try:
+            pieces = stream()
+            for piece in pieces:
+                parts.append(piece)
+                yield piece
+        except GeneratorExit:
+            future.set_exception(_Abandoned())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            result = "".join(parts)
+            future.set_result(result)
+            try:
+                self.store(key, result)
+            except Exception:
+                log.exception("Failed to cache a model result")
+        finally:
+            if pieces is not None and hasattr(pieces, "close"):
+                pieces.close()   # e.g. releases the model slot
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def store(self, key, result):
+        put_cached_result(key, result)
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % EVICT_EVERY_PUTS == 0
+        if evict:
+            evict_cached_results(self.max_bytes, time.time() - self.ttl)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+summary_cache = SummaryCache()
+
+
+def cached_completion(text, backend, model, prompt, params, compute):
+    return summary_cache.get_or_compute(cache_key(text, backend, model, prompt, params), compute)
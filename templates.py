@@ -0,0 +1,242 @@
+import hashlib
+import json
+import re
+import threading
+import zlib
+from collections import namedtuple
+from functools import lru_cache
+
+from db import insert_template, template_candidates
+
+# Near-duplicate detection for contracts built from the same template (the
+# bundled rental, NDA and employment samples with other names and amounts
+# filled in). Each document gets a MinHash signature over word shingles with
+# numbers masked; LSH band buckets stored in SQLite find candidates in a few
+# index lookups, and the best match's summary is reused with the new
+# document's names, amounts and dates patched in.
+
+# --- CONFIG ---
+SHINGLE_WORDS = 5
+NUM_PERM = 120
+BANDS = 20                   # 20 bands x 6 rows: ~0.998 recall at Jaccard 0.8
+ROWS = NUM_PERM // BANDS
+MATCH_SIMILARITY = 0.8       # estimated Jaccard needed to reuse a summary
+DEDUP_SIMILARITY = 0.95      # closer than this to an indexed document: not added again
+MAX_CANDIDATES = 64
+MAX_SHINGLES = 200_000       # longer documents are fingerprinted on their first shingles
+SHARE_ACROSS_USERS = False   # reuse other users' summaries, not just bundled templates
+SEED = 20250706
+
+_WORD = re.compile(r"[a-z]+|\d[\d,./]*")
+
+TemplateMatch = namedtuple("TemplateMatch", "summary similarity filename")
+
+BUNDLED_TEMPLATES = {
+    "rental": "Sample_Rental_Agreement.pdf",
+    "nda": "Sample_NDA_Agreement.pdf",
+    "employment": "Sample_Employment_Contract.pdf",
+}
+
+
+# --- FINGERPRINTS ---
+# NumPy and the hash permutations are set up on first use, not at import.
+@lru_cache(maxsize=None)
+def _permutations():
+    import numpy as np
+    rng = np.random.default_rng(SEED)
+    return rng.integers(1, 2 ** 32, NUM_PERM, dtype=np.uint64), rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+
+
+_PRIME = 4294967311              # smallest prime above 2**32
+_SHINGLE_BASE = 1099511628211
+
+
+def _token_hashes(text):
+    import numpy as np
+    cache = {}
+    hashes = []
+    for word in _WORD.findall(text.lower()):
+        if word[0].isdigit():
+            word = "0"   # amounts, dates and clause numbers are masked
+        h = cache.get(word)
+        if h is None:
+            h = cache[word] = zlib.crc32(word.encode("utf-8"))
+        hashes.append(h)
+    return np.asarray(hashes, dtype=np.uint64)
+
+
+def shingle_hashes(text):
+    import numpy as np
+    tokens = _token_hashes(text)
+    if len(tokens) < SHINGLE_WORDS:
+        return np.unique(tokens)
+    count = min(len(tokens) - SHINGLE_WORDS + 1, MAX_SHINGLES)
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        combined = combined * np.uint64(_SHINGLE_BASE) + tokens[offset:offset + count]   # wraps mod 2**64
+    return np.unique((combined >> np.uint64(32)) ^ (combined & np.uint64(0xFFFFFFFF)))
+
+
+def minhash(text):
+    import numpy as np
+    a, b = _permutations()
+    shingles = shingle_hashes(text)
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), 4096):
+        block = shingles[start:start + 4096]
+        hashed = (a[:, None] * block[None, :] + b[:, None]) % np.uint64(_PRIME)
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_buckets(signature):
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "big", signed=True)))
+    return buckets
+
+
+def similarity(a, b):
+    import numpy as np
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+# --- FIELDS ---
+# The parts of a contract that change between copies of one template, in the
+# order they first appear.
+_MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+FIELD_PATTERNS = [
+    ("money", re.compile(r"(?:rs\.?|inr|₹|\$|usd|eur|€|£)\s?\d(?:[\d,]*\d)?(?:\.\d+)?", re.IGNORECASE)),
+    ("date", re.compile(
+        rf"\b\d{{1,2}}(?:st|nd|rd|th)?(?:\s+day\s+of)?\s+{_MONTHS},?\s+\d{{4}}"
+        rf"|\b{_MONTHS}\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+        r"|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b",
+        re.IGNORECASE,
+    )),
+    ("person", re.compile(r"\b(?:Mr|Mrs|Ms|Dr)\.?\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2}")),
+    ("company", re.compile(r"\b[A-Z][\w&]*(?:\s+[A-Z][\w&]*){0,3}\s+(?:Pvt\.?\s+Ltd\.?|Ltd\.?|Inc\.?|LLC|LLP|Corp\.?)")),
+    ("duration", re.compile(r"\b\d+\s+(?:day|week|month|year)s?\b", re.IGNORECASE)),
+]
+_NUMBER = re.compile(r"\d(?:[\d,]*\d)?(?:\.\d+)?")
+_TITLE = re.compile(r"^(?:Mr|Mrs|Ms|Dr)\.?\s+")
+_COMPANY_SUFFIX = re.compile(r"\s+(?:Pvt\.?\s+Ltd\.?|Ltd\.?|Inc\.?|LLC|LLP|Corp\.?)$")
+_DISTINCTIVE = re.compile(r"\b(?:[A-Z][A-Za-z]{2,}|\d[\d,.]*\d)\b")
+
+
+def extract_fields(text):
+    fields = []
+    seen = set()
+    for kind, pattern in FIELD_PATTERNS:
+        for match in pattern.finditer(text):
+            value = " ".join(match.group().split())
+            if (kind, value) not in seen:
+                seen.add((kind, value))
+                fields.append((match.start(), kind, value))
+    return [[kind, value] for _, kind, value in sorted(fields)]
+
+
+# How a field may be written in a summary: "Rs.18,000" also as "18,000",
+# "Mr. Rakesh Kumar" also as "Rakesh Kumar" and "Rakesh".
+def _variants(kind, value):
+    variants = [value]
+    if kind == "money":
+        variants += _NUMBER.findall(value)
+    elif kind == "person":
+        name = _TITLE.sub("", value)
+        variants += [name, name.split()[0]]
+    elif kind == "company":
+        variants.append(_COMPANY_SUFFIX.sub("", value))
+    return variants
+
+
+# Names and numbers of a document, to check a patched summary against.
+def distinctive_tokens(text):
+    return set(_DISTINCTIVE.findall(text))
+
+
+# Replace the old document's fields in `summary` with the new document's,
+# pairing fields of the same kind in order. Returns None if anything specific
+# to the old document (a field, a name, a number) would survive the patch, so
+# another document's details never leak through.
+def patch_fields(summary, old_fields, new_fields, new_text, old_tokens=()):
+    replacements = {}
+    for kind in {kind for kind, _ in old_fields}:
+        old_values = [v for k, v in old_fields if k == kind]
+        new_values = [v for k, v in new_fields if k == kind]
+        for old, new in zip(old_values, new_values):
+            for old_variant, new_variant in zip(_variants(kind, old), _variants(kind, new)):
+                if old_variant != new_variant:
+                    replacements.setdefault(old_variant, new_variant)
+    if replacements:
+        pattern = re.compile("|".join(re.escape(v) for v in sorted(replacements, key=len, reverse=True)))
+        summary = pattern.sub(lambda m: replacements[m.group()], summary)
+
+    for kind, value in old_fields:
+        for variant in _variants(kind, value):
+            if len(variant) >= 4 and variant in summary and variant not in new_text:
+                return None
+    new_tokens = distinctive_tokens(new_text)
+    if any(token in old_tokens and token not in new_tokens for token in distinctive_tokens(summary)):
+        return None
+    return summary
+
+
+# --- INDEX ---
+class TemplateIndex:
+    def lookup(self, text, mode, owner=""):
+        signature = minhash(text)
+        best = None
+        for _, _, filename, doc_signature, details, summary in self._candidates(signature, mode, owner):
+            score = similarity(signature, doc_signature)
+            if score >= MATCH_SIMILARITY and (best is None or score > best[0]):
+                best = (score, filename, details, summary)
+        if best is None:
+            return None
+        score, filename, details, summary = best
+        patched = patch_fields(summary, details["fields"], extract_fields(text), text, set(details["tokens"]))
+        if patched is None:
+            return None
+        return TemplateMatch(patched, score, filename)
+
+    # Remember a summary for future near-duplicates; skipped when an almost
+    # identical document is already indexed.
+    def add(self, text, mode, summary, owner="", filename=""):
+        signature = minhash(text)
+        for *_, doc_signature, _, _ in self._candidates(signature, mode, owner):
+            if similarity(signature, doc_signature) >= DEDUP_SIMILARITY:
+                return False
+        details = {"fields": extract_fields(text), "tokens": sorted(distinctive_tokens(text))}
+        insert_template(owner, mode, filename, signature.tobytes(), json.dumps(details), summary, band_buckets(signature))
+        return True
+
+    def _candidates(self, signature, mode, owner):
+        import numpy as np
+        owners = None if SHARE_ACROSS_USERS else ["", owner]
+        for doc_id, doc_owner, filename, blob, details, summary in template_candidates(
+                band_buckets(signature), mode, owners, MAX_CANDIDATES):
+            yield doc_id, doc_owner, filename, np.frombuffer(blob, dtype=np.uint32), json.loads(details), summary
+
+
+template_index = TemplateIndex()
+
+
+_seeded = set()
+_seed_lock = threading.Lock()
+
+
+# Index the bundled sample PDFs with their Demo Mode summaries, so Demo Mode
+# recognizes those templates by content rather than by file name. Runs once
+# per process and mode; already indexed samples are skipped by add(). Other
+# callers wait for the seeding, and a failed one is tried again next time.
+def seed_bundled_templates(mode, summaries, read_text):
+    with _seed_lock:
+        if mode in _seeded:
+            return
+        for keyword, path in BUNDLED_TEMPLATES.items():
+            try:
+                text = read_text(path)
+            except OSError:
+                continue
+            template_index.add(text, mode, summaries[keyword], owner="", filename=path)
+        _seeded.add(mode)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the top level of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+# A throwaway database per test so nothing touches the checkout's users.db.
+@pytest.fixture
+def database(tmp_path):
+    db.use_database(str(tmp_path / "users.db"))
+    db.init_db()
+    yield
+    db.use_database(db.DB_NAME)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import artifacts
+
+
+@pytest.fixture(autouse=True)
+def fresh_jobs(monkeypatch):
+    monkeypatch.setattr(artifacts, "_jobs", OrderedDict())
+    monkeypatch.setattr(artifacts, "_sizes", {})
+    monkeypatch.setattr(artifacts, "_cached_bytes", 0)
+
+
+# Done callbacks run in order, after result() can already return.
+def settled(future):
+    done = threading.Event()
+    future.add_done_callback(lambda f: done.set())
+    assert done.wait(5)
+    return future
+
+
+def test_same_key_joins_the_running_job():
+    release = threading.Event()
+    calls = []
+
+    def render(n):
+        calls.append(n)
+        release.wait(5)
+        return b"x" * n
+
+    first = artifacts._submit(("pdf", "a", ""), render, 3)
+    second = artifacts._submit(("pdf", "a", ""), render, 3)
+    release.set()
+    assert first is second
+    assert first.result(5) == b"xxx"
+    assert calls == [3]
+
+
+def test_failed_job_is_retried():
+    def fail():
+        raise TimeoutError("gTTS timed out")
+
+    future = settled(artifacts._submit(("voice", "a", ""), fail))
+    with pytest.raises(TimeoutError):
+        future.result()
+    retry = artifacts._submit(("voice", "a", ""), lambda: b"ok")
+    assert retry is not future
+    assert retry.result(5) == b"ok"
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(artifacts, "MAX_CACHED_BYTES", 10)
+    for name in "abc":
+        settled(artifacts._submit(("pdf", name, ""), lambda: b"x" * 4))
+    assert list(artifacts._jobs) == [("pdf", "b", ""), ("pdf", "c", "")]
+    assert artifacts._cached_bytes == 8
+
+    settled(artifacts._submit(("pdf", "big", ""), lambda: b"x" * 11))
+    assert not artifacts._jobs and artifacts._cached_bytes == 0
+
+
+def test_voice_uses_a_timeout(monkeypatch):
+    gtts = pytest.importorskip("gtts")
+    seen = {}
+
+    class FakeTTS:
+        def __init__(self, text, lang, timeout):
+            seen.update(text=text, timeout=timeout)
+
+        def write_to_fp(self, fp):
+            fp.write(b"mp3")
+
+    monkeypatch.setattr(gtts, "gTTS", FakeTTS)
+    assert artifacts.render_voice("Summary") == b"mp3"
+    assert seen == {"text": "Summary", "timeout": artifacts.VOICE_TIMEOUT}
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+import batch
+import extraction
+
+
+def write_pdf(path, pages):
+    fitz = pytest.importorskip("fitz")
+    with fitz.open() as doc:
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        doc.save(str(path))
+
+
+@pytest.fixture
+def contracts(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, "extraction_cache", extraction.ExtractionCache(str(tmp_path / "extracted")))
+    in_dir = tmp_path / "in"
+    (in_dir / "leases").mkdir(parents=True)
+    write_pdf(in_dir / "nda.pdf", ["The recipient keeps the information secret.", "A breach ends the agreement."])
+    write_pdf(in_dir / "leases" / "flat.pdf", ["The tenant pays rent monthly. A late fee applies."])
+    (in_dir / "notes.txt").write_text("not a contract")
+    return in_dir
+
+
+def run(in_dir, out_dir, *extra):
+    return batch.run(batch.parse_args([str(in_dir), str(out_dir), "--mode", "offline", "--workers", "1",
+                                       "--io-workers", "2", "--no-pdf", *extra]))
+
+
+def test_batch_writes_summaries_and_risk_reports(database, contracts, tmp_path):
+    out = tmp_path / "out"
+    assert run(contracts, out) == 0
+    assert (out / "nda.summary.txt").read_text(encoding="utf-8")
+    risks = json.loads((out / "leases" / "flat.risks.json").read_text(encoding="utf-8"))
+    assert [hit["term"] for hit in risks["hits"]] == ["late fee"]
+    report = json.loads((out / batch.REPORT_FILE).read_text())
+    assert (report["ok"], report["failed"], report["pages"]) == (2, 0, 3)
+
+
+def test_batch_resumes_from_its_checkpoint(database, contracts, tmp_path, capsys):
+    out = tmp_path / "out"
+    run(contracts, out)
+    write_pdf(contracts / "new.pdf", ["A penalty applies."])
+    assert run(contracts, out) == 0
+    assert "2 already done, 1 to process" in capsys.readouterr().out
+    assert json.loads((out / batch.REPORT_FILE).read_text())["ok"] == 1
+
+
+def test_a_broken_pdf_is_recorded_and_retried(database, contracts, tmp_path):
+    out = tmp_path / "out"
+    (contracts / "broken.pdf").write_bytes(b"not a pdf")
+    assert run(contracts, out) == 1
+    entries = [json.loads(line) for line in (out / batch.CHECKPOINT_FILE).read_text().splitlines()]
+    assert [(e["path"], e["stage"]) for e in entries if e["status"] == "failed"] == [("broken.pdf", "cpu")]
+    assert batch.load_checkpoint(str(out / batch.CHECKPOINT_FILE)) == {"nda.pdf", os.path.join("leases", "flat.pdf")}
+
+
+def test_checkpoint_skips_a_line_cut_short(tmp_path):
+    path = tmp_path / batch.CHECKPOINT_FILE
+    path.write_text('{"path": "a.pdf", "status": "ok"}\n{"path": "b.pdf", "sta')
+    assert batch.load_checkpoint(str(path)) == {"a.pdf"}
+
+
+def test_save_to_a_users_history(database, contracts, tmp_path):
+    import db
+    run(contracts, tmp_path / "out", "--email", "a@example.com")
+    assert sorted(row[0] for row in db.get_user_history("a@example.com")) == ["flat.pdf", "nda.pdf"]
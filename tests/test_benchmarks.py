@@ -0,0 +1,109 @@
+import json
+import threading
+
+import pytest
+
+from benchmarks import run
+from benchmarks.corpus import contract_lines, contract_path
+from benchmarks.mock_servers import start_huggingface, start_openai
+
+
+# --- STATS ---
+def test_percentiles_interpolate():
+    samples = [4.0, 1.0, 3.0, 2.0]
+    assert run.percentile(samples, 0.5) == 2.5
+    assert run.percentile(samples, 0.99) == pytest.approx(3.97)
+    assert run.percentile([7.0], 0.95) == 7.0
+
+
+def test_throughput_is_work_per_mean_second():
+    result = run.summarize_samples([0.5, 1.5], work=10, unit="pages")
+    assert (result["mean"], result["throughput"], result["unit"], result["samples"]) == (1.0, 10.0, "pages/s", 2)
+
+
+def test_regressions_are_flagged_over_the_threshold(capsys):
+    results = {"fast": run.summarize_samples([1.0]), "slow": run.summarize_samples([1.3])}
+    baseline = {"fast": run.summarize_samples([1.1]), "slow": run.summarize_samples([1.0])}
+    assert run.print_results(results, baseline, threshold=0.25) == ["slow"]
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+# --- CORPUS ---
+def test_contracts_are_reproducible(tmp_path):
+    assert contract_lines(2, seed=3) == contract_lines(2, seed=3)
+    assert len(contract_lines(2)) == 2 * 44
+    path = contract_path(2, corpus_dir=str(tmp_path))
+    fitz = pytest.importorskip("fitz")
+    with fitz.open(path) as doc:
+        assert doc.page_count == 2
+
+
+def test_risk_stage_and_compare(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("fitz")
+    monkeypatch.chdir(tmp_path)
+    output = tmp_path / "results.json"
+    assert run.main(["--stages", "risk", "--pages", "1", "--repeat", "2", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert set(results) == {"risk/find_risky_terms/1p", "risk/scan_with_offsets/1p"}
+
+    baseline = tmp_path / "baseline.json"
+    for result in results.values():
+        result["p50"] /= 100
+    baseline.write_text(json.dumps({"results": results}))
+    assert run.main(["--stages", "risk", "--pages", "1", "--repeat", "2", "--compare", str(baseline)]) == 1
+    assert "2 regression(s)" in capsys.readouterr().out
+
+
+# --- MOCK SERVERS ---
+@pytest.fixture
+def openai_mock():
+    openai = pytest.importorskip("openai")
+
+    def start(**options):
+        server, url = start_openai(**options)
+        servers.append(server)
+        return openai.OpenAI(api_key="bench", base_url=url, max_retries=0)
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_openai_mock_answers_plain_and_streamed(openai_mock):
+    client = openai_mock(words=3)
+    messages = [{"role": "user", "content": "one two three four"}]
+    answer = client.chat.completions.create(model="bench", messages=messages)
+    assert answer.choices[0].message.content == "one two three"
+    stream = client.chat.completions.create(model="bench", messages=messages, stream=True)
+    assert "".join(chunk.choices[0].delta.content or "" for chunk in stream) == "one two three "
+
+
+def test_openai_mock_rate_limits_above_max_concurrent(openai_mock):
+    import openai
+    client = openai_mock(latency=0.3, max_concurrent=1)
+    messages = [{"role": "user", "content": "clause"}]
+    errors = []
+
+    def call():
+        try:
+            client.chat.completions.create(model="bench", messages=messages)
+        except openai.RateLimitError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 2
+
+
+def test_huggingface_mock_summarizes():
+    from hf_client import InferenceClient
+    server, url = start_huggingface()
+    try:
+        summary = InferenceClient(url).summarize("facebook/bart-large-cnn", "The tenant pays rent.", "token", {})
+    finally:
+        server.shutdown()
+    assert isinstance(summary, str) and summary
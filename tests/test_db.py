@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_migrations_run_once_when_processes_race(tmp_path):
+    path = str(tmp_path / "users.db")
+    errors = []
+    start = threading.Barrier(4)
+
+    def run():
+        conn = sqlite3.connect(path, timeout=10)
+        start.wait()
+        try:
+            db.migrate(conn)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+    assert columns(conn, "uploads").count("mode") == 1
+
+
+def test_failed_step_is_rolled_back(tmp_path, monkeypatch):
+    conn = sqlite3.connect(str(tmp_path / "users.db"))
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS + [[
+        "ALTER TABLE uploads ADD COLUMN pages INTEGER",
+        "ALTER TABLE no_such_table ADD COLUMN x INTEGER",
+    ]])
+    with pytest.raises(sqlite3.OperationalError):
+        db.migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS) - 1
+    assert "pages" not in columns(conn, "uploads")
+
+
+# --- HISTORY PAGES & SEARCH ---
+def add_uploads(rows):
+    db.insert_uploads([(email, filename, summary, "2025-07-01 10:00:00") for email, filename, summary in rows])
+
+
+def test_history_pages_cover_every_upload_once(database):
+    add_uploads([("a@example.com", f"lease{n}.pdf", "summary") for n in range(7)])
+    add_uploads([("b@example.com", "other.pdf", "summary")])
+    seen = []
+    before = None
+    while True:
+        page = db.list_uploads("a@example.com", before, limit=3)
+        if not page:
+            break
+        seen += [filename for _, filename, _ in page]
+        before = (page[-1][2], page[-1][0])
+    assert seen == [f"lease{n}.pdf" for n in reversed(range(7))]
+
+
+def test_search_is_stemmed_highlighted_and_private(database):
+    add_uploads([
+        ("a@example.com", "lease.pdf", "Either side may terminate the lease with notice."),
+        ("a@example.com", "nda.pdf", "The recipient keeps secrets."),
+        ("b@example.com", "lease.pdf", "Termination needs a month's notice."),
+    ])
+    results = db.search_uploads("a@example.com", "termination")
+    assert [filename for _, filename, _, _, _ in results] == ["lease.pdf"]
+    start, end = db.HIGHLIGHT
+    assert f"{start}terminate{end}" in results[0][2]
+    assert db.search_uploads("a@example.com", 'notice" OR secrets *') == []
+    assert db.search_uploads("a@example.com", "  ") == []
+
+
+def test_filename_matches_rank_first(database):
+    add_uploads([
+        ("a@example.com", "notes.pdf", "The rental deposit is refunded."),
+        ("a@example.com", "rental.pdf", "The deposit is refunded."),
+    ])
+    start, end = db.HIGHLIGHT
+    results = db.search_uploads("a@example.com", "rental")
+    assert [filename for _, filename, _, _, _ in results] == [f"{start}rental{end}.pdf", "notes.pdf"]
+
+
+def test_search_pages_cover_every_match_once(database):
+    add_uploads([("a@example.com", f"lease{n}.pdf", "Rent is due " + "monthly " * n) for n in range(1, 8)])
+    seen = []
+    after = None
+    while True:
+        page = db.search_uploads("a@example.com", "monthly", after, limit=3)
+        if not page:
+            break
+        seen += [upload_id for upload_id, *_ in page]
+        after = (page[-1][4], page[-1][0])
+    assert sorted(seen) == [upload_id for upload_id, _, _ in reversed(db.list_uploads("a@example.com"))]
@@ -0,0 +1,112 @@
+import io
+import re
+import zipfile
+from datetime import date
+
+import pytest
+
+import db
+import export
+
+pytest.importorskip("reportlab")
+
+
+# --- LAYOUT ---
+def test_wrapped_lines_fit_the_width():
+    text = "The tenant pays ₹18,000 every month. " * 20 + "\nNew paragraph."
+    lines = export.wrap_text(text, width=200)
+    assert all(export._width(line, "F1", export.FONT_SIZE) <= 200 for line in lines)
+    assert " ".join(lines[:-1]).split() == export._pdf_text(text).split()[:-2]
+    assert lines[-1] == "New paragraph."
+    assert "Rs.18,000" in lines[0]
+
+
+def test_a_word_wider_than_the_line_is_split():
+    lines = export.wrap_text("short " + "x" * 300 + " end", width=100)
+    assert lines[0] == "short"
+    assert "".join(lines[1:-1]) + lines[-1].split()[0] == "x" * 300
+    assert all(export._width(line, "F1", export.FONT_SIZE) <= 100 for line in lines)
+
+
+def test_blank_lines_and_emoji():
+    assert export.wrap_text("One\n\nTwo 🎤") == ["One", "", "Two"]
+
+
+def test_toc_page_count_at_the_boundaries():
+    first = export._toc_rows_per_page() - export.TOC_HEADER_LINES
+    rows = export._toc_rows_per_page()
+    assert export.toc_page_count(0) == 1
+    assert export.toc_page_count(first) == 1
+    assert export.toc_page_count(first + 1) == 2
+    assert export.toc_page_count(first + rows) == 2
+    assert export.toc_page_count(first + rows + 1) == 3
+
+
+# --- PDF WRITER ---
+def test_pdf_stream_close_writes_a_valid_xref():
+    out = io.BytesIO()
+    pdf = export.PdfStream(out)
+    flow = export.PageFlow(pdf, "footer")
+    for title in ["First (1)", "Second \\ ünïcode"]:
+        flow.new_page()
+        flow.line(title)
+    flow.flush()
+    pdf.close(flow.page_ids, [("First", flow.page_ids[0]), ("Zweite ü", flow.page_ids[1])])
+    data = out.getvalue()
+
+    xref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    assert data[xref:].startswith(b"xref\n0 %d\n" % len(pdf.offsets))
+    for obj_id, offset in enumerate(pdf.offsets[1:], start=1):
+        assert data[offset:].startswith(b"%d 0 obj" % obj_id)
+
+    fitz = pytest.importorskip("fitz")
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        assert not doc.is_repaired
+        assert doc.page_count == 2
+        assert "Second \\" in doc[1].get_text()
+        assert [title for _, title, _ in doc.get_toc()] == ["First", "Zweite ü"]
+
+
+# --- EXPORTS ---
+def add_uploads(count, day="2025-07-01"):
+    db.insert_uploads([("a@example.com", f"lease{n}.pdf", f"Summary {n}.", f"{day} 10:{n // 60:02d}:{n % 60:02d}")
+                       for n in range(count)])
+
+
+def test_merged_pdf_has_contents_and_bookmarks(database):
+    fitz = pytest.importorskip("fitz")
+    count = export._toc_rows_per_page() - export.TOC_HEADER_LINES + 3   # two contents pages
+    add_uploads(count)
+    add_uploads(1, day="2025-08-01")
+    progress = []
+    out = io.BytesIO()
+    start, end = export.date_range(date(2025, 7, 1), date(2025, 7, 31))
+    assert export.export_merged_pdf("a@example.com", out, start, end, progress=lambda *p: progress.append(p)) == count
+    assert progress[-1] == (count, count)
+
+    with fitz.open(stream=out.getvalue(), filetype="pdf") as doc:
+        assert doc.page_count == 2 + count
+        assert len(doc.get_toc()) == count
+        links = [link for page in doc.pages(0, 2) for link in page.get_links()]
+        assert len(links) == count
+        # Some PyMuPDF versions report these destinations by name, "page=N" (1-based).
+        targets = {link["page"] if "page" in link else int(re.search(r"page=(\d+)", link["name"]).group(1)) - 1
+                   for link in links}
+        assert targets == set(range(2, 2 + count))
+        assert "uploads from 2025-07-01 to 2025-07-31" in doc[0].get_text()
+
+
+def test_empty_export(database):
+    out = io.BytesIO()
+    assert export.export_merged_pdf("nobody@example.com", out) == 0
+    assert b"%%EOF" in out.getvalue()
+
+
+def test_zip_has_one_pdf_per_upload(database):
+    add_uploads(3)
+    out = io.BytesIO()
+    assert export.export_zip("a@example.com", out) == 3
+    with zipfile.ZipFile(out) as archive:
+        names = archive.namelist()
+        assert all(re.fullmatch(r"2025-07-01_\d+_lease\d\.pdf", name) for name in names)
+        assert all(archive.read(name).startswith(b"%PDF-1.4") for name in names)
@@ -0,0 +1,104 @@
+import io
+import os
+
+import pytest
+
+import extraction
+from risk import default_scanner
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = extraction.ExtractionCache(str(tmp_path / "extracted"))
+    monkeypatch.setattr(extraction, "extraction_cache", cache)
+    return cache
+
+
+def make_pdf(pages):
+    fitz = pytest.importorskip("fitz")
+    with fitz.open() as doc:
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        return io.BytesIO(doc.tobytes())
+
+
+# --- TWO-TIER CACHE ---
+def test_memory_tier_then_disk_tier(tmp_path):
+    cache = extraction.ExtractionCache(str(tmp_path), memory_limit=10)
+    cache.put("a", ["12345"])
+    cache.put("b", ["67890"])
+    cache.put("c", ["abcde"])   # "a" falls out of memory but stays on disk
+    assert cache.get("c") == ["abcde"]
+    assert cache.get("a") == ["12345"]
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["memory_bytes"] <= 10
+
+
+def test_disk_survives_a_restart(tmp_path):
+    extraction.ExtractionCache(str(tmp_path)).put("a", ["Page 1", "Page 2"])
+    cache = extraction.ExtractionCache(str(tmp_path))
+    assert cache.get("a") == ["Page 1", "Page 2"]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = extraction.ExtractionCache(str(tmp_path), memory_limit=0, disk_limit=40)
+    for digest in "abcd":
+        cache.put(digest, ["x" * 10])   # 14 bytes of JSON each
+    assert cache.stats()["disk_bytes"] <= 40
+    assert cache.get("d") == ["x" * 10]
+    assert cache.get("a") is None
+
+
+def test_writing_an_entry_again_does_not_count_it_twice(tmp_path):
+    cache = extraction.ExtractionCache(str(tmp_path))
+    cache.put("a", ["x" * 10])
+    cache.put("b", ["y" * 10])
+    for _ in range(3):
+        cache.put("a", ["x" * 10])
+    assert cache.stats()["disk_bytes"] == cache._scan_disk_bytes() == 28
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+# --- PAGE STREAM ---
+def test_page_stream_caches_the_text_once_every_page_is_read(cache):
+    pdf = make_pdf([f"Page {n}." for n in range(1, 4)])
+    stream = extraction.PageStream(pdf)
+    assert (stream.page_count, stream.from_cache) == (3, False)
+    spooled = stream._path
+    pages = list(stream)
+    assert [page.strip() for page in pages] == ["Page 1.", "Page 2.", "Page 3."]
+    assert not os.path.exists(spooled)
+    assert cache.get(stream.digest) == pages
+
+    again = extraction.PageStream(pdf)
+    assert again.from_cache and list(again) == pages
+
+
+def test_page_stream_closed_early_caches_nothing(cache):
+    pdf = make_pdf(["Page 1.", "Page 2."])
+    stream = extraction.PageStream(pdf)
+    spooled = stream._path
+    pages = iter(stream)
+    next(pages)
+    pages.close()
+    assert not os.path.exists(spooled)
+    assert cache.get(stream.digest) is None
+
+
+def test_page_stream_reads_in_parallel_in_order(cache, monkeypatch):
+    monkeypatch.setattr(extraction, "PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(extraction, "PAGES_PER_TASK", 2)
+    pdf = make_pdf([f"Page {n}." for n in range(1, 8)])
+    assert [page.strip() for page in extraction.PageStream(pdf)] == [f"Page {n}." for n in range(1, 8)]
+
+
+def test_risk_scan_of_a_page_stream(cache, tmp_path):
+    pdf = make_pdf(["Disputes go to binding", "arbitration. A penalty applies."])
+    path = tmp_path / "lease.pdf"
+    path.write_bytes(pdf.getvalue())
+    hits = list(default_scanner.scan_stream(extraction.PageStream(path=str(path))))
+    assert [(hit.term, hit.page) for hit in hits] == [("binding arbitration", 1), ("penalty", 2)]
+    assert path.exists()
@@ -0,0 +1,19 @@
+from extractive import extractive_summary
+
+RENT = "The tenant shall pay the monthly rent of Rs. 18,000 on the first day of each month."
+
+
+def test_near_duplicate_sentences_are_summarized_once():
+    text = " ".join([
+        RENT,
+        RENT.replace("each", "every"),
+        "The landlord shall maintain the structural elements of the premises in good repair.",
+        "Either party may terminate this lease with two months written notice to the other.",
+    ])
+    summary = extractive_summary(text, max_sentences=3).splitlines()
+    assert len(summary) == 3
+    assert sum("monthly rent" in line for line in summary) == 1
+
+
+def test_empty_document():
+    assert "no readable sentences" in extractive_summary("")
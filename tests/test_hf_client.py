@@ -0,0 +1,159 @@
+import socket
+
+import pytest
+
+import hf_client
+from conftest import FakeClock
+from hf_client import (
+    CircuitBreaker, CircuitOpenError, InferenceClient, InferenceError, InferenceTimeout, InferenceUnavailable,
+)
+from hf_stub import StubConfig, start_stub_server
+
+MODEL = "sshleifer/distilbart-cnn-12-6"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(hf_client, "_backoff", lambda attempt: 0.0)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**config):
+        config = StubConfig(**config)
+        server = start_stub_server(config=config)
+        servers.append(server)
+        return config, f"http://127.0.0.1:{server.server_port}/models"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def summarize(client):
+    return client.summarize(MODEL, "one two three four five", "token", {})
+
+
+# --- RETRIES ---
+def test_success(stub):
+    config, url = stub(summary_words=3)
+    assert summarize(InferenceClient(url)) == "one two three"
+    assert config.requests == 1
+
+
+def test_cold_model_is_retried_after_estimated_time(stub):
+    config, url = stub(cold_starts=2, estimated_time=0.01)
+    client = InferenceClient(url)
+    assert summarize(client) == "one two three four five"
+    assert config.requests == 3
+    assert client.breaker.state == "closed"   # a loading model is not a failure
+
+
+def test_server_errors_are_retried_then_raised(stub):
+    config, url = stub(fail_every=1)
+    with pytest.raises(InferenceError, match="500"):
+        summarize(InferenceClient(url, max_retries=2))
+    assert config.requests == 3
+
+
+def test_recovers_from_a_transient_error(stub):
+    config, url = stub(fail_every=2)   # request 2 fails, 1 and 3 succeed
+    client = InferenceClient(url)
+    summarize(client)
+    assert summarize(client) == "one two three four five"
+    assert config.requests == 3
+
+
+def test_read_timeout(stub):
+    config, url = stub(hang_every=1, hang_seconds=1.0)
+    with pytest.raises(InferenceTimeout):
+        summarize(InferenceClient(url, read_timeout=0.2, max_retries=1))
+    assert config.requests == 2
+
+
+def test_total_timeout_stops_retrying(stub, monkeypatch):
+    config, url = stub(fail_every=1)
+    monkeypatch.setattr(hf_client, "_backoff", lambda attempt: 5.0)
+    with pytest.raises(InferenceError):
+        summarize(InferenceClient(url, total_timeout=1.0, max_retries=4))
+    assert config.requests == 1
+
+
+# --- CIRCUIT BREAKER ---
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=3, cooldown=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=1, cooldown=30, clock=clock)
+    breaker.record_failure()
+    clock.advance(29)
+    assert not breaker.allow()
+    clock.advance(1)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()      # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_failed_trial_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=1, cooldown=30, clock=clock)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.advance(29)
+    assert not breaker.allow()
+
+
+def test_open_breaker_fails_fast_without_calling_the_api(stub):
+    config, url = stub(fail_every=1)
+    client = InferenceClient(url, max_retries=0)
+    client.breaker = CircuitBreaker(failures=2, cooldown=30, clock=FakeClock())
+    for _ in range(2):
+        with pytest.raises(InferenceError):
+            summarize(client)
+    with pytest.raises(CircuitOpenError):
+        summarize(client)
+    assert config.requests == 2
+
+
+# --- OFFLINE FALLBACK ---
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/models"
+
+
+def test_unreachable_service_is_unavailable():
+    with pytest.raises(InferenceUnavailable):
+        summarize(InferenceClient(_closed_port_url(), max_retries=1))
+
+
+def test_unreachable_service_falls_back_to_offline_summary(database, monkeypatch):
+    import pipeline
+    monkeypatch.setattr(pipeline, "inference_client", InferenceClient(_closed_port_url(), max_retries=0))
+    text = "The tenant shall pay rent on the first day of each month. " * 20
+    with pytest.raises(InferenceUnavailable) as error:
+        pipeline.summarize_document(text, pipeline.HUGGING_FACE_MODE, hf_token="token")
+    assert pipeline.is_remote_timeout(error.value)
+    summary = pipeline.summarize_document(text, pipeline.HUGGING_FACE_MODE, hf_token="token", fallback=True)
+    assert "rent" in summary
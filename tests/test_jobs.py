@@ -0,0 +1,110 @@
+import io
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+import db
+import extraction
+import jobs
+import metrics
+
+
+def insert(email="a@example.com", params=None, pinned_to=None):
+    job_id, _ = db.insert_job(uuid.uuid4().hex, email, "simplify", 0, "lease.pdf", "digest", params or {"mode": "Demo"},
+                              pinned_to)
+    return job_id
+
+
+def test_duplicate_submits_join_the_active_job(database):
+    first = insert()
+    assert insert() == first
+    assert insert(email="b@example.com") != first
+    assert insert(params={"mode": "Offline"}) != first
+
+
+def test_finished_job_is_not_joined(database):
+    first = insert()
+    db.cancel_job(first, "a@example.com")
+    assert insert() != first
+
+
+def test_concurrent_submits_create_one_job(database):
+    ids = []
+    start = threading.Barrier(8)
+
+    def submit():
+        start.wait()
+        ids.append(insert())
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 1
+    assert db.job_counts() == {"queued": 1}
+
+
+def test_submit_with_a_key_replaces_a_job_pinned_elsewhere(database):
+    stranded = insert(pinned_to="gone:1")
+    assert insert(pinned_to="here:2") != stranded
+    assert db.get_job(stranded, "a@example.com")["status"] == "cancelled"
+    assert insert(pinned_to="here:2") == insert()
+
+
+def test_queued_jobs_pinned_to_a_dead_process_fail(database):
+    db.touch_process("alive:1")
+    alive = insert(pinned_to="alive:1")
+    gone = insert(email="b@example.com", pinned_to="gone:1")
+    unpinned = insert(email="c@example.com")
+    assert db.fail_orphaned_jobs(time.time() - 60, "lost") == [gone]
+    assert db.get_job(gone, "b@example.com")["error"] == "lost"
+    assert db.get_job(alive, "a@example.com")["status"] == "queued"
+    assert db.get_job(unpinned, "c@example.com")["status"] == "queued"
+
+
+# --- RUNNING ---
+@pytest.fixture
+def job_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(extraction, "extraction_cache", extraction.ExtractionCache(str(tmp_path / "extracted")))
+
+
+def make_pdf(pages):
+    fitz = pytest.importorskip("fitz")
+    with fitz.open() as doc:
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        return io.BytesIO(doc.tobytes())
+
+
+def test_pages_stream_progress_and_read_the_input_in_place(database, job_dirs):
+    pdf = make_pdf([f"Page {n} of the lease." for n in range(1, 4)])
+    job_id = jobs.submit_job("a@example.com", "simplify", pdf, "lease.pdf", {"mode": "Demo"})
+    job = db.claim_job("test")
+    assert job["digest"] == extraction.pdf_digest(pdf.getvalue())
+
+    stream = jobs.JobContext(job, None).pages()
+    pages = [next(stream) for _ in range(3)]
+    # The last page is out, but the text is not cached until the stream ends.
+    assert db.get_job(job_id, "a@example.com")["pages_done"] < 3
+    assert list(stream) == []
+    assert [page.strip() for page in pages] == [f"Page {n} of the lease." for n in range(1, 4)]
+    progress = db.get_job(job_id, "a@example.com")
+    assert (progress["pages_done"], progress["page_count"]) == (3, 3)
+    assert os.path.exists(jobs._input_path(job_id))
+    assert extraction.extraction_cache.get(job["digest"]) == pages
+
+
+def test_risk_scan_job(database, job_dirs):
+    pdf = make_pdf(["The tenant pays rent monthly.", "A penalty applies to late payment."])
+    job_id = jobs.submit_job("a@example.com", "risk_scan", pdf, "lease.pdf", {})
+    jobs.JobWorkers(1).run(db.claim_job("test"))
+    job = db.get_job(job_id, "a@example.com")
+    assert job["status"] == "done"
+    assert [(hit["term"], hit["page"]) for hit in job["result"]["hits"]] == [("penalty", 2)]
+    assert not os.path.exists(jobs._input_path(job_id))
+    assert 'legallite_request_seconds_count{stage="job_risk_scan",size="<1MB",pages="1-10"} 1' in metrics.render_prometheus()
@@ -0,0 +1,19 @@
+import metrics
+
+
+def test_totals_are_counters_and_levels_are_gauges():
+    collect = lambda: {"legallite_test_requests_total": 7, "legallite_test_queue_depth": 2}
+    metrics.register_collector(collect)
+    lines = metrics.render_prometheus().splitlines()
+    assert "# TYPE legallite_test_requests_total counter" in lines
+    assert "legallite_test_requests_total 7" in lines
+    assert "# TYPE legallite_test_queue_depth gauge" in lines
+    metrics._collectors.remove(collect)
+
+
+def test_stage_histogram():
+    with metrics.span("test.stage"):
+        pass
+    text = metrics.render_prometheus()
+    assert f"# TYPE {metrics.STAGE_METRIC} histogram" in text
+    assert f'{metrics.STAGE_METRIC}_count{{stage="test.stage"}} 1' in text
@@ -0,0 +1,18 @@
+import pipeline
+
+
+def test_openai_simplify_sends_the_whole_document(database, monkeypatch):
+    sent = []
+
+    def post(api_key, system_prompt, text):
+        sent.append((system_prompt, text))
+        return f"summary {len(sent)}"
+
+    monkeypatch.setattr(pipeline, "_post_openai", post)
+    clauses = [f"{n}. Clause number {n} obliges the tenant to item-{n}." for n in range(1, 800)]
+    summary = pipeline.summarize_document("\n\n".join(clauses), pipeline.OPENAI_MODE, api_key="key")
+
+    chunks = "".join(text for prompt, text in sent if prompt == pipeline.SIMPLIFY_PROMPT)
+    assert all(f"item-{n}." in chunks for n in range(1, 800))
+    assert sent[-1][0] == pipeline.COMBINE_PROMPT
+    assert summary == f"summary {len(sent)}"
@@ -0,0 +1,15 @@
+from revisions import analyze_clauses, record_upload
+
+CONTRACT = "\n".join(
+    f"{n}. The tenant shall keep clause {n} of this lease agreement in force for the whole term." for n in range(1, 11)
+)
+
+
+def test_revision_needs_the_same_mode(database):
+    first = analyze_clauses("a@example.com", CONTRACT, "Demo")
+    record_upload("a@example.com", "lease.pdf", "demo summary", first, "Demo")
+    revised = CONTRACT.replace("clause 3 of", "clause three of")
+
+    assert analyze_clauses("a@example.com", revised, "Demo").is_revision
+    assert not analyze_clauses("a@example.com", revised, "OpenAI").is_revision
+    assert not analyze_clauses("b@example.com", revised, "Demo").is_revision
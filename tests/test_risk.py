@@ -0,0 +1,77 @@
+import json
+import random
+
+from risk import RiskScanner, default_scanner, find_risky_terms, group_hits, load_lexicon, risk_score
+
+
+def spans(hits):
+    return [(hit.term, hit.page, hit.start, hit.end) for hit in hits]
+
+
+# --- SCANNING ---
+def test_terms_match_whole_words_in_any_case():
+    hits = default_scanner.scan("A PENALTY applies. Penalties and finesse do not; a Fine does.")
+    assert [(hit.term, hit.start) for hit in hits] == [("penalty", 2), ("fine", 51)]
+
+
+def test_phrases_match_across_line_breaks():
+    hits = default_scanner.scan("Disputes go to binding\n   arbitration.")
+    assert [hit.term for hit in hits] == ["binding arbitration"]
+
+
+def test_shared_prefixes_match_the_right_term():
+    hits = default_scanner.scan("A non-compete and a non-disclosure clause, non binding.")
+    assert [hit.term for hit in hits] == ["non-compete", "non-disclosure"]
+
+
+def test_hits_know_their_page_and_clause():
+    pages = ["Rent is due monthly. ", "A late fee applies after the 5th. The owner repairs."]
+    hit, = default_scanner.scan(pages)
+    assert (hit.term, hit.page, hit.weight) == ("late fee", 2, 1)
+    assert hit.clause == "A late fee applies after the 5th."
+
+
+def test_offsets_stay_exact_when_lowercasing_changes_length():
+    text = "İİ penalty"
+    hit, = default_scanner.scan(text)
+    assert text[hit.start:hit.end] == "penalty"
+
+
+def test_score_and_grouping(tmp_path):
+    path = tmp_path / "lexicon.json"
+    path.write_text(json.dumps({"Force  Majeure": 4, "fine": 0.5}))
+    scanner = RiskScanner(load_lexicon(str(path)))
+    hits = scanner.scan("Force majeure excuses delay. A fine applies, and another fine.")
+    assert {term: len(term_hits) for term, term_hits in group_hits(hits).items()} == {"force majeure": 1, "fine": 2}
+    assert risk_score(hits) == 5
+    assert find_risky_terms("No penalty, no fine.") == ["penalty", "fine"]
+
+
+def test_empty_lexicon_finds_nothing():
+    assert RiskScanner({}).scan("penalty") == []
+
+
+# --- STREAMING ---
+def test_stream_finds_a_phrase_split_across_pages():
+    pages = ["The parties agree to binding\n", "arbitration in Delhi."]
+    assert spans(default_scanner.scan_stream(pages)) == [("binding arbitration", 1, 21, 40)]
+
+
+def test_stream_waits_for_the_next_page_before_a_word_boundary():
+    pages = ["A penalty", "s clause. A late fee", " applies."]
+    assert spans(default_scanner.scan_stream(pages)) == [("late fee", 2, 21, 29)]
+
+
+def test_stream_matches_a_whole_document_scan():
+    scanner = RiskScanner({"binding arbitration": 3, "penalty": 2, "non-compete": 3, "fee": 1})
+    words = ["binding", "arbitration", "penalty", "penaltys", "non-compete", "non", "fee", "x", "\n", "   "]
+    rng = random.Random(7)
+    for _ in range(500):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+        pages = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert spans(scanner.scan_stream(pages)) == spans(scanner.scan(pages))
+
+
+def test_stream_of_no_pages():
+    assert list(default_scanner.scan_stream([])) == []
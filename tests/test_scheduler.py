@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+from conftest import FakeClock
+from scheduler import PRIORITY_BACKGROUND, LLMScheduler, QueueTimeout, TokenBucket, caller
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(scheduler, "POLL_SECONDS", 0.01)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+# Queue one call per (user, priority) in order; each records who got the slot.
+def queue_calls(sched, calls, served, key=""):
+    threads = []
+    for user, priority in calls:
+        def call(user=user, priority=priority):
+            with caller(user, priority), sched.slot("openai", key):
+                served.append(user)
+        queued = len(sched._waiting)
+        thread = threading.Thread(target=call)
+        thread.start()
+        wait_for(lambda: len(sched._waiting) == queued + 1)
+        threads.append(thread)
+    return threads
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+# --- TOKEN BUCKET ---
+def test_bucket_allows_a_burst_then_refills(clock):
+    bucket = TokenBucket(60, burst_seconds=3, clock=clock)
+    for _ in range(3):
+        assert bucket.wait_time(clock()) == 0
+        bucket.take()
+    assert bucket.wait_time(clock()) == pytest.approx(1.0)
+    clock.advance(1)
+    assert bucket.wait_time(clock()) == 0
+
+
+def test_bucket_pause_holds_back_requests(clock):
+    bucket = TokenBucket(60, clock=clock)
+    bucket.pause(10, clock())
+    assert bucket.wait_time(clock()) == pytest.approx(11.0)
+    clock.advance(11)
+    assert bucket.wait_time(clock()) == 0
+
+
+def test_unlimited_bucket_never_waits(clock):
+    bucket = TokenBucket(0, clock=clock)
+    bucket.pause(10, clock())
+    assert bucket.wait_time(clock()) == 0
+
+
+# --- FAIR QUEUING ---
+def test_light_user_is_not_starved_by_a_heavy_one(clock):
+    sched = LLMScheduler({"openai": 1}, {}, 0, clock=clock)
+    served = []
+    with caller("first"), sched.slot("openai"):
+        threads = queue_calls(sched, [("heavy", 0)] * 3 + [("light", 0)], served)
+    join(threads)
+    assert served == ["heavy", "light", "heavy", "heavy"]
+
+
+def test_interactive_calls_go_before_background_work(clock):
+    sched = LLMScheduler({"openai": 1}, {}, 0, clock=clock)
+    served = []
+    with caller("first"), sched.slot("openai"):
+        threads = queue_calls(sched, [("batch", PRIORITY_BACKGROUND), ("user", 0)], served)
+        assert sched.position("user") == (1, 2)
+        assert sched.position("batch") == (2, 2)
+    join(threads)
+    assert served == ["user", "batch"]
+
+
+# --- RATE LIMITS ---
+def test_backend_rate_limit_holds_calls_until_the_bucket_refills(clock):
+    sched = LLMScheduler({"openai": 8}, {"openai": 12}, 0, clock=clock)   # one call per 5 s
+    served = []
+    with sched.slot("openai"):
+        pass
+    threads = queue_calls(sched, [("a", 0)], served)
+    time.sleep(0.05)
+    assert served == []
+    clock.advance(5)
+    join(threads)
+    assert served == ["a"]
+
+
+def test_key_rate_limit_is_per_key(clock):
+    sched = LLMScheduler({"openai": 8}, {}, 12, clock=clock)
+    served = []
+    with sched.slot("openai", "key-1"):
+        pass
+    with sched.slot("openai", "key-2"):
+        served.append("other key")
+    threads = queue_calls(sched, [("a", 0)], served, key="key-1")
+    time.sleep(0.05)
+    assert served == ["other key"]
+    clock.advance(5)
+    join(threads)
+    assert served == ["other key", "a"]
+
+
+def test_pause_after_429_holds_back_the_key(clock):
+    sched = LLMScheduler({"openai": 8}, {}, 60, clock=clock)
+    served = []
+    sched.pause("openai", "key", 10)
+    threads = queue_calls(sched, [("a", 0)], served, key="key")
+    clock.advance(5)
+    time.sleep(0.05)
+    assert served == []
+    clock.advance(6)
+    join(threads)
+    assert served == ["a"]
+    assert sched.counts["throttled"] == 1
+
+
+def test_queue_timeout(clock):
+    sched = LLMScheduler({"openai": 1}, {}, 0, timeout=30, clock=clock)
+    errors = []
+
+    def call():
+        try:
+            with sched.slot("openai"):
+                pass
+        except QueueTimeout as e:
+            errors.append(e)
+
+    with sched.slot("openai"):
+        thread = threading.Thread(target=call)
+        thread.start()
+        wait_for(lambda: len(sched._waiting) == 1)
+        clock.advance(31)
+        join([thread])
+    assert len(errors) == 1
+    assert sched.counts["timed_out"] == 1
+    assert sched._waiting == []
@@ -0,0 +1,70 @@
+import contextvars
+
+from summarize import map_reduce_summarize, prepare_final_call, split_clauses, split_into_chunks
+
+LEASE = """RENTAL AGREEMENT
+
+1. The tenant pays rent by the 5th of every month.
+2. The deposit is refunded at the end of the term.
+(a) Damages are deducted from it.
+Section 4 The owner handles major repairs."""
+
+
+# --- CHUNKING ---
+def test_clauses_split_at_numbers_headings_and_blank_lines():
+    assert split_clauses(LEASE) == [
+        "RENTAL AGREEMENT",
+        "1. The tenant pays rent by the 5th of every month.",
+        "2. The deposit is refunded at the end of the term.",
+        "(a) Damages are deducted from it.",
+        "Section 4 The owner handles major repairs.",
+    ]
+
+
+def test_chunks_keep_clauses_whole_and_in_order():
+    chunks = split_into_chunks(LEASE, 110)
+    assert all(len(chunk) <= 110 for chunk in chunks)
+    assert chunks[0] == "RENTAL AGREEMENT\n\n1. The tenant pays rent by the 5th of every month."
+    assert "\n\n".join(chunks) == "\n\n".join(split_clauses(LEASE))
+
+
+def test_oversized_clause_falls_back_to_sentences_then_a_hard_cut():
+    clause = "First sentence here. " + "x" * 25
+    assert split_into_chunks(clause, 20) == ["First sentence here.", "x" * 20, "x" * 5]
+
+
+def test_empty_text_has_no_chunks():
+    assert split_into_chunks(" \n\n ", 100) == []
+    assert prepare_final_call("", str.upper, str.upper, 100) == (None, "")
+
+
+# --- MAP-REDUCE ---
+def test_short_text_is_one_map_call():
+    assert prepare_final_call("A short lease.", str.upper, str.upper, 100) == ("map", "A short lease.")
+
+
+def test_partials_are_reduced_until_they_fit():
+    clauses = "\n\n".join(f"{n}. Clause {n} of the lease." for n in range(1, 40))
+    reduced = []
+
+    def reduce_fn(partials):
+        reduced.append(partials)
+        return partials[:10]
+
+    summary = map_reduce_summarize(clauses, lambda chunk: chunk.split("\n\n")[0], reduce_fn, 60)
+    assert len(summary) <= 10
+    assert reduced[0].startswith("1. Clause 1 of the lease.")
+
+
+def test_chunk_calls_keep_the_callers_context():
+    user = contextvars.ContextVar("user")
+    user.set("a@example.com")
+    seen = []
+
+    def record(text):
+        seen.append(user.get())
+        return "ok"
+
+    clauses = "\n\n".join(f"{n}. Clause {n}." for n in range(1, 20))
+    assert prepare_final_call(clauses, record, record, 30)[0] == "reduce"
+    assert len(seen) > 2 and set(seen) == {"a@example.com"}
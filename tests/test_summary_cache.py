@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from summary_cache import SummaryCache, cache_key
+
+
+@pytest.fixture
+def cache(database):
+    return SummaryCache()
+
+
+def wait_for_waiter(cache, count=1):
+    for _ in range(500):
+        if cache.coalesced >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("no caller joined the call in flight")
+
+
+# --- COALESCING ---
+def test_identical_calls_share_one_compute(cache):
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "summary"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    wait_for_waiter(cache, 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["summary"] * 4
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "coalesced": 3}
+
+
+def test_results_outlive_the_process(cache):
+    cache.get_or_compute("key", lambda: "summary")
+    assert SummaryCache().get_or_compute("key", lambda: "recomputed") == "summary"
+
+
+def test_expired_results_are_computed_again(database):
+    cache = SummaryCache(ttl=-1)
+    cache.get_or_compute("key", lambda: "old")
+    assert cache.get_or_compute("key", lambda: "new") == "new"
+
+
+def test_failures_reach_waiters_and_are_not_cached(cache):
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise TimeoutError("model timed out")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute("key", compute)
+        except TimeoutError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for_waiter(cache)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 2
+    assert cache.get_or_compute("key", lambda: "summary") == "summary"
+
+
+def test_key_covers_the_prompt_and_model():
+    key = cache_key("text", "openai", "gpt", "simplify")
+    assert key == cache_key("text", "openai", "gpt", "simplify", {})
+    assert key != cache_key("text", "openai", "gpt", "risk")
+    assert key != cache_key("text", "openai", "gpt-2", "simplify")
+    assert key != cache_key("text ", "openai", "gpt", "simplify")
+
+
+# --- STREAMING ---
+def test_identical_streams_share_one_call(cache):
+    release = threading.Event()
+    calls = []
+
+    def stream():
+        calls.append(1)
+        yield "Hello, "
+        release.wait(5)
+        yield "world"
+
+    owner = cache.stream_or_compute("key", stream)
+    assert next(owner) == "Hello, "
+    joined = []
+    waiter = threading.Thread(target=lambda: joined.extend(cache.stream_or_compute("key", stream)))
+    waiter.start()
+    wait_for_waiter(cache)
+    release.set()
+    assert list(owner) == ["world"]
+    waiter.join(5)
+    assert joined == ["Hello, world"]
+    assert len(calls) == 1
+    assert list(cache.stream_or_compute("key", stream)) == ["Hello, world"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 1}
+
+
+def test_waiter_restarts_a_stream_its_owner_abandoned(cache):
+    closed = []
+
+    def stream():
+        try:
+            yield "partial"
+            yield " answer"
+        finally:
+            closed.append(1)
+
+    owner = cache.stream_or_compute("key", stream)
+    next(owner)
+    joined = []
+    waiter = threading.Thread(target=lambda: joined.extend(cache.stream_or_compute("key", stream)))
+    waiter.start()
+    wait_for_waiter(cache)
+    owner.close()
+    waiter.join(5)
+    assert closed == [1, 1]
+    assert joined == ["partial", " answer"]
+
+
+def test_failed_stream_is_not_cached(cache):
+    def stream():
+        yield "partial"
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        list(cache.stream_or_compute("key", stream))
+    assert list(cache.stream_or_compute("key", lambda: iter(["ok"]))) == ["ok"]
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import templates
+
+pytest.importorskip("numpy")
+
+LEASE = """RENTAL AGREEMENT. This agreement is made on 1st August, 2025 between Mr. Rakesh Kumar, the owner,
+and Mr. Anil Reddy, the tenant, for the house in Jubilee Hills. The monthly rent is Rs.18,000, payable
+by the 5th of every month. The tenant pays a security deposit of Rs.36,000, refunded at the end of the
+term less any damages. The term is 11 months. Either party may end this agreement with one month's
+written notice. The tenant shall not sublet the premises without the owner's written consent. The
+tenant keeps the premises clean and pays the electricity and water bills. The owner handles major
+repairs to the structure. The tenant allows the owner to inspect the premises at reasonable hours after
+giving notice. The tenant shall not make structural changes or keep pets without the owner's consent.
+The furniture and fittings listed in the schedule remain the property of the owner and are returned in
+good condition. Any notice under this agreement is given in writing at the addresses written above.
+Disputes are settled by the courts of Hyderabad."""
+OTHER_LEASE = (LEASE.replace("Rakesh Kumar", "Suresh Rao").replace("Anil Reddy", "Vijay Singh")
+               .replace("Rs.18,000", "Rs.22,500").replace("1st August, 2025", "3rd March, 2026"))
+SUMMARY = "Mr. Rakesh Kumar rents a house to Anil for Rs.18,000 a month from 1st August, 2025."
+
+
+# --- FINGERPRINTS ---
+def test_copies_of_one_template_are_similar():
+    assert templates.similarity(templates.minhash(LEASE), templates.minhash(OTHER_LEASE)) >= templates.MATCH_SIMILARITY
+    unrelated = "This non-disclosure agreement keeps the recipient from sharing confidential information. " * 3
+    assert templates.similarity(templates.minhash(LEASE), templates.minhash(unrelated)) < 0.5
+
+
+# --- FIELDS ---
+def test_patch_swaps_the_fields_of_the_new_copy():
+    patched = templates.patch_fields(SUMMARY, templates.extract_fields(LEASE), templates.extract_fields(OTHER_LEASE),
+                                     OTHER_LEASE, templates.distinctive_tokens(LEASE))
+    assert patched == "Mr. Suresh Rao rents a house to Vijay for Rs.22,500 a month from 3rd March, 2026."
+
+
+def test_patch_refuses_to_leak_details_of_the_old_copy():
+    summary = SUMMARY + " The broker is Ramesh."
+    assert templates.patch_fields(summary, templates.extract_fields(LEASE), templates.extract_fields(OTHER_LEASE),
+                                  OTHER_LEASE, templates.distinctive_tokens(summary)) is None
+
+
+# --- INDEX ---
+def test_index_reuses_a_summary_for_another_copy(database):
+    index = templates.TemplateIndex()
+    assert index.add(LEASE, "demo", SUMMARY)
+    assert not index.add(LEASE, "demo", SUMMARY)
+    match = index.lookup(OTHER_LEASE, "demo")
+    assert match.summary.startswith("Mr. Suresh Rao rents a house to Vijay")
+    assert index.lookup(OTHER_LEASE, "offline") is None
+
+
+# --- SEEDING ---
+@pytest.fixture
+def fresh_seeds(monkeypatch):
+    monkeypatch.setattr(templates, "_seeded", set())
+    monkeypatch.setattr(templates, "BUNDLED_TEMPLATES", {"rental": "lease.pdf"})
+
+
+def test_failed_seeding_is_tried_again(database, fresh_seeds, monkeypatch):
+    add = templates.template_index.add
+    failures = ["database is locked"]
+
+    def flaky(*args, **kwargs):
+        if failures:
+            raise RuntimeError(failures.pop())
+        return add(*args, **kwargs)
+
+    monkeypatch.setattr(templates.template_index, "add", flaky)
+    with pytest.raises(RuntimeError):
+        templates.seed_bundled_templates("demo", {"rental": SUMMARY}, lambda path: LEASE)
+    templates.seed_bundled_templates("demo", {"rental": SUMMARY}, lambda path: LEASE)
+    assert templates.template_index.lookup(OTHER_LEASE, "demo").filename == "lease.pdf"
+
+
+def test_concurrent_callers_wait_for_the_seeding(database, fresh_seeds):
+    reading = threading.Event()
+    release = threading.Event()
+    reads = []
+
+    def read_text(path):
+        reads.append(path)
+        reading.set()
+        release.wait(5)
+        return LEASE
+
+    seeder = threading.Thread(target=templates.seed_bundled_templates, args=("demo", {"rental": SUMMARY}, read_text))
+    seeder.start()
+    reading.wait(5)
+    waiter = threading.Thread(target=templates.seed_bundled_templates, args=("demo", {"rental": SUMMARY}, read_text))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    release.set()
+    seeder.join(5)
+    waiter.join(5)
+    assert reads == ["lease.pdf"]
+    assert templates.template_index.lookup(OTHER_LEASE, "demo") is not None